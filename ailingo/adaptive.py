@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from logging import getLogger
+from pathlib import Path
+from typing import Iterator
+
+import litellm
+
+from ailingo.metrics import Metrics
+
+logger = getLogger(__name__)
+
+# errors that mean the provider is overloaded, so less should be sent at once
+CONGESTION_ERRORS = (
+    litellm.RateLimitError,
+    litellm.ServiceUnavailableError,
+    litellm.Timeout,
+    TimeoutError,
+)
+
+
+@dataclass
+class Decision:
+    time: float
+    concurrency: int
+    chunk_size: int | None
+    reason: str
+    tokens_per_second: float
+    ttft_seconds: float | None
+    errors: int
+    requests: int
+
+
+class RequestTracker:
+    """
+    Observes a single request. See `AdaptiveController.track`.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.ttft: float | None = None
+        self.tokens = 0
+
+    def received(self, tokens: int):
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started_at
+        self.tokens += tokens
+
+
+class AdaptiveController:
+    """
+    Adjusts the number of requests in flight and the segment size during a run, in the
+    style of TCP congestion control (AIMD).
+
+    Every `interval` seconds the requests completed since the last decision are
+    evaluated. Rate limits, timeouts or a time to first token far above the best seen
+    so far halve the concurrency (and the segment size on timeouts). Otherwise, if
+    all slots were in use and throughput did not drop, concurrency is increased by one
+    and the segment size by a step. Every decision is logged, and also written to
+    `log_path` as JSON Lines if it is set.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        chunk_size: int | None = None,
+        interval: float = 5.0,
+        ttft_tolerance: float = 2.0,
+        log_path: str | Path | None = None,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.concurrency = min(
+            max(concurrency, self.min_concurrency), self.max_concurrency
+        )
+        self.initial_chunk_size = chunk_size
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.ttft_tolerance = ttft_tolerance
+        self.log_path = Path(log_path) if log_path else None
+        self.metrics = metrics or Metrics()
+        self.decisions: list[Decision] = []
+
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._saturated = False
+        self._window_started_at = time.monotonic()
+        self._tokens = 0
+        self._requests = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._ttfts: list[float] = []
+        self._best_ttft: float | None = None
+        self._last_throughput = 0.0
+
+    @contextmanager
+    def track(self) -> Iterator[RequestTracker]:
+        """
+        Waits for a free slot and observes the request made within the block.
+        """
+        with self._condition:
+            while self._in_flight >= self.concurrency:
+                self._condition.wait()
+            self._in_flight += 1
+            if self._in_flight >= self.concurrency:
+                self._saturated = True
+        tracker = RequestTracker()
+        error: BaseException | None = None
+        try:
+            yield tracker
+        except GeneratorExit:
+            # the stream was closed early, e.g. a hedged request that lost
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record(tracker, error)
+
+    def _record(self, tracker: RequestTracker, error: BaseException | None):
+        with self._condition:
+            self._in_flight -= 1
+            self._requests += 1
+            self._tokens += tracker.tokens
+            if tracker.ttft is not None:
+                self._ttfts.append(tracker.ttft)
+            if error is not None:
+                self._errors += 1
+                if isinstance(error, CONGESTION_ERRORS):
+                    self._timeouts += 1
+            if time.monotonic() - self._window_started_at >= self.interval:
+                self._decide()
+            self._condition.notify_all()
+
+    def _decide(self):
+        now = time.monotonic()
+        elapsed = max(now - self._window_started_at, 1e-9)
+        throughput = self._tokens / elapsed
+        ttft = sum(self._ttfts) / len(self._ttfts) if self._ttfts else None
+        if ttft is not None and (self._best_ttft is None or ttft < self._best_ttft):
+            self._best_ttft = ttft
+
+        concurrency = self.concurrency
+        chunk_size = self.chunk_size
+        if self._timeouts:
+            concurrency = max(self.min_concurrency, concurrency // 2)
+            if chunk_size and self.initial_chunk_size:
+                chunk_size = max(self.initial_chunk_size // 4, chunk_size // 2)
+            reason = f"{self._timeouts} rate limit or timeout errors"
+        elif (
+            ttft is not None
+            and self._best_ttft is not None
+            and ttft > self._best_ttft * self.ttft_tolerance
+        ):
+            concurrency = max(self.min_concurrency, concurrency // 2)
+            reason = (
+                f"time to first token rose to {ttft:.2f}s (best {self._best_ttft:.2f}s)"
+            )
+        elif self._saturated and throughput >= self._last_throughput * 0.9:
+            concurrency = min(self.max_concurrency, concurrency + 1)
+            if chunk_size and self.initial_chunk_size:
+                chunk_size = min(
+                    self.initial_chunk_size * 2,
+                    chunk_size + self.initial_chunk_size // 4,
+                )
+            reason = "throughput held with all slots in use"
+        else:
+            reason = "unchanged"
+
+        decision = Decision(
+            time=time.time(),
+            concurrency=concurrency,
+            chunk_size=chunk_size,
+            reason=reason,
+            tokens_per_second=round(throughput, 1),
+            ttft_seconds=round(ttft, 3) if ttft is not None else None,
+            errors=self._errors,
+            requests=self._requests,
+        )
+        self._log(decision)
+        if concurrency > self.concurrency:
+            self.metrics.incr("adaptive.increases")
+        elif concurrency < self.concurrency:
+            self.metrics.incr("adaptive.decreases")
+        self.metrics.update_max("adaptive.concurrency.max", concurrency)
+
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self._last_throughput = throughput
+        self._window_started_at = now
+        self._tokens = self._requests = self._errors = self._timeouts = 0
+        self._ttfts = []
+        self._saturated = self._in_flight >= self.concurrency
+
+    def _log(self, decision: Decision):
+        self.decisions.append(decision)
+        logger.info(
+            f"Concurrency {decision.concurrency}, chunk size {decision.chunk_size}: "
+            f"{decision.reason} ({decision.tokens_per_second} tokens/s, "
+            f"{decision.requests} requests, {decision.errors} errors)"
+        )
+        if self.log_path:
+            with self.log_path.open("a") as f:
+                f.write(json.dumps(asdict(decision)) + "\n")
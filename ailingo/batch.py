@@ -0,0 +1,210 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Iterable, Iterator
+
+from ailingo.input_source.text_source import TextInputSource
+from ailingo.packing import RequestPacker
+from ailingo.translator import Translator
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class _Record:
+    id: Any
+    text: str
+    source_language: str | None
+    target_language: str | None
+    request: str | None
+
+    @property
+    def key(self) -> tuple[str | None, str | None, str | None]:
+        return (self.source_language, self.target_language, self.request)
+
+
+class BatchTranslator:
+    """
+    Translates JSON Lines records like {"id": "1", "text": "Hello", "target": "ja"}.
+
+    Results are yielded as soon as they are complete, so they may be out of order.
+    At most `concurrency` requests are read ahead, so memory use does not grow with the
+    size of the input. A record that fails yields {"id": ..., "target": ..., "error": ...},
+    and a line that is not a valid record yields {"line": ..., "error": ...}, instead of
+    stopping the batch.
+
+    With a `packer`, records with the same languages and request are grouped and
+    translated together in one request. A group is sent when it is full, when it has
+    waited for `flush_after` seconds, or when no input arrives for that long.
+    """
+
+    def __init__(
+        self,
+        translator: Translator,
+        concurrency: int = 8,
+        source_language: str | None = None,
+        target_language: str | None = None,
+        request: str | None = None,
+        packer: RequestPacker | None = None,
+        flush_after: float = 1.0,
+    ) -> None:
+        self.translator = translator
+        self.concurrency = max(1, concurrency)
+        self.source_language = source_language
+        self.target_language = target_language
+        self.request = request
+        self.packer = packer
+        self.flush_after = flush_after
+        self.metrics = translator.metrics
+
+    def run(self, lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending: set[Future[list[dict[str, Any]]]] = set()
+            for records in self._group(lines):
+                if isinstance(records, dict):
+                    yield records
+                    continue
+                if records:
+                    pending.add(executor.submit(self._translate, records))
+                # hand over finished results, and wait for one if all workers are busy
+                done, pending = wait(
+                    pending,
+                    timeout=0 if len(pending) < self.concurrency else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    yield from future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+    def _group(self, lines: Iterable[str]) -> Iterator[list[_Record] | dict[str, Any]]:
+        """
+        Yields groups of records translated in one request, or errors of invalid records.
+        An empty group is yielded while the input is idle.
+        """
+        packs: dict[tuple[str | None, str | None, str | None], list[_Record]] = {}
+        started: dict[tuple[str | None, str | None, str | None], float] = {}
+        for numbered_line in self._read(lines):
+            if numbered_line is None:
+                # nothing arrived for a while, so do not keep records waiting for more
+                started.clear()
+                yield from packs.values()
+                packs.clear()
+                yield []
+                continue
+            now = time.monotonic()
+            for key in [
+                key for key, at in started.items() if now - at >= self.flush_after
+            ]:
+                del started[key]
+                yield packs.pop(key)
+
+            line_number, line = numbered_line
+            if not line.strip():
+                continue
+            self.metrics.incr("batch.records")
+            try:
+                record = self._parse(line)
+            except (ValueError, KeyError, TypeError) as e:
+                self.metrics.incr("batch.errors")
+                yield {"line": line_number, "error": f"Invalid record: {e}"}
+                continue
+
+            if (
+                self.packer is None
+                or not record.target_language
+                or not self.packer.can_pack(record.text)
+            ):
+                yield [record]
+                continue
+            pack = packs.setdefault(record.key, [])
+            started.setdefault(record.key, now)
+            pack.append(record)
+            if self.packer.is_full([record.text for record in pack]):
+                del started[record.key]
+                yield packs.pop(record.key)
+        yield from packs.values()
+
+    def _read(self, lines: Iterable[str]) -> Iterator[tuple[int, str] | None]:
+        """
+        Yields the lines with their numbers. With a packer, the lines are read in a
+        thread, and None is yielded whenever no line arrives for `flush_after` seconds.
+        """
+        if self.packer is None:
+            yield from enumerate(lines, 1)
+            return
+        items: queue.Queue = queue.Queue(maxsize=self.concurrency)
+        end = object()
+
+        def read():
+            try:
+                for item in enumerate(lines, 1):
+                    items.put(item)
+                items.put(end)
+            except BaseException as e:
+                items.put(e)
+
+        threading.Thread(target=read, daemon=True).start()
+        while True:
+            try:
+                item = items.get(timeout=self.flush_after)
+            except queue.Empty:
+                yield None
+                continue
+            if item is end:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def _parse(self, line: str) -> _Record:
+        record = json.loads(line)
+        text = record["text"]
+        if not isinstance(text, str):
+            raise TypeError("text must be a string")
+        return _Record(
+            id=record.get("id"),
+            text=text,
+            source_language=record.get("source", self.source_language),
+            target_language=record.get("target", self.target_language),
+            request=record.get("request", self.request),
+        )
+
+    def _translate(self, records: list[_Record]) -> list[dict[str, Any]]:
+        results = [
+            {"id": record.id, "target": record.target_language} for record in records
+        ]
+        try:
+            if len(records) > 1 and self.packer is not None:
+                translations = self.packer.translate(
+                    [record.text for record in records],
+                    target_language=records[0].target_language or "",
+                    source_language=records[0].source_language,
+                    request=records[0].request,
+                )
+            else:
+                translations = [
+                    self.translator.translate_text(
+                        input_source=TextInputSource(record.text),
+                        text=record.text,
+                        source_language=record.source_language,
+                        target_language=record.target_language,
+                        request=record.request,
+                    )
+                    for record in records
+                ]
+        except Exception as e:
+            logger.warning(f"Failed to translate {len(records)} record(s): {e}")
+            self.metrics.incr("batch.errors", len(records))
+            for result in results:
+                result["error"] = str(e)
+            return results
+        for result, translation in zip(results, translations):
+            result["text"] = translation
+        return results
@@ -0,0 +1,14 @@
+from typing import Protocol
+
+
+class CacheBackend(Protocol):
+    """
+    Remote store of cache packs, shared by machines (e.g. CI runners).
+    Packs are named by the hash of their content, so they are never overwritten.
+    """
+
+    def list(self) -> list[str]: ...
+
+    def get(self, name: str) -> bytes: ...
+
+    def put(self, name: str, data: bytes): ...
@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class DirectoryBackend:
+    """
+    Packs stored as files in a directory, e.g. a shared volume or a CI cache directory.
+    """
+
+    path: str
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+
+    def list(self) -> list[str]:
+        directory = Path(self.path)
+        if not directory.exists():
+            return []
+        return sorted(file.name for file in directory.glob("*.pack"))
+
+    def get(self, name: str) -> bytes:
+        return (Path(self.path) / name).read_bytes()
+
+    def put(self, name: str, data: bytes):
+        directory = Path(self.path)
+        directory.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, so that readers never see a partial pack
+        temporary = directory / f".{name}.tmp"
+        temporary.write_bytes(data)
+        temporary.replace(directory / name)
@@ -0,0 +1,42 @@
+from typing import Any
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+class RedisBackend:
+    """
+    Packs stored as fields of a Redis hash named `key`.
+
+    Requires the optional `redis` package.
+    """
+
+    def __init__(
+        self, url: str | None = None, key: str = "ailingo:packs", client: Any = None
+    ) -> None:
+        if client is None:
+            if redis is None:
+                raise ImportError(
+                    "redis is required for Redis caches. Install it with `pip install 'ailingo[redis]'`."
+                )
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.key = key
+        self.client = client
+
+    def list(self) -> list[str]:
+        return sorted(_decode(name) for name in self.client.hkeys(self.key))
+
+    def get(self, name: str) -> bytes:
+        data = self.client.hget(self.key, name)
+        if data is None:
+            raise KeyError(name)
+        return data
+
+    def put(self, name: str, data: bytes):
+        self.client.hset(self.key, name, data)
+
+
+def _decode(name: bytes | str) -> str:
+    return name.decode() if isinstance(name, bytes) else name
@@ -0,0 +1,43 @@
+from typing import Any
+
+try:
+    import boto3
+except ImportError:  # pragma: no cover
+    boto3 = None
+
+
+class S3Backend:
+    """
+    Packs stored in an S3-compatible bucket under `prefix`.
+
+    Requires the optional `boto3` package. Credentials and the endpoint of other
+    S3-compatible stores (e.g. `AWS_ENDPOINT_URL`) are read by boto3 as usual.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", client: Any = None) -> None:
+        if client is None:
+            if boto3 is None:
+                raise ImportError(
+                    "boto3 is required for S3 caches. Install it with `pip install 'ailingo[aws]'`."
+                )
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = client
+
+    def list(self) -> list[str]:
+        names: list[str] = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                name = item["Key"][len(self.prefix) :]
+                if name.endswith(".pack") and "/" not in name:
+                    names.append(name)
+        return sorted(names)
+
+    def get(self, name: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + name)
+        return response["Body"].read()
+
+    def put(self, name: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=data)
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from ailingo.metrics import Metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+PACK_FORMAT = "ailingo-cache-pack"
+PACK_VERSION = 1
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "ailingo" / "translations.db"
+
+
+class TranslationCache:
+    """
+    Responses of the model stored in a SQLite database, keyed by the SHA-256 hash of
+    the model name and the prompt.
+
+    The cache can be exported as a pack: a gzip-compressed JSON Lines file of the
+    entries sorted by key, so that the same entries always make the same pack. Packs
+    from several machines are merged by importing them one after another; entries
+    that are already cached are kept.
+    """
+
+    def __init__(
+        self, path: str | Path = DEFAULT_CACHE_PATH, metrics: Metrics | None = None
+    ) -> None:
+        self.path = Path(path)
+        self.metrics = metrics or Metrics()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def key(model_name: str, messages: list[dict]) -> str:
+        data = json.dumps(
+            {"model": model_name, "messages": messages},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT text FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+        self.metrics.incr("cache.hits" if row else "cache.misses")
+        return row[0] if row else None
+
+    def put(self, key: str, text: str):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO translations (key, text, created_at) VALUES (?, ?, ?)",
+                (key, text, time.time()),
+            )
+
+    def delete(self, key: str):
+        with self._connect() as db:
+            db.execute("DELETE FROM translations WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def export_pack(self) -> bytes:
+        lines = [json.dumps({"format": PACK_FORMAT, "version": PACK_VERSION})]
+        with self._connect() as db:
+            for key, text in db.execute(
+                "SELECT key, text FROM translations ORDER BY key"
+            ):
+                lines.append(json.dumps({"key": key, "text": text}, ensure_ascii=False))
+        # without a timestamp in the header, the same entries give the same bytes
+        return gzip.compress(("\n".join(lines) + "\n").encode(), mtime=0)
+
+    def import_pack(self, data: bytes) -> int:
+        """
+        Adds the entries of a pack that are not cached yet, and returns their number.
+        """
+        try:
+            text = gzip.decompress(data).decode()
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            raise ValueError("Not a cache pack") from e
+        # not splitlines(), which also splits at separators left unescaped in the JSON
+        lines = [line for line in text.split("\n") if line]
+        header = json.loads(lines[0]) if lines else {}
+        if header.get("format") != PACK_FORMAT:
+            raise ValueError("Not a cache pack")
+        if header.get("version") != PACK_VERSION:
+            raise ValueError(f"Unsupported cache pack version: {header.get('version')}")
+        now = time.time()
+        with self._connect() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO translations (key, text, created_at) VALUES (?, ?, ?)",
+                (
+                    (entry["key"], entry["text"], now)
+                    for entry in map(json.loads, lines[1:])
+                ),
+            )
+            return db.total_changes - before
+
+
+def pack_name(data: bytes) -> str:
+    """
+    Returns the content-addressed name of a pack.
+    """
+    return f"{hashlib.sha256(data).hexdigest()}.pack"
@@ -0,0 +1,47 @@
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass
+class Changes:
+    changed: set[Path] = field(default_factory=set)
+    """Files added or modified since the ref (absolute paths)."""
+    removed: set[Path] = field(default_factory=set)
+    """Files removed since the ref (absolute paths)."""
+
+
+def changes_since(ref: str, cwd: str | Path | None = None) -> Changes:
+    """
+    Ask git for the files changed on this branch since it forked from `ref`, in the
+    working tree and including untracked files, like `git diff ref...`. Changes made
+    on `ref` after the fork are not included. Renamed files are reported as removed
+    and added.
+    """
+    root = Path(_git(["rev-parse", "--show-toplevel"], cwd).strip())
+    changes = Changes()
+
+    base = _git(["merge-base", ref, "HEAD"], cwd).strip()
+    fields = _git(["diff", "--name-status", "--no-renames", "-z", base, "--"], cwd)
+    parts = fields.split("\0")
+    for status, path in zip(parts[::2], parts[1::2]):
+        if status == "D":
+            changes.removed.add(root / path)
+        else:
+            changes.changed.add(root / path)
+
+    untracked = _git(["ls-files", "--others", "--exclude-standard", "-z"], root)
+    changes.changed.update(root / path for path in untracked.split("\0") if path)
+    return changes
+
+
+def _git(args: list[str], cwd: str | Path | None) -> str:
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=cwd, capture_output=True, text=True, check=True
+        )
+    except FileNotFoundError:
+        raise ValueError("git is not installed.")
+    except subprocess.CalledProcessError as e:
+        raise ValueError(e.stderr.strip() or f"git {args[0]} failed.")
+    return result.stdout
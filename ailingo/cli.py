@@ -1,22 +1,78 @@
+import json
 import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from logging import getLogger
 from pathlib import Path
-from typing import Annotated, Literal, Optional, cast
+from typing import Annotated, Iterator, Literal, Optional, cast, get_args
 
+import click
 import typer
+from rich import print
 from rich.console import Console
+from rich.prompt import Prompt
+from typer.core import TyperGroup
 
+from ailingo.adaptive import AdaptiveController
+from ailingo.batch import BatchTranslator
+from ailingo.cache import CacheBackend
+from ailingo.cache.directory_backend import DirectoryBackend
+from ailingo.cache.redis_backend import RedisBackend
+from ailingo.cache.s3_backend import S3Backend
+from ailingo.cache.translation_cache import (
+    DEFAULT_CACHE_PATH,
+    TranslationCache,
+    pack_name,
+)
+from ailingo.changes import changes_since
+from ailingo.dashboard import Dashboard
+from ailingo.dedup import Deduplicator
+from ailingo.endpoint_pool import EndpointPool, PooledLLM
+from ailingo.fanout import FanOut
+from ailingo.glossary import GlossaryExtractor
+from ailingo.http_pool import HttpPool
 from ailingo.input_source import InputSource
+from ailingo.input_source.cached_source import CachedInputSource
 from ailingo.input_source.editor_source import EditorInputSource
 from ailingo.input_source.file_source import FileInputSource
+from ailingo.input_source.mmap_source import MmapFileInputSource
 from ailingo.input_source.url_source import UrlInputSource
+from ailingo.job import TranslationJob
+from ailingo.llm import LLM
+from ailingo.manifest import Manifest
 from ailingo.output_source import OutputSource
 from ailingo.output_source.console_source import ConsoleOutputSource
 from ailingo.output_source.file_source import FileOutputSource
+from ailingo.packing import RequestPacker
+from ailingo.planning import OverwritePolicy, Plan, plan_jobs
+from ailingo.profiling import profile
+from ailingo.router import HedgedLLM
+from ailingo.scheduling import ScheduleOrder, schedule
+from ailingo.sharding import parse_shard, shard_of
 from ailingo.translator import Translator
 from ailingo.utils import setup_logger
+from ailingo.watcher import CancellableOutputSource, Cancelled, Watcher, watch
+from ailingo.work_queue import QueuedJob, WorkQueue
 
-app = typer.Typer()
+
+class _DefaultCommandGroup(TyperGroup):
+    """
+    Runs the `translate` command when no subcommand is given (e.g. `ailingo file.txt`).
+    """
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if not args or (args[0] not in self.commands and args[0] != "--help"):
+            args = ["translate", *args]
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(cls=_DefaultCommandGroup)
+cache_app = typer.Typer(help="Share cached translations between machines.")
+app.add_typer(cache_app, name="cache")
 
 err_console = Console(stderr=True)
 logger = getLogger(__name__)
@@ -24,6 +80,7 @@ logger = getLogger(__name__)
 
 InputMode = Literal["edit", "url", "file"]
 DEFAULT_OUTPUT_PATTERN = "{parent}/{stem}.{target}{suffix}"
+DEFAULT_QUEUE_PATH = "ailingo-queue.db"
 
 
 def _comma_separated_list_callback(value: str) -> list[str]:
@@ -42,32 +99,124 @@ def _validate(
         raise typer.BadParameter(
             "File paths cannot be specified in edit mode. Please remove the argument."
         )
-    if edit and len(target_languages) > 1:
-        raise typer.BadParameter(
-            "Multiple target languages cannot be specified in edit mode."
-        )
     if edit and url:
         raise typer.BadParameter("Cannot specify both url and edit.")
-    if url and len(target_languages) > 1:
-        raise typer.BadParameter(
-            "Multiple target languages cannot be specified with url."
-        )
     if file_paths and url:
         raise typer.BadParameter("Cannot specify both file_paths and url.")
     if not file_paths and not url and not edit:
         raise typer.BadParameter("No input source specified.")
 
 
+def _get_llm(
+    model_name: str,
+    hedge_after: float | None,
+    api_bases: list[str],
+    endpoint_concurrency: int,
+    endpoint_max_latency: float | None = None,
+    check_health: bool = True,
+) -> LLM | None:
+    model_names = _comma_separated_list_callback(model_name)
+    if api_bases:
+        if len(model_names) > 1:
+            raise typer.BadParameter(
+                "Multiple models cannot be specified with multiple endpoints."
+            )
+        # the health checks are stopped when the command ends (see `translate`)
+        pool = EndpointPool(
+            api_bases,
+            max_concurrency=endpoint_concurrency,
+            max_latency=endpoint_max_latency,
+        )
+        if check_health:
+            pool.check_health()
+            pool.start_health_checks()
+        return PooledLLM(model_name, pool)
+    if len(model_names) > 1:
+        # 0 turns hedging off, leaving only the fallback on errors
+        return HedgedLLM(model_names, hedge_after=hedge_after or None)
+    return None
+
+
+def _get_cache_backend(url: str) -> CacheBackend:
+    scheme, _, rest = url.partition("://")
+    if not rest:
+        return DirectoryBackend(url)
+    if scheme == "file":
+        return DirectoryBackend(rest)
+    if scheme == "s3":
+        bucket, _, prefix = rest.partition("/")
+        return S3Backend(bucket, prefix)
+    if scheme in ("redis", "rediss"):
+        return RedisBackend(url)
+    raise typer.BadParameter(f"Unsupported cache backend: {url}", param_hint="--remote")
+
+
+def _use_http_pool(
+    translator: Translator,
+    max_connections: int = 100,
+    http_timeout: float = 600.0,
+    http2: bool = True,
+) -> HttpPool:
+    """
+    Reuse HTTP connections across all the requests of the run. The returned pool is to
+    be closed when the command ends.
+    """
+    http_pool = HttpPool(
+        max_connections=max_connections,
+        timeout=http_timeout,
+        http2=http2,
+        metrics=translator.metrics,
+    )
+    translator.llm.http_pool = http_pool
+    return http_pool
+
+
+def _removed_outputs(
+    removed: set[Path],
+    file_paths: list[Path],
+    output_pattern: str | None,
+    source_language: str | None,
+    target_languages: list[str],
+) -> list[Path]:
+    """
+    Returns the existing outputs of removed source files in the directories of the inputs.
+    """
+    parents = {path.resolve().parent for path in file_paths}
+    outputs: list[Path] = []
+    for path in sorted(removed):
+        if not any(path.is_relative_to(parent) for parent in parents):
+            continue
+        for target_language in target_languages:
+            try:
+                output_source = _get_output_sources(
+                    "file",
+                    FileInputSource(path),
+                    output_pattern,
+                    source_language,
+                    target_language,
+                )
+            except ValueError:
+                # the source language is not part of the path, so it is not a source file
+                continue
+            if isinstance(output_source, FileOutputSource) and output_source.exists():
+                outputs.append(Path(output_source.path))
+    return outputs
+
+
 def _get_input_sources(
     input_mode: InputMode,
     file_paths: list[Path],
     url: str | None,
     quiet: bool,
+    chunk_size: int | None = None,
 ) -> list[InputSource]:
     if input_mode == "edit":
         return [EditorInputSource()]
     elif input_mode == "url":
         return [UrlInputSource(url or "", quiet=quiet)]
+    elif chunk_size:
+        # read files segment by segment so that large files are not loaded at once
+        return [MmapFileInputSource(path) for path in file_paths]
     else:
         return [FileInputSource(path) for path in file_paths]
 
@@ -108,6 +257,7 @@ def _get_output_sources(
 
 @app.command()
 def translate(
+    ctx: typer.Context,
     file_paths: Annotated[
         Optional[list[Path]],
         typer.Argument(
@@ -138,9 +288,42 @@ def translate(
             "-m",
             "--model",
             envvar="AILINGO_MODEL",
-            help="Generative AI model to use for translation (e.g. gpt-4o, gemini-1.5-pro).",
+            help=(
+                "Generative AI model to use for translation (e.g. gpt-4o, gemini-1.5-pro). "
+                "Comma-separated models are used as fallbacks in order."
+            ),
         ),
     ] = "gpt-4o",
+    hedge_after: Annotated[
+        Optional[float],
+        typer.Option(
+            "--hedge-after",
+            help="Seconds to wait for the first token before also sending the request to the next model (0 to only fall back on errors).",
+            min=0,
+        ),
+    ] = 10.0,
+    _api_bases: Annotated[
+        list,  # list[str] not work
+        typer.Option(
+            "--api-base",
+            help="Comma-separated list of OpenAI-compatible endpoints (e.g. http://localhost:8000/v1) to balance requests across.",
+            parser=_comma_separated_list_callback,
+        ),
+    ] = [],
+    endpoint_concurrency: Annotated[
+        int,
+        typer.Option(
+            "--endpoint-concurrency",
+            help="Maximum number of concurrent requests per endpoint.",
+        ),
+    ] = 4,
+    endpoint_max_latency: Annotated[
+        Optional[float],
+        typer.Option(
+            "--endpoint-max-latency",
+            help="Seconds to the first token above which an endpoint is ejected for a while.",
+        ),
+    ] = None,
     output_pattern: Annotated[
         Optional[str],
         typer.Option(
@@ -154,6 +337,13 @@ def translate(
         bool,
         typer.Option("-y", "--yes", help="Skip confirmation before overwriting"),
     ] = False,
+    overwrite_policy: Annotated[
+        str,
+        typer.Option(
+            "--overwrite",
+            help="What to do with existing outputs: ask, all, none, or stale (overwrite only outputs older than their source).",
+        ),
+    ] = "ask",
     request: Annotated[
         Optional[str],
         typer.Option(
@@ -178,11 +368,159 @@ def translate(
             help="Enable/disable streaming output. Default is not streaming. (Experimental)",
         ),
     ] = False,
+    chunk_size: Annotated[
+        Optional[int],
+        typer.Option(
+            "--chunk-size",
+            help="Split inputs longer than this many characters into parts translated in parallel.",
+        ),
+    ] = None,
+    glossary: Annotated[
+        bool,
+        typer.Option(
+            "--glossary",
+            help="Before translating an input in parts, list its key terms and their translations once and use them in every part.",
+        ),
+    ] = False,
+    concurrency: Annotated[
+        int,
+        typer.Option(
+            "--concurrency",
+            help="Number of files, or parts of a split file, translated at the same time.",
+        ),
+    ] = 4,
+    max_connections: Annotated[
+        int,
+        typer.Option(
+            "--max-connections",
+            help="Maximum number of HTTP connections kept open to the model provider.",
+        ),
+    ] = 100,
+    http_timeout: Annotated[
+        float,
+        typer.Option(
+            "--http-timeout",
+            help="Seconds to wait for a response from the model provider.",
+        ),
+    ] = 600.0,
+    http2: Annotated[
+        bool,
+        typer.Option(
+            "--http2/--no-http2",
+            help="Use HTTP/2 when the h2 package is installed.",
+        ),
+    ] = True,
+    adaptive: Annotated[
+        bool,
+        typer.Option(
+            "--adaptive",
+            help="Tune the concurrency and chunk size during the run from the observed throughput, latency and errors.",
+        ),
+    ] = False,
+    max_concurrency: Annotated[
+        int,
+        typer.Option(
+            "--max-concurrency",
+            help="With --adaptive, the maximum number of requests in flight.",
+        ),
+    ] = 16,
+    adaptive_log: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--adaptive-log",
+            help="With --adaptive, append each tuning decision to a JSON Lines file.",
+        ),
+    ] = None,
+    dedup: Annotated[
+        bool,
+        typer.Option(
+            "--dedup",
+            help="Translate identical paragraphs shared by multiple files only once.",
+        ),
+    ] = False,
+    mask: Annotated[
+        bool,
+        typer.Option(
+            "--mask",
+            help="Replace code blocks, inline code and URLs with placeholders instead of sending them to the model.",
+        ),
+    ] = False,
+    metrics_path: Annotated[
+        Optional[Path],
+        typer.Option("--metrics", help="Write run metrics to a JSON file."),
+    ] = None,
+    cache_path: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--cache",
+            envvar="AILINGO_CACHE",
+            help="Reuse translations of identical prompts stored in this SQLite file (see the cache command).",
+        ),
+    ] = None,
+    profile_path: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--profile",
+            help="Profile the run: write cProfile stats to this file, spans as folded stacks next to it, and print a summary.",
+        ),
+    ] = None,
+    schedule_order: Annotated[
+        str,
+        typer.Option(
+            "--schedule",
+            help="Order of the jobs by estimated prompt size: input (as given), largest (first, for the shortest total time), or shortest (first, for the earliest results).",
+        ),
+    ] = "input",
+    priorities: Annotated[
+        Optional[str],
+        typer.Option(
+            "--priority",
+            help="Comma-separated glob patterns of input files to translate first, in order (e.g. README.md,docs/intro/*).",
+        ),
+    ] = None,
+    shard: Annotated[
+        Optional[str],
+        typer.Option(
+            "--shard",
+            help="Only process the i-th of N deterministic partitions of the jobs (e.g. 1/4).",
+        ),
+    ] = None,
+    manifest_path: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--manifest",
+            help="Write the processed jobs and metrics to a JSON file (see the merge command).",
+        ),
+    ] = None,
+    changed_since: Annotated[
+        Optional[str],
+        typer.Option(
+            "--changed-since",
+            help="Only translate files added or modified since the git ref (e.g. origin/main).",
+        ),
+    ] = None,
+    prune: Annotated[
+        bool,
+        typer.Option(
+            "--prune",
+            help="With --changed-since, delete the outputs of removed files instead of listing them.",
+        ),
+    ] = False,
+    watch_files: Annotated[
+        bool,
+        typer.Option(
+            "--watch",
+            help="Keep running and translate the files again whenever they are saved.",
+        ),
+    ] = False,
 ) -> None:
     """
     Translates the specified files.
     """
     setup_logger(logging.DEBUG if debug else None)
+    if profile_path:
+        # profile until the command returns
+        ctx.with_resource(profile(profile_path))
     if debug:
         logger.debug("Debug mode enabled.")
     if dryrun:
@@ -191,8 +529,52 @@ def translate(
     if not file_paths:
         file_paths = []
     target_languages = cast(list[str], _target_languages)
+    if overwrite_policy not in get_args(OverwritePolicy):
+        raise typer.BadParameter(
+            f"Must be one of {', '.join(get_args(OverwritePolicy))}.",
+            param_hint="--overwrite",
+        )
+    if schedule_order not in get_args(ScheduleOrder):
+        raise typer.BadParameter(
+            f"Must be one of {', '.join(get_args(ScheduleOrder))}.",
+            param_hint="--schedule",
+        )
 
-    translator = Translator(model_name=model_name)
+    llm = _get_llm(
+        model_name,
+        hedge_after,
+        api_bases=cast(list[str], _api_bases),
+        endpoint_concurrency=endpoint_concurrency,
+        endpoint_max_latency=endpoint_max_latency,
+        # a dry run sends no requests
+        check_health=not dryrun,
+    )
+    if isinstance(llm, PooledLLM):
+        ctx.with_resource(llm.pool)
+    translator = Translator(
+        model_name=model_name,
+        llm=llm,
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        mask=mask,
+        controller=(
+            AdaptiveController(
+                concurrency=concurrency,
+                max_concurrency=max_concurrency,
+                chunk_size=chunk_size,
+                log_path=adaptive_log,
+            )
+            if adaptive
+            else None
+        ),
+    )
+    ctx.with_resource(_use_http_pool(translator, max_connections, http_timeout, http2))
+    if cache_path:
+        translator.llm.cache = TranslationCache(cache_path, metrics=translator.metrics)
+    if glossary:
+        translator.glossary = GlossaryExtractor(
+            translator.llm, translator.prompt_builder, metrics=translator.metrics
+        )
 
     # validate arguments
     _validate(
@@ -210,30 +592,677 @@ def translate(
         input_mode = "file"
     logger.debug(f"{input_mode.capitalize()} mode enabled.")
 
-    input_sources = _get_input_sources(input_mode, file_paths, url, quiet)
+    if changed_since:
+        if input_mode != "file":
+            raise typer.BadParameter(
+                "Only file paths can be filtered by changes.",
+                param_hint="--changed-since",
+            )
+        try:
+            changes = changes_since(changed_since)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--changed-since")
+        for output_path in _removed_outputs(
+            changes.removed,
+            file_paths,
+            output_pattern,
+            source_language,
+            target_languages,
+        ):
+            if prune and not dryrun:
+                output_path.unlink()
+                if not quiet:
+                    print(
+                        f":wastebasket: [bold blue]Removed[/bold blue] "
+                        f"[bright_black]{output_path}[/bright_black]"
+                    )
+            elif not quiet:
+                print(
+                    f":warning: [bold yellow]Source removed:[/bold yellow] "
+                    f"[bright_black]{output_path}[/bright_black] is stale"
+                )
+        file_paths = [path for path in file_paths if path.resolve() in changes.changed]
+        logger.debug(f"{len(file_paths)} files changed since {changed_since}")
+
+    # a single display for all the jobs, instead of a spinner per job
+    show_dashboard = (
+        not quiet
+        and not dryrun
+        and not watch_files
+        and input_mode != "edit"
+        and output_pattern != "-"
+        and len(file_paths or [url]) * max(1, len(target_languages)) > 1
+    )
+    input_sources = _get_input_sources(
+        input_mode, file_paths, url, quiet or show_dashboard, chunk_size
+    )
+    fan_out = input_mode != "file" and len(target_languages) > 1
+    if fan_out and stream:
+        # each translation is written once complete, so that outputs do not interleave
+        raise typer.BadParameter(
+            "Streaming is not supported with several target languages for a URL or the editor.",
+            param_hint="--stream",
+        )
+    if fan_out:
+        # download the page or open the editor only once for all target languages
+        input_sources = [CachedInputSource(source) for source in input_sources]
     if input_mode == "url" and not request:
         request = "Original text is extracted from a website. Convert it to markdown."
 
-    for input_source in input_sources:
-        for target_language in target_languages or [None]:
-            output_source = _get_output_sources(
+    jobs = [
+        TranslationJob(
+            input_source=input_source,
+            output_source=_get_output_sources(
                 input_mode,
                 input_source,
                 output_pattern,
                 source_language,
                 target_language,
+            ),
+            source_language=source_language,
+            target_language=target_language,
+            request=request,
+        )
+        for input_source in input_sources
+        for target_language in target_languages or [None]
+    ]
+    if fan_out:
+        for job in jobs:
+            if isinstance(job.output_source, ConsoleOutputSource):
+                job.output_source.label = job.target_language
+
+    if shard:
+        try:
+            shard_index, shard_count = parse_shard(shard)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--shard")
+        jobs = [job for job in jobs if shard_of(job, shard_count) == shard_index]
+        logger.debug(f"Shard {shard}: {len(jobs)} jobs")
+
+    if watch_files:
+        if input_mode != "file":
+            raise typer.BadParameter(
+                "Only file paths can be watched.", param_hint="--watch"
+            )
+        _watch(translator, jobs, quiet=quiet)
+        return
+
+    # decide what to overwrite for all jobs at once, so that the run never waits for input
+    plan = plan_jobs(jobs)
+    if plan.conflicts:
+        raise typer.BadParameter(
+            "Several jobs would write the same output: "
+            + "; ".join(
+                f"{path} (from {', '.join(job.input_source.path for job in conflicting)})"
+                for path, conflicting in plan.conflicts.items()
+            ),
+            param_hint="--output",
+        )
+    policy = cast(OverwritePolicy, "all" if overwrite else overwrite_policy)
+    if policy == "ask":
+        policy = _ask_overwrite_policy(plan) if plan.existing and not dryrun else "all"
+    jobs, skipped_jobs = plan.resolve(policy)
+    if len(jobs) > 1:
+        jobs = schedule(
+            jobs,
+            order=cast(ScheduleOrder, schedule_order),
+            priorities=priorities.split(",") if priorities else None,
+            prompt_builder=translator.prompt_builder,
+        )
+        logger.debug(f"Job order: {[job.output_source.path for job in jobs]}")
+
+    manifest = Manifest(shard=shard)
+    for job in skipped_jobs:
+        logger.debug(f"Keeping {job.output_source.path}")
+        manifest.add(job, "skipped")
+    if skipped_jobs and not quiet:
+        print(
+            f":fast_forward: [yellow]Keeping {len(skipped_jobs)} existing outputs.[/yellow]"
+        )
+    if show_dashboard:
+        translator.dashboard = Dashboard(total=len(jobs))
+    with translator.dashboard or nullcontext():
+        if dedup and not dryrun:
+            translated_jobs = Deduplicator(translator).run(
+                jobs, overwrite=True, quiet=quiet
             )
-            translator.translate(
-                input_source=input_source,
-                output_source=output_source,
-                source_language=source_language,
-                target_language=target_language,
-                overwrite=overwrite,
-                dryrun=dryrun,
-                request=request,
-                quiet=quiet,
-                stream=stream,
+            for job in jobs:
+                manifest.add(job, "translated" if job in translated_jobs else "skipped")
+        elif fan_out and not dryrun:
+            translated_jobs = FanOut(translator).run(jobs, overwrite=True, quiet=quiet)
+            for job in jobs:
+                manifest.add(job, "translated" if job in translated_jobs else "skipped")
+        else:
+            results = _translate_jobs(
+                translator, jobs, dryrun=dryrun, quiet=quiet, stream=stream
+            )
+            for job, translated in zip(jobs, results):
+                status = (
+                    "planned" if dryrun else "translated" if translated else "skipped"
+                )
+                manifest.add(job, status)
+
+    logger.debug(f"Metrics: {translator.metrics.as_dict()}")
+    if metrics_path:
+        translator.metrics.write(metrics_path)
+    if manifest_path:
+        manifest.metrics = translator.metrics.as_dict()
+        manifest.write(manifest_path)
+
+
+def _translate_jobs(
+    translator: Translator,
+    jobs: list[TranslationJob],
+    dryrun: bool,
+    quiet: bool,
+    stream: bool,
+) -> list[bool]:
+    """
+    Translates the jobs in order, and returns whether each one was saved.
+
+    Unless inputs are split into parts (which are already translated in parallel), up
+    to `translator.concurrency` files are translated at the same time, started in the
+    order of the jobs. Jobs printing to the console or showing a spinner of their own
+    run one after another.
+    """
+
+    def translate(job: TranslationJob) -> bool:
+        return translator.translate(
+            input_source=job.input_source,
+            output_source=job.output_source,
+            source_language=job.source_language,
+            target_language=job.target_language,
+            overwrite=True,
+            dryrun=dryrun,
+            request=job.request,
+            quiet=quiet,
+            stream=stream,
+        )
+
+    parallel = (
+        len(jobs) > 1
+        and not dryrun
+        and translator.chunk_size is None
+        and (translator.dashboard is not None or quiet)
+        and not any(isinstance(job.output_source, ConsoleOutputSource) for job in jobs)
+    )
+    if not parallel:
+        return [translate(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=max(1, translator.concurrency)) as executor:
+        futures = [executor.submit(translate, job) for job in jobs]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+
+
+def _ask_overwrite_policy(plan: Plan) -> OverwritePolicy:
+    print(
+        f"[bold]{len(plan.existing)} of {len(plan.jobs)} outputs already exist[/bold] "
+        f"[bright_black]({len(plan.stale)} older than their source)[/bright_black]"
+    )
+    return cast(
+        OverwritePolicy,
+        Prompt.ask(
+            "Overwrite them? all/none/stale (only outputs older than their source)",
+            choices=["all", "none", "stale"],
+            default="all",
+        ),
+    )
+
+
+def _watch(translator: Translator, jobs: list[TranslationJob], quiet: bool):
+    jobs_by_path: dict[Path, list[TranslationJob]] = {}
+    for job in jobs:
+        input_path = Path(job.input_source.path).resolve()
+        if Path(job.output_source.path).resolve() == input_path:
+            raise typer.BadParameter(
+                "Files cannot be rewritten in place in watch mode. Please specify a target language.",
+                param_hint="--watch",
             )
+        jobs_by_path.setdefault(input_path, []).append(job)
+
+    def translate_file(path: Path, cancel: threading.Event):
+        for job in jobs_by_path[path]:
+            try:
+                translator.translate(
+                    input_source=job.input_source,
+                    output_source=CancellableOutputSource(job.output_source, cancel),
+                    source_language=job.source_language,
+                    target_language=job.target_language,
+                    overwrite=True,
+                    request=job.request,
+                    quiet=quiet,
+                    stream=True,
+                )
+            except Cancelled:
+                logger.debug(f"Translation of {path} cancelled")
+                return
+            except Exception as e:
+                err_console.print(f"[red]Failed to translate {path}: {e}[/red]")
+
+    if not quiet:
+        print(
+            f":eyes: [bold blue]Watching[/bold blue] {len(jobs_by_path)} files. "
+            "Press Ctrl+C to stop."
+        )
+    try:
+        watch(Watcher(jobs_by_path), translate_file)
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command()
+def merge(
+    manifest_paths: Annotated[
+        list[Path],
+        typer.Argument(help="Manifests written by each shard.", exists=True),
+    ],
+    output_path: Annotated[
+        Optional[Path],
+        typer.Option("-o", "--output", help="Write the merged manifest to a file."),
+    ] = None,
+) -> None:
+    """
+    Merges the manifests and metrics of sharded runs.
+    """
+    manifest = Manifest.merge([Manifest.load(path) for path in manifest_paths])
+    if output_path:
+        manifest.write(output_path)
+    statuses: dict[str, int] = {}
+    for job in manifest.jobs:
+        statuses[job.status] = statuses.get(job.status, 0) + 1
+    print(
+        f"Merged {len(manifest_paths)} manifests: {len(manifest.jobs)} jobs "
+        f"({', '.join(f'{count} {status}' for status, count in sorted(statuses.items()))})"
+    )
+
+
+_CachePathOption = Annotated[
+    Path,
+    typer.Option("--cache", envvar="AILINGO_CACHE", help="SQLite file of the cache."),
+]
+_RemoteOption = Annotated[
+    Optional[str],
+    typer.Option(
+        "--remote",
+        help="Shared store of packs: a directory, s3://bucket/prefix or redis://host:port/db.",
+    ),
+]
+
+
+@cache_app.command("export")
+def cache_export(
+    output_path: Annotated[
+        Optional[Path],
+        typer.Option("-o", "--output", help="Write the pack to this file."),
+    ] = None,
+    cache_path: _CachePathOption = DEFAULT_CACHE_PATH,
+    remote: _RemoteOption = None,
+) -> None:
+    """
+    Exports the cached translations as a compressed pack.
+    """
+    if not output_path and not remote:
+        raise typer.BadParameter("Specify --output or --remote.")
+    cache = TranslationCache(cache_path)
+    data = cache.export_pack()
+    if output_path:
+        output_path.write_bytes(data)
+    if remote:
+        backend = _get_cache_backend(remote)
+        name = pack_name(data)
+        # packs are named by their content, so an existing pack is identical
+        if name not in backend.list():
+            backend.put(name, data)
+    print(f"Exported {len(cache)} translations ({len(data):,} bytes)")
+
+
+@cache_app.command("import")
+def cache_import(
+    pack_paths: Annotated[
+        Optional[list[Path]],
+        typer.Argument(help="Packs to merge into the cache.", exists=True),
+    ] = None,
+    cache_path: _CachePathOption = DEFAULT_CACHE_PATH,
+    remote: _RemoteOption = None,
+) -> None:
+    """
+    Merges packs into the cache. Translations that are already cached are kept.
+    """
+    if not pack_paths and not remote:
+        raise typer.BadParameter("Specify pack files or --remote.")
+    cache = TranslationCache(cache_path)
+    packs = [path.read_bytes() for path in pack_paths or []]
+    if remote:
+        backend = _get_cache_backend(remote)
+        packs += [backend.get(name) for name in backend.list()]
+    added = 0
+    for data in packs:
+        try:
+            added += cache.import_pack(data)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+    print(f"Imported {added} translations from {len(packs)} packs")
+
+
+@app.command()
+def batch(
+    ctx: typer.Context,
+    input_path: Annotated[
+        str,
+        typer.Argument(help="JSON Lines file to translate, or - for standard input."),
+    ] = "-",
+    output_path: Annotated[
+        str,
+        typer.Option(
+            "-o",
+            "--output",
+            help="File to write the results to, or - for standard output.",
+        ),
+    ] = "-",
+    source_language: Annotated[
+        Optional[str],
+        typer.Option("-s", "--source", help="Default source language (Optional)"),
+    ] = None,
+    target_language: Annotated[
+        Optional[str],
+        typer.Option(
+            "-t", "--target", help="Default target language for records without one."
+        ),
+    ] = None,
+    model_name: Annotated[
+        str,
+        typer.Option(
+            "-m",
+            "--model",
+            envvar="AILINGO_MODEL",
+            help="Generative AI model to use for translation (e.g. gpt-4o, gemini-1.5-pro).",
+        ),
+    ] = "gpt-4o",
+    request: Annotated[
+        Optional[str],
+        typer.Option(
+            "-r",
+            "--request",
+            help="Add a translation request.",
+        ),
+    ] = None,
+    concurrency: Annotated[
+        int,
+        typer.Option(
+            "--concurrency",
+            help="Number of records translated at the same time.",
+        ),
+    ] = 8,
+    mask: Annotated[
+        bool,
+        typer.Option(
+            "--mask",
+            help="Replace code blocks, inline code and URLs with placeholders instead of sending them to the model.",
+        ),
+    ] = False,
+    pack_tokens: Annotated[
+        Optional[int],
+        typer.Option(
+            "--pack",
+            help="Translate records with the same languages together, up to this many tokens per request.",
+        ),
+    ] = None,
+    debug: Annotated[bool, typer.Option("--debug", help="Enable debug mode.")] = False,
+) -> None:
+    """
+    Translates JSON Lines records like {"id": "1", "text": "Hello", "target": "ja"}.
+
+    Each result is written as a line {"id", "target", "text"} (or {"id", "target",
+    "error"}, or {"line", "error"} for invalid lines) as soon as it is translated.
+    """
+    setup_logger(logging.DEBUG if debug else None)
+    translator = Translator(model_name=model_name, mask=mask)
+    ctx.with_resource(_use_http_pool(translator))
+    batch_translator = BatchTranslator(
+        translator,
+        concurrency=concurrency,
+        source_language=source_language,
+        target_language=target_language,
+        request=request,
+        packer=RequestPacker(translator, max_tokens=pack_tokens)
+        if pack_tokens
+        else None,
+    )
+    with (
+        click.open_file(input_path, "r", encoding="utf-8") as input_file,
+        click.open_file(output_path, "w", encoding="utf-8") as output_file,
+    ):
+        for result in batch_translator.run(input_file):
+            output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            # results are consumed as they complete, e.g. by the other end of a pipe
+            output_file.flush()
+    logger.debug(f"Metrics: {translator.metrics.as_dict()}")
+
+
+@app.command()
+def enqueue(
+    file_paths: Annotated[
+        list[Path],
+        typer.Argument(
+            help="Input file(s) to translate.",
+            dir_okay=False,
+            exists=True,
+        ),
+    ],
+    source_language: Annotated[
+        Optional[str],
+        typer.Option("-s", "--source", help="Source language (Optional)"),
+    ] = None,
+    _target_languages: Annotated[
+        list,  # list[str] not work
+        typer.Option(
+            "-t",
+            "--target",
+            help="Comma-separated list of target languages. If omitted, original file will be rewritten.",
+            parser=_comma_separated_list_callback,
+        ),
+    ] = [],
+    output_pattern: Annotated[
+        Optional[str],
+        typer.Option(
+            "-o",
+            "--output",
+            help="Output file name pattern.",
+            show_default=DEFAULT_OUTPUT_PATTERN,
+        ),
+    ] = None,
+    request: Annotated[
+        Optional[str],
+        typer.Option(
+            "-r",
+            "--request",
+            help="Add a translation request.",
+        ),
+    ] = None,
+    queue_path: Annotated[
+        Path,
+        typer.Option("--queue", help="SQLite file holding the queue."),
+    ] = Path(DEFAULT_QUEUE_PATH),
+) -> None:
+    """
+    Adds translation jobs to a queue processed by `ailingo worker`.
+    """
+    if output_pattern == "-":
+        raise typer.BadParameter(
+            "Queued jobs cannot be written to the console.", param_hint="--output"
+        )
+    jobs = [
+        QueuedJob(
+            input_path=str(path),
+            # workers may run from another directory, so store absolute paths
+            output_path=str(
+                Path(
+                    _get_output_sources(
+                        "file",
+                        FileInputSource(path),
+                        output_pattern,
+                        source_language,
+                        target_language,
+                    ).path
+                ).resolve()
+            ),
+            source_language=source_language,
+            target_language=target_language,
+            request=request,
+        )
+        for path in (Path(file_path).resolve() for file_path in file_paths)
+        for target_language in cast(list[str], _target_languages) or [None]
+    ]
+    queue = WorkQueue(queue_path)
+    queue.enqueue(jobs)
+    print(f"Queued {len(jobs)} jobs in {queue_path}")
+
+
+@app.command()
+def worker(
+    ctx: typer.Context,
+    queue_path: Annotated[
+        Path,
+        typer.Option("--queue", help="SQLite file holding the queue."),
+    ] = Path(DEFAULT_QUEUE_PATH),
+    model_name: Annotated[
+        str,
+        typer.Option(
+            "-m",
+            "--model",
+            envvar="AILINGO_MODEL",
+            help="Generative AI model to use for translation (e.g. gpt-4o, gemini-1.5-pro).",
+        ),
+    ] = "gpt-4o",
+    chunk_size: Annotated[
+        Optional[int],
+        typer.Option(
+            "--chunk-size",
+            help="Split inputs longer than this many characters into parts translated in parallel.",
+        ),
+    ] = None,
+    concurrency: Annotated[
+        int,
+        typer.Option(
+            "--concurrency",
+            help="Number of parts translated at the same time.",
+        ),
+    ] = 4,
+    mask: Annotated[
+        bool,
+        typer.Option(
+            "--mask",
+            help="Replace code blocks, inline code and URLs with placeholders instead of sending them to the model.",
+        ),
+    ] = False,
+    lease_seconds: Annotated[
+        float,
+        typer.Option(
+            "--lease",
+            help="Seconds after which a job of an unresponsive worker is handed to another worker.",
+        ),
+    ] = 600,
+    max_attempts: Annotated[
+        int,
+        typer.Option("--max-attempts", help="Number of times a job is tried."),
+    ] = 3,
+    poll_interval: Annotated[
+        float,
+        typer.Option(
+            "--poll-interval",
+            help="Seconds to wait before checking again while other workers hold the remaining jobs.",
+        ),
+    ] = 5,
+    cache_path: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--cache",
+            envvar="AILINGO_CACHE",
+            help="Reuse translations of identical prompts stored in this SQLite file (see the cache command).",
+        ),
+    ] = None,
+    quiet: Annotated[
+        bool, typer.Option("-q", "--quiet", help="Suppress all output messages.")
+    ] = False,
+    debug: Annotated[bool, typer.Option("--debug", help="Enable debug mode.")] = False,
+) -> None:
+    """
+    Translates jobs from the queue until none are left.
+    """
+    setup_logger(logging.DEBUG if debug else None)
+    queue = WorkQueue(
+        queue_path, lease_seconds=lease_seconds, max_attempts=max_attempts
+    )
+    translator = Translator(
+        model_name=model_name,
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        mask=mask,
+    )
+    ctx.with_resource(_use_http_pool(translator))
+    if cache_path:
+        translator.llm.cache = TranslationCache(cache_path, metrics=translator.metrics)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    while True:
+        job = queue.lease(worker_id)
+        if job is None:
+            if not queue.counts().get("leased"):
+                break
+            # other workers still hold jobs that may be handed back to the queue
+            time.sleep(poll_interval)
+            continue
+        logger.debug(f"Leased job {job.id} (attempt {job.attempts})")
+        try:
+            with _keep_lease(queue, job, worker_id):
+                translator.translate(
+                    input_source=(
+                        MmapFileInputSource(job.input_path)
+                        if chunk_size
+                        else FileInputSource(job.input_path)
+                    ),
+                    output_source=FileOutputSource(job.output_path),
+                    source_language=job.source_language,
+                    target_language=job.target_language,
+                    overwrite=True,
+                    request=job.request,
+                    quiet=quiet,
+                )
+        except Exception as e:
+            logger.warning(f"Job {job.id} failed: {e}")
+            queue.fail(job, worker_id, str(e))
+        else:
+            queue.ack(job, worker_id)
+
+    counts = queue.counts()
+    print(
+        f"Queue is empty: {counts.get('done', 0)} done, {counts.get('failed', 0)} failed"
+    )
+
+
+@contextmanager
+def _keep_lease(queue: WorkQueue, job: QueuedJob, worker_id: str) -> Iterator[None]:
+    """
+    Extends the lease of a job in the background while it is being translated.
+    """
+    stopped = threading.Event()
+
+    def extend():
+        while not stopped.wait(queue.lease_seconds / 3):
+            if not queue.extend(job, worker_id):
+                logger.warning(f"Lost the lease of job {job.id}")
+                return
+
+    thread = threading.Thread(target=extend, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
 
 
 if __name__ == "__main__":
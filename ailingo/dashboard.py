@@ -0,0 +1,151 @@
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator
+
+from rich.console import Console, Group, RenderableType
+from rich.live import Live
+from rich.spinner import Spinner
+from rich.text import Text
+
+from ailingo.profiling import spanned
+from ailingo.utils import estimate_tokens
+
+
+class Dashboard:
+    """
+    A single live display for all the jobs of a run: jobs queued, in flight and done,
+    the output tokens per second, the estimated time left and the slowest jobs in flight.
+
+    Updates only change counters, and the display is redrawn at `refresh_per_second`,
+    so the cost does not grow with the number of jobs.
+    """
+
+    def __init__(
+        self,
+        total: int = 0,
+        refresh_per_second: float = 2.0,
+        slowest: int = 3,
+        console: Console | None = None,
+    ) -> None:
+        self.total = total
+        self.slowest = slowest
+        self.done = 0
+        self.failed = 0
+        self.tokens = 0
+        self._in_flight: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._spinner = Spinner("dots")
+        self._live = Live(
+            console=console,
+            refresh_per_second=refresh_per_second,
+            transient=True,
+            get_renderable=self.render,
+        )
+
+    def __enter__(self) -> "Dashboard":
+        self._started_at = time.monotonic()
+        self._live.start()
+        return self
+
+    def __exit__(self, *args):
+        self._live.stop()
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """
+        Hides the display, e.g. while asking the user something.
+        """
+        if not self._live.is_started:
+            yield
+            return
+        self._live.stop()
+        try:
+            yield
+        finally:
+            self._live.start()
+
+    def start(self, name: str):
+        with self._lock:
+            self._in_flight[name] = time.monotonic()
+
+    def finish(self, name: str, failed: bool = False):
+        with self._lock:
+            if self._in_flight.pop(name, None) is None:
+                return
+            self.done += 1
+            if failed:
+                self.failed += 1
+
+    def skip(self, count: int = 1):
+        """
+        Removes jobs that will not be translated (e.g. not overwritten) from the total.
+        """
+        with self._lock:
+            self.total -= count
+
+    @contextmanager
+    def job(self, name: str) -> Iterator[None]:
+        self.start(name)
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.finish(name, failed=failed)
+
+    def add_tokens(self, tokens: int):
+        with self._lock:
+            self.tokens += tokens
+
+    def count_tokens(self, texts: Iterable[str]) -> Iterator[str]:
+        for text in texts:
+            self.add_tokens(estimate_tokens(text))
+            yield text
+
+    @spanned("dashboard.render")
+    def render(self) -> RenderableType:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = max(now - self._started_at, 1e-9)
+            in_flight = len(self._in_flight)
+            queued = max(self.total - self.done - in_flight, 0)
+            # jobs are inserted in the order they started, so the oldest are first
+            slowest = [
+                (name, now - started_at)
+                for name, started_at in islice(self._in_flight.items(), self.slowest)
+            ]
+            done, failed, tokens, total = (
+                self.done,
+                self.failed,
+                self.tokens,
+                self.total,
+            )
+
+        eta = "--:--"
+        if done:
+            eta = _format_seconds(elapsed / done * max(total - done, 0))
+        self._spinner.text = Text.from_markup(
+            f"[bold blue]Translating...[/bold blue] {done}/{total} done"
+            + (f" [red]({failed} failed)[/red]" if failed else "")
+            + f" [bright_black]· {in_flight} in flight · {queued} queued"
+            f" · {tokens / elapsed:,.0f} tokens/s · ETA {eta}[/bright_black]"
+        )
+        lines: list[RenderableType] = [self._spinner]
+        for name, seconds in slowest:
+            lines.append(
+                Text.assemble(
+                    ("  " + _format_seconds(seconds), "bright_black"), " ", name
+                )
+            )
+        return Group(*lines)
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes:02}:{seconds:02}"
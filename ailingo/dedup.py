@@ -0,0 +1,176 @@
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from logging import getLogger
+from pathlib import Path
+
+from rich import print
+
+from ailingo.job import TranslationJob
+from ailingo.segmenter import split_paragraphs
+from ailingo.translator import Translator
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_CHARS = 4000
+
+
+@dataclass
+class _Segment:
+    leading: str
+    text: str
+    trailing: str
+
+
+class Deduplicator:
+    """
+    Translates a set of jobs so that identical segments are translated only once
+    per target language, even when they appear in many files.
+
+    Paragraphs that appear more than once across all inputs become segments of their
+    own, and the remaining paragraphs are grouped into segments of up to `max_chars`
+    characters.
+    """
+
+    def __init__(self, translator: Translator, max_chars: int | None = None) -> None:
+        self.translator = translator
+        self.max_chars = max_chars or translator.chunk_size or DEFAULT_MAX_CHARS
+        self.metrics = translator.metrics
+
+    def run(
+        self,
+        jobs: list[TranslationJob],
+        overwrite: bool = False,
+        quiet: bool = False,
+    ) -> list[TranslationJob]:
+        """
+        Translates the jobs and returns the ones that were saved.
+        """
+        dashboard = self.translator.dashboard
+        confirmed = [
+            job
+            for job in jobs
+            if self.translator.confirm_overwrite(job.output_source, overwrite)
+        ]
+        if dashboard:
+            dashboard.skip(len(jobs) - len(confirmed))
+            # the jobs share their segments, so they are in flight until all are done
+            for job in confirmed:
+                dashboard.start(job.output_source.path)
+        jobs = confirmed
+        texts: dict[str, str] = {}
+        for job in jobs:
+            if job.input_source.path not in texts:
+                texts[job.input_source.path] = job.input_source.read()
+
+        paragraph_counts = Counter(
+            paragraph.strip()
+            for text in texts.values()
+            for paragraph in split_paragraphs(text)
+            if paragraph.strip()
+        )
+        documents = {
+            path: self._segment(text, paragraph_counts) for path, text in texts.items()
+        }
+
+        unique: dict[str, tuple[TranslationJob, str]] = {}
+        total = 0
+        for job in jobs:
+            for segment in documents[job.input_source.path]:
+                if segment.text:
+                    total += 1
+                    unique.setdefault(self._key(job, segment.text), (job, segment.text))
+
+        self.metrics.incr("dedup.segments", total)
+        self.metrics.incr("dedup.unique_segments", len(unique))
+        ratio = 1 - len(unique) / total if total else 0.0
+        logger.debug(f"Deduplicated {total} segments into {len(unique)}")
+        if not quiet:
+            print(
+                f":recycle: [bold blue]Deduplicated[/bold blue] {total} segments into "
+                f"{len(unique)} [bright_black]({ratio:.0%} saved)[/bright_black]"
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, self.translator.concurrency)
+        ) as executor:
+            futures = {
+                key: executor.submit(
+                    self.translator.translate_text,
+                    input_source=job.input_source,
+                    text=text,
+                    source_language=job.source_language,
+                    target_language=job.target_language,
+                    request=job.request,
+                )
+                for key, (job, text) in unique.items()
+            }
+            translations = {key: future.result() for key, future in futures.items()}
+
+        for job in jobs:
+            job.output_source.write(
+                "".join(
+                    segment.leading
+                    + (
+                        translations[self._key(job, segment.text)]
+                        if segment.text
+                        else ""
+                    )
+                    + segment.trailing
+                    for segment in documents[job.input_source.path]
+                )
+            )
+            if dashboard:
+                dashboard.finish(job.output_source.path)
+            if not quiet:
+                print(
+                    f":white_check_mark: [bold green]Translated![/bold green] "
+                    f"[bright_black]{job.output_source.path}[/bright_black]"
+                )
+        return jobs
+
+    def _segment(self, text: str, paragraph_counts: Counter[str]) -> list[_Segment]:
+        segments: list[_Segment] = []
+        run = ""
+
+        def flush():
+            nonlocal run
+            if run:
+                segments.append(_strip(run))
+                run = ""
+
+        for paragraph in split_paragraphs(text):
+            if paragraph_counts[paragraph.strip()] > 1:
+                flush()
+                segments.append(_strip(paragraph))
+            else:
+                if run and len(run) + len(paragraph) > self.max_chars:
+                    flush()
+                run += paragraph
+        flush()
+        return segments
+
+    @staticmethod
+    def _key(job: TranslationJob, text: str) -> str:
+        # the prompt names the file type (or the file name, without an extension)
+        input_path = Path(job.input_source.path)
+        return hashlib.sha256(
+            "\0".join(
+                [
+                    "".join(input_path.suffixes) or input_path.name,
+                    job.source_language or "",
+                    job.target_language or "",
+                    job.request or "",
+                    text,
+                ]
+            ).encode()
+        ).hexdigest()
+
+
+def _strip(text: str) -> _Segment:
+    stripped = text.strip()
+    if not stripped:
+        return _Segment(text, "", "")
+    start = text.index(stripped)
+    return _Segment(text[:start], stripped, text[start + len(stripped) :])
@@ -0,0 +1,259 @@
+import asyncio
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+from logging import getLogger
+from typing import AsyncIterator, Iterator
+
+from litellm.types.utils import ModelResponse
+
+from ailingo.llm import LLM
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class Endpoint:
+    base_url: str
+    max_concurrency: int = 4
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    healthy: bool = True
+    latency: float | None = None
+    """Moving average of the time to first token, in seconds."""
+
+    def available(self, now: float) -> bool:
+        return (
+            self.healthy
+            and self.ejected_until <= now
+            and self.outstanding < self.max_concurrency
+        )
+
+
+class EndpointPool:
+    """
+    Pool of OpenAI-compatible inference endpoints (e.g. vLLM or llama.cpp replicas).
+
+    Requests are dispatched to the endpoint with the fewest outstanding requests.
+    Endpoints that fail repeatedly or respond slower than `max_latency` are ejected
+    for `eject_seconds`, and endpoints failing the health check are not used.
+
+    Used as a context manager, the background health checks are stopped on exit.
+    """
+
+    def __init__(
+        self,
+        base_urls: list[str],
+        max_concurrency: int = 4,
+        max_failures: int = 3,
+        max_latency: float | None = None,
+        eject_seconds: float = 30.0,
+        health_path: str = "/models",
+    ) -> None:
+        if not base_urls:
+            raise ValueError("At least one endpoint must be specified.")
+        self.endpoints = [
+            Endpoint(url.rstrip("/"), max_concurrency=max_concurrency)
+            for url in base_urls
+        ]
+        self.max_failures = max_failures
+        self.max_latency = max_latency
+        self.eject_seconds = eject_seconds
+        self.health_path = health_path
+        self._condition = threading.Condition()
+        self._health_checks: list[threading.Event] = []
+
+    def __enter__(self) -> "EndpointPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def acquire(self, timeout: float | None = None) -> Endpoint:
+        """
+        Wait for an endpoint with free capacity and reserve a slot on it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                candidates = [e for e in self.endpoints if e.available(now)]
+                if candidates:
+                    endpoint = min(candidates, key=lambda e: e.outstanding)
+                    endpoint.outstanding += 1
+                    return endpoint
+                if not any(e.healthy for e in self.endpoints):
+                    raise RuntimeError("No healthy endpoints available.")
+                wait = self._next_wakeup(now)
+                if deadline is not None:
+                    if now >= deadline:
+                        raise TimeoutError("Timed out waiting for an endpoint.")
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._condition.wait(wait)
+
+    def release(
+        self,
+        endpoint: Endpoint,
+        latency: float | None = None,
+        error: Exception | None = None,
+    ):
+        """
+        Return the slot reserved by `acquire` and record the outcome of the request.
+        """
+        with self._condition:
+            endpoint.outstanding -= 1
+            now = time.monotonic()
+            if error is not None:
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.max_failures:
+                    self._eject(
+                        endpoint, now, f"{endpoint.consecutive_failures} failures"
+                    )
+            else:
+                endpoint.consecutive_failures = 0
+                if latency is not None:
+                    endpoint.latency = (
+                        latency
+                        if endpoint.latency is None
+                        else 0.8 * endpoint.latency + 0.2 * latency
+                    )
+                    if self.max_latency and endpoint.latency > self.max_latency:
+                        self._eject(endpoint, now, f"latency {endpoint.latency:.2f}s")
+                        endpoint.latency = None
+            self._condition.notify_all()
+
+    def check_health(self, timeout: float = 5.0):
+        """
+        Probe every endpoint and mark it healthy or unhealthy.
+        """
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(
+                    endpoint.base_url + self.health_path, timeout=timeout
+                ) as response:
+                    healthy = 200 <= response.status < 300
+            except Exception as e:
+                logger.debug(f"Health check failed for {endpoint.base_url}: {e}")
+                healthy = False
+            with self._condition:
+                if healthy and not endpoint.healthy:
+                    logger.info(f"Endpoint {endpoint.base_url} is healthy again")
+                    endpoint.consecutive_failures = 0
+                    endpoint.ejected_until = 0.0
+                elif not healthy and endpoint.healthy:
+                    logger.warning(f"Endpoint {endpoint.base_url} is unhealthy")
+                endpoint.healthy = healthy
+                self._condition.notify_all()
+
+    def start_health_checks(self, interval: float = 10.0) -> threading.Event:
+        """
+        Run health checks in a background thread. Set the returned event to stop.
+        """
+        stopped = threading.Event()
+
+        def run():
+            while not stopped.wait(interval):
+                self.check_health()
+
+        threading.Thread(target=run, daemon=True).start()
+        self._health_checks.append(stopped)
+        return stopped
+
+    def close(self):
+        """
+        Stops the health checks started by `start_health_checks`.
+        """
+        for stopped in self._health_checks:
+            stopped.set()
+        self._health_checks.clear()
+
+    def _eject(self, endpoint: Endpoint, now: float, reason: str):
+        logger.warning(
+            f"Ejecting endpoint {endpoint.base_url} for {self.eject_seconds}s ({reason})"
+        )
+        endpoint.ejected_until = now + self.eject_seconds
+        endpoint.consecutive_failures = 0
+
+    def _next_wakeup(self, now: float) -> float | None:
+        ejected = [
+            e.ejected_until - now for e in self.endpoints if e.ejected_until > now
+        ]
+        return min(ejected) if ejected else None
+
+
+class PooledLLM(LLM):
+    """
+    LLM that dispatches requests across the endpoints of an `EndpointPool`.
+
+    Responses are always streamed, so that the latency of an endpoint is the time to
+    its first token rather than the time to generate the whole response.
+    """
+
+    def __init__(self, model_name: str, pool: EndpointPool) -> None:
+        super().__init__(model_name)
+        self.pool = pool
+
+    def completion(self, prompt: str | list[dict]) -> str:
+        return "".join(self.iter_completion(prompt))
+
+    async def acompletion(self, prompt: str | list[dict]) -> str:
+        return "".join([chunk async for chunk in self.aiter_completion(prompt)])
+
+    def _completion(
+        self, model: str, prompt: str | list[dict], **kwargs
+    ) -> Iterator[ModelResponse]:
+        streamed = kwargs.get("stream", True)
+        endpoint = self.pool.acquire()
+        started_at = time.monotonic()
+        latency: float | None = None
+        error: Exception | None = None
+        try:
+            chunks = super()._completion(
+                model, prompt, api_base=endpoint.base_url, **kwargs
+            )
+            for chunk in chunks:
+                if latency is None and streamed:
+                    latency = time.monotonic() - started_at
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.pool.release(endpoint, latency=latency, error=error)
+
+    async def _acompletion(
+        self, model: str, prompt: str | list[dict], **kwargs
+    ) -> AsyncIterator[ModelResponse]:
+        """
+        Async version of `_completion`.
+        """
+        streamed = kwargs.get("stream", True)
+        # waiting for a free endpoint blocks, so it must not block the event loop
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.pool.acquire))
+        try:
+            endpoint = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # the thread still reserves a slot, which must be returned
+            acquiring.add_done_callback(self._release_acquired)
+            raise
+        started_at = time.monotonic()
+        latency: float | None = None
+        error: Exception | None = None
+        try:
+            async for chunk in super()._acompletion(
+                model, prompt, api_base=endpoint.base_url, **kwargs
+            ):
+                if latency is None and streamed:
+                    latency = time.monotonic() - started_at
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.pool.release(endpoint, latency=latency, error=error)
+
+    def _release_acquired(self, acquiring: asyncio.Future):
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self.pool.release(acquiring.result())
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from logging import getLogger
+
+from rich import print
+from rich.progress import Progress, SpinnerColumn, TextColumn
+
+from ailingo.job import TranslationJob
+from ailingo.translator import Translator
+
+logger = getLogger(__name__)
+
+
+class FanOut:
+    """
+    Translates the same input into several target languages at the same time.
+
+    Each input is read once (see `CachedInputSource`), and the outputs are written in
+    the order of the jobs so that console output is not interleaved.
+    """
+
+    def __init__(self, translator: Translator) -> None:
+        self.translator = translator
+
+    def run(
+        self,
+        jobs: list[TranslationJob],
+        overwrite: bool = False,
+        quiet: bool = False,
+    ) -> list[TranslationJob]:
+        """
+        Translates the jobs and returns the ones that were saved.
+        """
+        dashboard = self.translator.dashboard
+        confirmed = [
+            job
+            for job in jobs
+            if self.translator.confirm_overwrite(job.output_source, overwrite)
+        ]
+        if dashboard:
+            dashboard.skip(len(jobs) - len(confirmed))
+        jobs = confirmed
+        # read before showing progress, as the editor needs the terminal
+        texts = [job.input_source.read() for job in jobs]
+        targets = ", ".join(job.target_language or "" for job in jobs)
+        logger.debug(f"Translating {len(jobs)} jobs concurrently ({targets})")
+
+        with (
+            Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                transient=True,
+                disable=dashboard is not None,
+            ) as progress,
+            ThreadPoolExecutor(
+                max_workers=max(1, min(len(jobs), self.translator.concurrency))
+            ) as executor,
+        ):
+            if not quiet and not dashboard:
+                progress.add_task(
+                    description=(
+                        f":writing_hand: [bold blue]Translating...[/bold blue] "
+                        f"[bright_black]{targets}[/bright_black]"
+                    ),
+                    total=None,
+                )
+            futures = [
+                executor.submit(
+                    self._translate,
+                    job,
+                    text,
+                )
+                for job, text in zip(jobs, texts)
+            ]
+            translations = [future.result() for future in futures]
+
+        for job, translation in zip(jobs, translations):
+            job.output_source.write(translation)
+            if not quiet:
+                print(
+                    f":white_check_mark: [bold green]Translated![/bold green] "
+                    f"[bright_black]{job.output_source.path}[/bright_black]"
+                )
+        return jobs
+
+    def _translate(self, job: TranslationJob, text: str) -> str:
+        dashboard = self.translator.dashboard
+        with dashboard.job(job.output_source.path) if dashboard else nullcontext():
+            return self.translator.translate_text(
+                input_source=job.input_source,
+                text=text,
+                source_language=job.source_language,
+                target_language=job.target_language,
+                request=job.request,
+                current_text=(
+                    job.output_source.read()
+                    if job.output_source.readable and job.output_source.exists()
+                    else None
+                ),
+            )
@@ -0,0 +1,140 @@
+import math
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+from logging import getLogger
+from typing import Iterable
+
+from ailingo.llm import LLM
+from ailingo.metrics import Metrics
+from ailingo.prompt import PromptBuilder
+from ailingo.utils import estimate_tokens
+
+logger = getLogger(__name__)
+
+# lines written as requested by the glossary prompt, possibly as list items
+_TERM_LINE = re.compile(r"^[\s*-]*`?(.+?)`?\s*=>\s*`?(.+?)`?\s*$")
+
+
+@dataclass
+class Glossary:
+    """
+    Key terms of a document and the translations chosen for them.
+    """
+
+    terms: dict[str, str] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.terms)
+
+    def __str__(self) -> str:
+        return "\n".join(
+            f"{term} => {translation}" for term, translation in self.terms.items()
+        )
+
+    @classmethod
+    def parse(cls, text: str, max_terms: int | None = None) -> "Glossary":
+        """
+        Parses `term => translation` lines, ignoring anything else.
+        """
+        terms: dict[str, str] = {}
+        for line in text.splitlines():
+            if match := _TERM_LINE.match(line):
+                terms.setdefault(match[1], match[2])
+        return cls(dict(islice(terms.items(), max_terms)))
+
+
+class GlossaryExtractor:
+    """
+    Lists the key terms of a document and their translations in one request before
+    its segments are translated in parallel, so that every segment uses the same
+    terminology without carrying the whole document as context.
+
+    Only up to `sample_tokens` (estimated) of the document are sent, taken from
+    segments spread over the document.
+    """
+
+    def __init__(
+        self,
+        llm: LLM,
+        prompt_builder: PromptBuilder | None = None,
+        max_terms: int = 30,
+        sample_tokens: int = 8000,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.llm = llm
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.max_terms = max_terms
+        self.sample_tokens = sample_tokens
+        self.metrics = metrics or Metrics()
+
+    def sample(self, segments: Iterable[str]) -> str:
+        """
+        Returns evenly spaced segments of a list, or the first segments of an iterator,
+        up to `sample_tokens`.
+        """
+        if isinstance(segments, list):
+            total = sum(estimate_tokens(segment) for segment in segments)
+            step = max(1, math.ceil(total / self.sample_tokens))
+            segments = segments[::step]
+        sampled: list[str] = []
+        tokens = 0
+        for segment in segments:
+            tokens += estimate_tokens(segment)
+            if sampled and tokens > self.sample_tokens:
+                break
+            sampled.append(segment)
+        return "".join(sampled)
+
+    def build_prompt(
+        self,
+        input_path: str,
+        segments: Iterable[str],
+        target_language: str,
+        source_language: str | None = None,
+        request: str | None = None,
+    ) -> list[dict[str, str]]:
+        return self.prompt_builder.build_glossary(
+            input_path=input_path,
+            input_text=self.sample(segments),
+            target_language=target_language,
+            source_language=source_language,
+            request=request,
+            max_terms=self.max_terms,
+        )
+
+    def parse(self, response: str) -> Glossary:
+        glossary = Glossary.parse(response, self.max_terms)
+        logger.debug(f"Glossary: {glossary.terms}")
+        self.metrics.incr("glossary.requests")
+        self.metrics.incr("glossary.terms", len(glossary.terms))
+        return glossary
+
+    def extract(
+        self,
+        input_path: str,
+        segments: Iterable[str],
+        target_language: str,
+        source_language: str | None = None,
+        request: str | None = None,
+    ) -> Glossary:
+        prompt = self.build_prompt(
+            input_path, segments, target_language, source_language, request
+        )
+        return self.parse(self.llm.completion(prompt))
+
+    async def aextract(
+        self,
+        input_path: str,
+        segments: Iterable[str],
+        target_language: str,
+        source_language: str | None = None,
+        request: str | None = None,
+    ) -> Glossary:
+        """
+        Async version of `extract`.
+        """
+        prompt = self.build_prompt(
+            input_path, segments, target_language, source_language, request
+        )
+        return self.parse(await self.llm.acompletion(prompt))
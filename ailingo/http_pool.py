@@ -0,0 +1,175 @@
+import asyncio
+from logging import getLogger
+from typing import AsyncIterator
+
+import httpx
+import litellm
+
+from ailingo.metrics import Metrics
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # pragma: no cover
+    h2 = None
+
+logger = getLogger(__name__)
+
+
+class HttpPool:
+    """
+    HTTP clients shared by all the requests of a run, so that connections (and their
+    TLS sessions) are kept alive and reused instead of being set up for every request.
+
+    HTTP/2 is used when the optional `h2` package is installed. New connections and
+    reused ones are counted in `metrics` as `http.connections` and `http.reused`.
+
+    Used as a context manager, the clients are closed on exit.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 600.0,
+        connect_timeout: float = 10.0,
+        http2: bool = True,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        if http2 and h2 is None:
+            logger.debug("h2 is not installed, using HTTP/1.1")
+        self.http2 = http2 and h2 is not None
+        self.metrics = metrics or Metrics()
+        self._client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._async_closer: AsyncIterator[None] | None = None
+
+    def __enter__(self) -> "HttpPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                follow_redirects=True,
+                event_hooks={"request": [self._trace_request]},
+            )
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # connections cannot be shared between event loops
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._close_async_client()
+            self._async_client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                follow_redirects=True,
+                event_hooks={"request": [self._atrace_request]},
+            )
+            self._async_loop = loop
+            # asyncio.run closes the async generators of its loop before closing the
+            # loop, the last moment the connections of the loop can be closed
+            self._async_closer = _close_with_loop(self._async_client)
+            asyncio.ensure_future(anext(self._async_closer))
+        return self._async_client
+
+    def install(self):
+        """
+        Makes litellm send its requests through the shared client.
+        """
+        litellm.client_session = self.client
+
+    def ainstall(self):
+        """
+        Makes litellm send its async requests through the shared client.
+        """
+        litellm.aclient_session = self.async_client
+
+    def close(self):
+        self._close_async_client()
+        if self._client is None:
+            return
+        if litellm.client_session is self._client:
+            litellm.client_session = None
+        self._client.close()
+        self._client = None
+
+    def _close_async_client(self):
+        """
+        Closes the async client on its event loop, unless the loop is already closed.
+        """
+        client, loop, closer = self._async_client, self._async_loop, self._async_closer
+        self._async_client = self._async_loop = self._async_closer = None
+        if client is None or loop is None or closer is None:
+            return
+        if litellm.aclient_session is client:
+            litellm.aclient_session = None
+        if client.is_closed:
+            return
+        if loop.is_closed():
+            logger.debug("The event loop of the async HTTP client is already closed")
+            return
+
+        async def aclose():
+            await closer.aclose()
+            await client.aclose()
+
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(aclose(), loop)
+        else:
+            loop.run_until_complete(aclose())
+
+    def _trace_request(self, request: httpx.Request):
+        trace = _ConnectionTrace(self.metrics)
+        request.extensions["trace"] = trace.event
+
+    async def _atrace_request(self, request: httpx.Request):
+        trace = _ConnectionTrace(self.metrics)
+        request.extensions["trace"] = trace.aevent
+
+
+async def _close_with_loop(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+class _ConnectionTrace:
+    """
+    Counts whether a request opened a connection, from the trace events of httpcore.
+    """
+
+    def __init__(self, metrics: Metrics) -> None:
+        self.metrics = metrics
+        self.connected = False
+
+    def event(self, name: str, info: dict):
+        if name == "connection.connect_tcp.complete":
+            self.connected = True
+            self.metrics.incr("http.connections")
+        elif name == "connection.start_tls.complete":
+            self.metrics.incr("http.tls_handshakes")
+        elif name.endswith(".send_request_headers.started"):
+            self.metrics.incr("http.requests")
+            if not self.connected:
+                self.metrics.incr("http.reused")
+
+    async def aevent(self, name: str, info: dict):
+        self.event(name, info)
@@ -1,4 +1,4 @@
-from typing import Protocol
+from typing import Iterator, Protocol, runtime_checkable
 
 
 class InputSource(Protocol):
@@ -6,3 +6,12 @@ class InputSource(Protocol):
 
     @property
     def path(self) -> str: ...
+
+
+@runtime_checkable
+class SegmentedInputSource(InputSource, Protocol):
+    """
+    Input source that can be read segment by segment without loading it at once.
+    """
+
+    def iter_segments(self, max_chars: int) -> Iterator[str]: ...
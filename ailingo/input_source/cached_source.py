@@ -0,0 +1,28 @@
+import threading
+from dataclasses import dataclass, field
+
+from ailingo.input_source import InputSource
+
+
+@dataclass
+class CachedInputSource:
+    """
+    Reads the wrapped input source only once, e.g. to download a page or open the
+    editor once for several target languages.
+    """
+
+    source: InputSource
+    _text: str | None = field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
+    @property
+    def path(self) -> str:
+        return self.source.path
+
+    def read(self) -> str:
+        with self._lock:
+            if self._text is None:
+                self._text = self.source.read()
+            return self._text
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from pathlib import Path
 
+from ailingo.profiling import spanned
+
 
 @dataclass
 class FileInputSource:
@@ -9,5 +11,6 @@ class FileInputSource:
     def __init__(self, file_path: Path | str):
         self.path = str(file_path)
 
+    @spanned("input.read")
     def read(self) -> str:
         return Path(self.path).read_text()
@@ -0,0 +1,94 @@
+import mmap
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from ailingo.profiling import iter_spans
+from ailingo.segmenter import find_cut
+
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+# bytes read past a segment without line breaks, to see where a URL or code span ends
+_LOOKAHEAD = 4096
+
+
+@dataclass
+class MmapFileInputSource:
+    """
+    File input source that reads segments from a memory-mapped file,
+    so that only the segments being processed are held in memory.
+    """
+
+    path: str
+    encoding: str = "utf-8"
+
+    def __init__(self, file_path: Path | str, encoding: str = "utf-8"):
+        self.path = str(file_path)
+        self.encoding = encoding
+
+    def read(self) -> str:
+        return "".join(self.iter_segments(DEFAULT_SEGMENT_SIZE))
+
+    def iter_segments(self, max_chars: int) -> Iterator[str]:
+        """
+        Yield segments of at most `max_chars` characters, split at paragraph or line
+        boundaries where possible.
+        """
+        return iter_spans(self._iter_segments(max_chars), "input.read")
+
+    def _iter_segments(self, max_chars: int) -> Iterator[str]:
+        if max_chars <= 0:
+            raise ValueError("max_chars must be positive")
+        with open(self.path, "rb") as f:
+            if Path(self.path).stat().st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start = 0
+                size = len(data)
+                while start < size:
+                    end = _find_boundary(
+                        data, start, min(start + max_chars, size), self.encoding
+                    )
+                    yield data[start:end].decode(self.encoding)
+                    start = end
+
+
+def _find_boundary(
+    data: mmap.mmap, start: int, end: int, encoding: str = "utf-8"
+) -> int:
+    """
+    Find where a segment starting at `start` should end, at most at `end` (in bytes).
+    """
+    if end >= len(data):
+        return end
+    for separator in (b"\n\n", b"\n"):
+        position = data.rfind(separator, start, end)
+        if position >= 0:
+            return position + len(separator)
+    # no line break in the window: cut after a sentence or word, outside of spans
+    # that are masked as a whole
+    boundary = _char_boundary(data, start, end)
+    if boundary > start:
+        window = data[start:boundary].decode(encoding)
+        text = data[
+            start : _char_boundary(
+                data, boundary, min(boundary + _LOOKAHEAD, len(data))
+            )
+        ].decode(encoding)
+        return start + len(text[: find_cut(text, len(window))].encode(encoding))
+    # the window is smaller than a single character
+    while end < len(data) and _is_continuation(data[end]):
+        end += 1
+    return end
+
+
+def _char_boundary(data: mmap.mmap, start: int, end: int) -> int:
+    """
+    Moves `end` back to the start of a UTF-8 character, but not before `start`.
+    """
+    while end > start and end < len(data) and _is_continuation(data[end]):
+        end -= 1
+    return end
+
+
+def _is_continuation(byte: int) -> bool:
+    return byte & 0b1100_0000 == 0b1000_0000
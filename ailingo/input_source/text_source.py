@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class TextInputSource:
+    """
+    Text that is already in memory, such as a record of a batch.
+    """
+
+    text: str
+    path: str = "(text)"
+
+    def read(self) -> str:
+        return self.text
@@ -3,6 +3,8 @@ from dataclasses import dataclass
 from requests_html import HTMLSession
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+from ailingo.profiling import spanned
+
 
 @dataclass
 class UrlInputSource:
@@ -14,20 +16,25 @@ class UrlInputSource:
         return str(self.url)
 
     def read(self) -> str:
+        if self.quiet:
+            return self._download()
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             transient=True,
         ) as progress:
-            if not self.quiet:
-                progress.add_task(
-                    description=(
-                        f":writing_hand: [bold blue]Downloading...[/bold blue] "
-                        f"[bright_black]{self.url}[/bright_black]"
-                    ),
-                    total=None,
-                )
-            session = HTMLSession()
-            response = session.get(self.url)
+            progress.add_task(
+                description=(
+                    f":writing_hand: [bold blue]Downloading...[/bold blue] "
+                    f"[bright_black]{self.url}[/bright_black]"
+                ),
+                total=None,
+            )
+            return self._download()
+
+    @spanned("input.read")
+    def _download(self) -> str:
+        session = HTMLSession()
+        response = session.get(self.url)
         response.raise_for_status()
         return response.html.text  # type: ignore
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+from ailingo.input_source import InputSource
+from ailingo.output_source import OutputSource
+
+
+@dataclass
+class TranslationJob:
+    input_source: InputSource
+    output_source: OutputSource
+    source_language: str | None = None
+    target_language: str | None = None
+    request: str | None = None
@@ -1,31 +1,392 @@
-from typing import Iterator, cast
+import asyncio
+import random
+import time
+from contextlib import nullcontext
+from logging import getLogger
+from typing import AsyncIterator, Iterator, cast
 
 import litellm
 from litellm.types.utils import ModelResponse
 
+from ailingo.adaptive import AdaptiveController
+from ailingo.cache.translation_cache import TranslationCache
+from ailingo.http_pool import HttpPool
+from ailingo.profiling import iter_spans, span
+from ailingo.utils import estimate_tokens
+
+logger = getLogger(__name__)
+
+CONTINUATION_PROMPT = """Your previous response was cut off. It ended with:
+----------
+{tail}
+----------
+Continue the output from exactly where it stopped. Do not repeat any text that was already output, and do not add any comments."""
+
+# beginning of a continuation that is checked for text repeated from the previous output
+OVERLAP_CHARS = 200
+
+TRANSIENT_ERRORS = (
+    litellm.APIConnectionError,
+    litellm.Timeout,
+    litellm.RateLimitError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+    ConnectionError,
+    TimeoutError,
+)
+
 
 class LLM:
     model_name: str
+    max_continuations: int
+    """Number of follow-up requests sent when the output hits the length limit."""
+    context_chars: int
+    """Number of characters of the output sent as context with follow-up requests."""
+    max_retries: int
+    """Number of times a request is resumed after a transient error."""
+    retry_backoff: float
+    controller: AdaptiveController | None
+    """Limits the requests in flight and observes their throughput, if set."""
+    cache: TranslationCache | None
+    """Responses reused for identical prompts, if set."""
 
-    def __init__(self, model_name: str) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        max_continuations: int = 3,
+        context_chars: int = 1000,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        controller: AdaptiveController | None = None,
+        http_pool: HttpPool | None = None,
+        cache: TranslationCache | None = None,
+    ) -> None:
         self.model_name = model_name
+        self.max_continuations = max_continuations
+        self.context_chars = context_chars
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.controller = controller
+        self.http_pool = http_pool
+        self.cache = cache
 
-    def _completion(self, model: str, prompt: str | list[dict]):
-        if isinstance(prompt, str):
-            messages = [{"content": prompt, "role": "user"}]
-        else:
-            messages = prompt
-        response = litellm.completion(model=model, messages=messages, stream=True)
-        return (cast(ModelResponse, chunk) for chunk in response)
+    @property
+    def http_pool(self) -> HttpPool | None:
+        """HTTP clients whose connections are reused across requests, if set."""
+        return self._http_pool
+
+    @http_pool.setter
+    def http_pool(self, http_pool: HttpPool | None) -> None:
+        # litellm sends all its requests through one global client
+        self._http_pool = http_pool
+        if http_pool:
+            http_pool.install()
+
+    def _completion(
+        self, model: str, prompt: str | list[dict], stream: bool = True, **kwargs
+    ) -> Iterator[ModelResponse]:
+        """
+        Yields the chunks of the response, or the whole response if `stream` is False.
+        """
+        messages = _to_messages(prompt)
+        controller = self.controller
+        with controller.track() if controller else nullcontext() as tracker:
+            # waiting for the provider until the first chunk, then receiving the rest
+            with span("llm.wait"):
+                response = litellm.completion(
+                    model=model, messages=messages, stream=stream, **kwargs
+                )
+            if stream:
+                for chunk in iter_spans(iter(response), "llm.wait", "llm.receive"):
+                    if tracker:
+                        tracker.received(_estimate_response_tokens(chunk))
+                    yield cast(ModelResponse, chunk)
+                return
+            if tracker:
+                tracker.received(_estimate_response_tokens(response))
+        # the slot is released before the whole response is handed over
+        yield cast(ModelResponse, response)
 
     def completion(self, prompt: str | list[dict]) -> str:
-        chunks = self._completion(self.model_name, prompt)
-        response = litellm.stream_chunk_builder(list(chunks))
-        return response.choices[0].message.content  # type: ignore
+        if (cached := self._cached(prompt)) is not None:
+            return cached
+        generated = ""
+        current_prompt = prompt
+        for _ in range(self.max_continuations + 1):
+            retries = 0
+            while True:
+                try:
+                    # the whole message is requested at once, without building it from chunks
+                    response = next(
+                        self._completion(self.model_name, current_prompt, stream=False)
+                    )
+                    break
+                except TRANSIENT_ERRORS as e:
+                    if retries >= self.max_retries:
+                        raise
+                    retries += 1
+                    self._wait_before_retry(e, retries)
+            choice = response.choices[0]  # type: ignore
+            generated += _trim_overlap(generated, choice.message.content or "")
+            if choice.finish_reason != "length":
+                return self._store(prompt, generated)
+            logger.debug("Output hit the length limit, requesting continuation")
+            current_prompt = self._continuation_prompt(prompt, generated)
+        # truncated output is returned, but not reused by later runs
+        logger.warning("Output is still truncated after the maximum continuations.")
+        return generated
 
     def iter_completion(self, prompt: str | list[dict]) -> Iterator[str]:
-        chunks = self._completion(self.model_name, prompt)
-        for chunk in chunks:
-            content = chunk.choices[0].delta.content  # type: ignore
-            if content is not None:
+        if (cached := self._cached(prompt)) is not None:
+            yield cached
+            return
+        generation = _Generation(self, prompt)
+        while True:
+            generation.begin()
+            error: Exception | None = None
+            try:
+                for chunk in self._completion(self.model_name, generation.prompt):
+                    if content := generation.feed(chunk):
+                        yield content
+            except TRANSIENT_ERRORS as e:
+                error = e
+            if content := generation.end():
                 yield content
+            delay = generation.advance(error)
+            if delay is None:
+                if not generation.truncated:
+                    self._store(prompt, generation.text)
+                return
+            time.sleep(delay)
+
+    async def _acompletion(
+        self, model: str, prompt: str | list[dict], stream: bool = True, **kwargs
+    ) -> AsyncIterator[ModelResponse]:
+        """
+        Async version of `_completion`.
+        """
+        messages = _to_messages(prompt)
+        if self.http_pool:
+            self.http_pool.ainstall()
+        response = await litellm.acompletion(
+            model=model, messages=messages, stream=stream, **kwargs
+        )
+        if not stream:
+            yield cast(ModelResponse, response)
+            return
+        async for chunk in response:  # type: ignore
+            yield cast(ModelResponse, chunk)
+
+    async def acompletion(self, prompt: str | list[dict]) -> str:
+        """
+        Async version of `completion`.
+        """
+        if (cached := self._cached(prompt)) is not None:
+            return cached
+        generated = ""
+        current_prompt = prompt
+        for _ in range(self.max_continuations + 1):
+            retries = 0
+            while True:
+                try:
+                    response = await anext(
+                        self._acompletion(self.model_name, current_prompt, stream=False)
+                    )
+                    break
+                except TRANSIENT_ERRORS as e:
+                    if retries >= self.max_retries:
+                        raise
+                    retries += 1
+                    await asyncio.sleep(self._retry_delay(e, retries))
+            choice = response.choices[0]  # type: ignore
+            generated += _trim_overlap(generated, choice.message.content or "")
+            if choice.finish_reason != "length":
+                return self._store(prompt, generated)
+            logger.debug("Output hit the length limit, requesting continuation")
+            current_prompt = self._continuation_prompt(prompt, generated)
+        # truncated output is returned, but not reused by later runs
+        logger.warning("Output is still truncated after the maximum continuations.")
+        return generated
+
+    async def aiter_completion(self, prompt: str | list[dict]) -> AsyncIterator[str]:
+        """
+        Async version of `iter_completion`.
+        """
+        if (cached := self._cached(prompt)) is not None:
+            yield cached
+            return
+        generation = _Generation(self, prompt)
+        while True:
+            generation.begin()
+            error: Exception | None = None
+            try:
+                async for chunk in self._acompletion(
+                    self.model_name, generation.prompt
+                ):
+                    if content := generation.feed(chunk):
+                        yield content
+            except TRANSIENT_ERRORS as e:
+                error = e
+            if content := generation.end():
+                yield content
+            delay = generation.advance(error)
+            if delay is None:
+                if not generation.truncated:
+                    self._store(prompt, generation.text)
+                return
+            await asyncio.sleep(delay)
+
+    def _cached(self, prompt: str | list[dict]) -> str | None:
+        if self.cache is None:
+            return None
+        return self.cache.get(self.cache.key(self.model_name, _to_messages(prompt)))
+
+    def evict(self, prompt: str | list[dict]):
+        """
+        Forgets the cached response to the prompt, once it turned out to be unusable.
+        """
+        if self.cache is not None:
+            self.cache.delete(self.cache.key(self.model_name, _to_messages(prompt)))
+
+    def _store(self, prompt: str | list[dict], text: str) -> str:
+        if self.cache is not None:
+            self.cache.put(self.cache.key(self.model_name, _to_messages(prompt)), text)
+        return text
+
+    def _wait_before_retry(self, error: Exception, retries: int):
+        time.sleep(self._retry_delay(error, retries))
+
+    def _retry_delay(self, error: Exception, retries: int) -> float:
+        # exponential backoff with full jitter
+        delay = random.uniform(0, self.retry_backoff * 2 ** (retries - 1))
+        logger.warning(
+            f"Request failed ({error}). Retrying in {delay:.1f}s "
+            f"({retries}/{self.max_retries})."
+        )
+        return delay
+
+    def _continuation_prompt(
+        self, prompt: str | list[dict], generated: str
+    ) -> list[dict]:
+        return _to_messages(prompt) + [
+            {
+                "role": "user",
+                "content": CONTINUATION_PROMPT.format(
+                    tail=generated[-self.context_chars :]
+                ),
+            }
+        ]
+
+
+class _Generation:
+    """
+    State of a streamed generation that may be continued after the length limit
+    or resumed after a transient error.
+    """
+
+    def __init__(self, llm: LLM, prompt: str | list[dict]) -> None:
+        self.llm = llm
+        self.original_prompt = prompt
+        self.prompt = prompt
+        self.tail = ""
+        self.continuations = 0
+        self.retries = 0
+        self.finish_reason: str | None = None
+        self.truncated = False
+        """Whether the output still hit the length limit after the last continuation."""
+        self._held: str | None = None
+        self._parts: list[str] = []
+
+    @property
+    def text(self) -> str:
+        """
+        The text output so far.
+        """
+        return "".join(self._parts)
+
+    def begin(self):
+        self.finish_reason = None
+        # hold back the beginning of a continuation until overlap is removed
+        self._held = "" if self.tail else None
+
+    def feed(self, chunk: ModelResponse) -> str:
+        """
+        Returns the new text of the chunk that can be output.
+        """
+        choice = chunk.choices[0]  # type: ignore
+        self.finish_reason = (
+            getattr(choice, "finish_reason", None) or self.finish_reason
+        )
+        content = choice.delta.content  # type: ignore
+        if not content:
+            return ""
+        if self._held is not None:
+            self._held += content
+            if len(self._held) < OVERLAP_CHARS:
+                return ""
+            content, self._held = _trim_overlap(self.tail, self._held), None
+        return self._append(content)
+
+    def end(self) -> str:
+        """
+        Returns the text that was still held back when the response ended.
+        """
+        held, self._held = self._held, None
+        if not held:
+            return ""
+        return self._append(_trim_overlap(self.tail, held))
+
+    def advance(self, error: Exception | None) -> float | None:
+        """
+        Prepares the follow-up request and returns the seconds to wait before it,
+        or None if the generation is complete.
+        """
+        if error is not None:
+            if self.retries >= self.llm.max_retries:
+                raise error
+            # resume from the received text instead of starting over
+            self.retries += 1
+            delay = self.llm._retry_delay(error, self.retries)
+        elif self.finish_reason != "length":
+            return None
+        elif self.continuations >= self.llm.max_continuations:
+            logger.warning("Output is still truncated after the maximum continuations.")
+            self.truncated = True
+            return None
+        else:
+            self.continuations += 1
+            logger.debug("Output hit the length limit, requesting continuation")
+            delay = 0.0
+        self.prompt = (
+            self.llm._continuation_prompt(self.original_prompt, self.tail)
+            if self.tail
+            else self.original_prompt
+        )
+        return delay
+
+    def _append(self, content: str) -> str:
+        self.tail = (self.tail + content)[-self.llm.context_chars :]
+        self._parts.append(content)
+        return content
+
+
+def _estimate_response_tokens(response) -> int:
+    choice = response.choices[0]
+    message = getattr(choice, "delta", None) or getattr(choice, "message", None)
+    return estimate_tokens(getattr(message, "content", None) or "")
+
+
+def _to_messages(prompt: str | list[dict]) -> list[dict]:
+    if isinstance(prompt, str):
+        return [{"content": prompt, "role": "user"}]
+    return prompt
+
+
+def _trim_overlap(previous: str, text: str, min_overlap: int = 8) -> str:
+    """
+    Remove the beginning of `text` if it repeats the end of `previous`.
+    """
+    for size in range(min(len(previous), len(text)), min_overlap - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:]
+    return text
@@ -0,0 +1,61 @@
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from ailingo.job import TranslationJob
+from ailingo.metrics import Metrics
+
+
+@dataclass
+class ManifestEntry:
+    input: str
+    output: str
+    target: str | None
+    status: str
+    """One of "translated", "skipped" or "planned" (dry run)."""
+
+
+@dataclass
+class Manifest:
+    """
+    Record of the jobs processed by a run (or a shard of a run) and its metrics.
+    """
+
+    shard: str | None = None
+    jobs: list[ManifestEntry] = field(default_factory=list)
+    metrics: dict[str, float] = field(default_factory=dict)
+
+    def add(self, job: TranslationJob, status: str):
+        self.jobs.append(
+            ManifestEntry(
+                input=job.input_source.path,
+                output=job.output_source.path,
+                target=job.target_language,
+                status=status,
+            )
+        )
+
+    def write(self, path: str | Path):
+        Path(path).write_text(json.dumps(asdict(self), indent=2, ensure_ascii=False))
+
+    @staticmethod
+    def load(path: str | Path) -> "Manifest":
+        data = json.loads(Path(path).read_text())
+        return Manifest(
+            shard=data.get("shard"),
+            jobs=[ManifestEntry(**job) for job in data.get("jobs", [])],
+            metrics=data.get("metrics", {}),
+        )
+
+    @staticmethod
+    def merge(manifests: list["Manifest"]) -> "Manifest":
+        """
+        Combine the manifests of all shards into one.
+        """
+        metrics = Metrics()
+        jobs: list[ManifestEntry] = []
+        for manifest in manifests:
+            metrics.merge(manifest.metrics)
+            jobs.extend(manifest.jobs)
+        jobs.sort(key=lambda job: (job.input, job.target or ""))
+        return Manifest(jobs=jobs, metrics=metrics.as_dict())
@@ -0,0 +1,120 @@
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+PLACEHOLDER_PATTERN = re.compile(r"⟦(\d+)⟧")
+
+# spans that must be kept verbatim, in order of precedence
+_MASKED_SPANS = re.compile(
+    r"(?P<fence>^(?P<marker>```|~~~)[^\n]*\n.*?^(?P=marker)[ \t]*$)"
+    r"|(?P<code>`[^`\n]+`)"
+    r"|(?P<url>\bhttps?://[^\s<>()\[\]`\"']*[^\s<>()\[\]`\"'.,;:!?])",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+class PlaceholderError(Exception):
+    """
+    Raised when placeholders are missing from the model output.
+    """
+
+
+@dataclass
+class MaskedText:
+    text: str
+    placeholders: dict[str, str] = field(default_factory=dict)
+
+
+def mask(text: str) -> MaskedText:
+    """
+    Replace code blocks, inline code and URLs with placeholders like ⟦0⟧.
+    """
+    placeholders: dict[str, str] = {}
+
+    def replace(match: re.Match) -> str:
+        placeholder = f"⟦{len(placeholders)}⟧"
+        placeholders[placeholder] = match.group(0)
+        return placeholder
+
+    if "⟦" in text:
+        # the text already contains placeholder-like markers, which would be ambiguous
+        return MaskedText(text)
+    return MaskedText(_MASKED_SPANS.sub(replace, text), placeholders)
+
+
+def masked_spans(text: str) -> list[tuple[int, int]]:
+    """
+    Returns the start and end of the spans that `mask` replaces.
+    """
+    return [match.span() for match in _MASKED_SPANS.finditer(text)]
+
+
+def unmask(text: str, placeholders: dict[str, str]) -> str:
+    """
+    Restore the original spans, making sure that every placeholder came back.
+    """
+    return "".join(iter_unmask([text], placeholders))
+
+
+def iter_unmask(chunks: Iterable[str], placeholders: dict[str, str]) -> Iterator[str]:
+    """
+    Restore the original spans in streamed output.
+
+    Text that may be the beginning of a placeholder is held back until the next chunk.
+    Raises `PlaceholderError` at the end if any placeholder is missing.
+    """
+    unmasker = Unmasker(placeholders)
+    for chunk in chunks:
+        if text := unmasker.feed(chunk):
+            yield text
+    if text := unmasker.finish():
+        yield text
+    unmasker.verify()
+
+
+class Unmasker:
+    """
+    Restores the original spans in output that arrives chunk by chunk.
+    """
+
+    def __init__(self, placeholders: dict[str, str]) -> None:
+        self.placeholders = placeholders
+        self._seen: set[str] = set()
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+        Returns the restored text that is ready to be output.
+        """
+        self._pending += chunk
+        start = self._pending.rfind("⟦")
+        if start >= 0 and "⟧" not in self._pending[start:]:
+            ready, self._pending = self._pending[:start], self._pending[start:]
+        else:
+            ready, self._pending = self._pending, ""
+        return PLACEHOLDER_PATTERN.sub(self._restore, ready)
+
+    def finish(self) -> str:
+        """
+        Returns the text that was held back at the end of the output.
+        """
+        text = PLACEHOLDER_PATTERN.sub(self._restore, self._pending)
+        self._pending = ""
+        return text
+
+    def verify(self):
+        """
+        Raises `PlaceholderError` if any placeholder is missing from the output.
+        """
+        missing = self.placeholders.keys() - self._seen
+        if missing:
+            raise PlaceholderError(
+                f"{len(missing)} placeholder(s) missing from output: {', '.join(sorted(missing))}"
+            )
+
+    def _restore(self, match: re.Match) -> str:
+        placeholder = match.group(0)
+        if placeholder not in self.placeholders:
+            return placeholder
+        self._seen.add(placeholder)
+        return self.placeholders[placeholder]
@@ -0,0 +1,66 @@
+import json
+import threading
+from pathlib import Path
+
+# computed from counters when read, so that they stay correct when runs are merged
+DERIVED_METRICS = {"dedup.ratio"}
+
+
+class Metrics:
+    """
+    Thread-safe counters and timings collected during a run.
+    """
+
+    def __init__(self) -> None:
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def update_max(self, name: str, value: float):
+        """
+        Keep the largest value seen. The name must end with `.max`.
+        """
+        with self._lock:
+            self._values[name] = max(self._values.get(name, value), value)
+
+    def observe(self, name: str, value: float):
+        """
+        Record a sample, keeping its count, sum and maximum.
+        """
+        with self._lock:
+            self._values[f"{name}.count"] = self._values.get(f"{name}.count", 0) + 1
+            self._values[f"{name}.sum"] = self._values.get(f"{name}.sum", 0) + value
+            self._values[f"{name}.max"] = max(
+                self._values.get(f"{name}.max", value), value
+            )
+
+    def get(self, name: str, default: float = 0) -> float:
+        return self.as_dict().get(name, default)
+
+    def merge(self, values: dict[str, float]):
+        """
+        Add metrics collected elsewhere (e.g. by another shard) to this one.
+        """
+        for name, value in values.items():
+            if name in DERIVED_METRICS:
+                continue
+            if name.endswith(".max"):
+                self.update_max(name, value)
+            else:
+                self.incr(name, value)
+
+    def as_dict(self) -> dict[str, float]:
+        with self._lock:
+            values = dict(self._values)
+        if segments := values.get("dedup.segments"):
+            # share of the segments that did not need a request of their own
+            values["dedup.ratio"] = (
+                1 - values.get("dedup.unique_segments", 0) / segments
+            )
+        return dict(sorted(values.items()))
+
+    def write(self, path: str | Path):
+        Path(path).write_text(json.dumps(self.as_dict(), indent=2))
@@ -4,6 +4,9 @@ from typing import Iterable
 from rich import print
 from rich.live import Live
 from rich.markdown import Markdown
+from rich.rule import Rule
+
+from ailingo.profiling import spanned
 
 
 @dataclass
@@ -11,11 +14,15 @@ class ConsoleOutputSource:
     path: str = "(console)"
     readable: bool = False
     markdown: bool = False
+    label: str | None = None
+    """Title printed above the output, e.g. when there are outputs for several languages."""
 
     def read(self) -> str:
         raise NotImplementedError("ConsoleOutputSource is not readable")
 
+    @spanned("output.write")
     def write_stream(self, text: Iterable[str]):
+        self._print_label()
         with Live(vertical_overflow="visible") as live:
             received_text = ""
             for chunk in text:
@@ -25,7 +32,9 @@ class ConsoleOutputSource:
                 else:
                     live.update(received_text)
 
+    @spanned("output.write")
     def write(self, text: str):
+        self._print_label()
         if self.markdown:
             print(Markdown(text))
         else:
@@ -33,3 +42,7 @@ class ConsoleOutputSource:
 
     def exists(self) -> bool:
         return False
+
+    def _print_label(self):
+        if self.label:
+            print(Rule(self.label))
@@ -1,7 +1,10 @@
+import tempfile
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable
 
+from ailingo.profiling import spanned
+
 
 @dataclass
 class FileOutputSource:
@@ -10,13 +13,30 @@ class FileOutputSource:
     def __init__(self, path: str | Path):
         self.path = str(path)
 
+    @spanned("output.write")
     def write(self, text: str):
         Path(self.path).write_text(text)
 
+    @spanned("output.write")
     def write_stream(self, text: Iterable[str]):
-        with Path(self.path).open("w") as f:
-            for chunk in text:
-                f.write(chunk)
+        """
+        Writes the chunks to a temporary file next to the output as they arrive, and
+        replaces the output only once all of them are written, so that a failed
+        translation leaves the previous output untouched.
+        """
+        path = Path(self.path)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+        ) as f:
+            temporary = Path(f.name)
+            try:
+                for chunk in text:
+                    f.write(chunk)
+            except BaseException:
+                f.close()
+                temporary.unlink()
+                raise
+        temporary.replace(path)
 
     def read(self) -> str:
         return Path(self.path).read_text()
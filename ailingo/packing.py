@@ -0,0 +1,144 @@
+import re
+from logging import getLogger
+
+from ailingo.input_source.text_source import TextInputSource
+from ailingo.masking import MaskedText, PlaceholderError, mask, unmask
+from ailingo.translator import Translator
+from ailingo.utils import estimate_tokens
+
+logger = getLogger(__name__)
+
+# marker lines written by `PromptBuilder.build_packed`
+_MARKER_LINE = re.compile(r"^[ \t]*⟪(\d+)⟫[ \t]*$\n?", re.MULTILINE)
+
+
+class RequestPacker:
+    """
+    Translates many short texts with the same language pair and request in a few
+    requests, by packing up to `max_tokens` (estimated) of texts into each prompt.
+
+    The response is split at the numbered markers. Texts whose translation is
+    missing, duplicated or lost a placeholder are packed and sent again, and after
+    `max_attempts` they are translated one by one.
+    """
+
+    def __init__(
+        self,
+        translator: Translator,
+        max_tokens: int = 2000,
+        max_items: int = 100,
+        max_attempts: int = 2,
+    ) -> None:
+        self.translator = translator
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.max_attempts = max_attempts
+        self.metrics = translator.metrics
+
+    def can_pack(self, text: str) -> bool:
+        return bool(text.strip()) and "⟪" not in text
+
+    def is_full(self, texts: list[str]) -> bool:
+        return (
+            len(texts) >= self.max_items
+            or sum(estimate_tokens(text) for text in texts) >= self.max_tokens
+        )
+
+    def translate(
+        self,
+        texts: list[str],
+        target_language: str,
+        source_language: str | None = None,
+        request: str | None = None,
+    ) -> list[str]:
+        results: list[str | None] = [None] * len(texts)
+        remaining = [index for index, text in enumerate(texts) if self.can_pack(text)]
+        for attempt in range(self.max_attempts):
+            if len(remaining) <= 1:
+                break
+            if attempt:
+                logger.debug(f"Sending {len(remaining)} texts again")
+                self.metrics.incr("packing.resent", len(remaining))
+            translations = self._translate_pack(
+                [texts[index] for index in remaining],
+                target_language,
+                source_language,
+                request,
+            )
+            for index, translation in zip(remaining, translations):
+                results[index] = translation
+            remaining = [index for index in remaining if results[index] is None]
+
+        for index, text in enumerate(texts):
+            if results[index] is None:
+                results[index] = self.translator.translate_text(
+                    input_source=TextInputSource(text),
+                    text=text,
+                    source_language=source_language,
+                    target_language=target_language,
+                    request=request,
+                )
+        return [result or "" for result in results]
+
+    def _translate_pack(
+        self,
+        texts: list[str],
+        target_language: str,
+        source_language: str | None,
+        request: str | None,
+    ) -> list[str | None]:
+        """
+        Returns the translation of each text, or None if it is not usable.
+        """
+        masked = [
+            mask(text) if self.translator.mask else MaskedText(text) for text in texts
+        ]
+        prompt = self.translator.prompt_builder.build_packed(
+            [item.text.strip() for item in masked],
+            target_language=target_language,
+            source_language=source_language,
+            request=request,
+        )
+        self.metrics.incr("packing.requests")
+        self.metrics.incr("packing.items", len(texts))
+        parts = _split(self.translator.llm.completion(prompt))
+
+        results: list[str | None] = []
+        for number, (text, item) in enumerate(zip(texts, masked), 1):
+            part = parts.get(number)
+            if not part:
+                results.append(None)
+                continue
+            try:
+                translation = unmask(part, item.placeholders)
+            except PlaceholderError:
+                results.append(None)
+                continue
+            stripped = text.strip()
+            start = text.index(stripped)
+            # keep the surrounding whitespace of the original text
+            results.append(text[:start] + translation + text[start + len(stripped) :])
+        missing = results.count(None)
+        if missing:
+            logger.warning(
+                f"{missing} of {len(texts)} packed translations are unusable"
+            )
+        return results
+
+
+def _split(response: str) -> dict[int, str]:
+    """
+    Split the response at the marker lines. Numbers that appear more than once are dropped.
+    """
+    markers = list(_MARKER_LINE.finditer(response))
+    parts: dict[int, str] = {}
+    duplicates: set[int] = set()
+    for marker, next_marker in zip(markers, markers[1:] + [None]):
+        number = int(marker.group(1))
+        end = next_marker.start() if next_marker else len(response)
+        if number in parts:
+            duplicates.add(number)
+        parts[number] = response[marker.end() : end].strip()
+    for number in duplicates:
+        del parts[number]
+    return parts
@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+from ailingo.metrics import Metrics
+
+_DONE = object()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+@dataclass
+class _Slot:
+    index: int
+    chunks: queue.Queue = field(default_factory=queue.Queue)
+    is_head: bool = False
+
+
+class OrderedPipeline:
+    """
+    Translates segments concurrently and yields the results in the original order.
+
+    The output of segment k is streamed as soon as segments 0..k-1 have been
+    yielded. Output of later segments that completes early is buffered, and workers
+    pause once more than `max_buffered_chars` characters are waiting.
+    """
+
+    def __init__(
+        self,
+        translate: Callable[[int, str], Iterable[str]],
+        concurrency: int = 4,
+        max_buffered_chars: int = 1_000_000,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.translate = translate
+        self.concurrency = max(1, concurrency)
+        self.max_buffered_chars = max_buffered_chars
+        self.metrics = metrics or Metrics()
+        self._condition = threading.Condition()
+        self._buffered_chars = 0
+        self._cancelled = False
+
+    def run(self, segments: Iterable[str]) -> Iterator[str]:
+        self._buffered_chars = 0
+        self._cancelled = False
+        started_at = time.monotonic()
+        first_byte = True
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        slots: deque[_Slot] = deque()
+        pending = enumerate(segments)
+
+        def submit_next() -> bool:
+            item = next(pending, None)
+            if item is None:
+                return False
+            slot = _Slot(item[0])
+            slots.append(slot)
+            executor.submit(self._work, slot, item[1])
+            return True
+
+        try:
+            while len(slots) < self.concurrency and submit_next():
+                pass
+            while slots:
+                head = slots[0]
+                with self._condition:
+                    head.is_head = True
+                    self._condition.notify_all()
+                while True:
+                    chunk, counted = head.chunks.get()
+                    if chunk is _DONE:
+                        break
+                    if isinstance(chunk, BaseException):
+                        raise chunk
+                    if counted:
+                        with self._condition:
+                            self._buffered_chars -= len(chunk)
+                            self._condition.notify_all()
+                    if first_byte and chunk:
+                        first_byte = False
+                        self.metrics.observe(
+                            "pipeline.ttfb_seconds", time.monotonic() - started_at
+                        )
+                    yield chunk
+                slots.popleft()
+                self.metrics.incr("pipeline.segments")
+                submit_next()
+        finally:
+            with self._condition:
+                self._cancelled = True
+                self._condition.notify_all()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.metrics.observe(
+                "pipeline.duration_seconds", time.monotonic() - started_at
+            )
+
+    def _work(self, slot: _Slot, segment: str):
+        try:
+            for chunk in self.translate(slot.index, segment):
+                self._put(slot, chunk)
+        except _Cancelled:
+            return
+        except BaseException as e:
+            slot.chunks.put((e, False))
+            return
+        slot.chunks.put((_DONE, False))
+
+    def _put(self, slot: _Slot, chunk: str):
+        with self._condition:
+            while (
+                not slot.is_head
+                and not self._cancelled
+                and self._buffered_chars >= self.max_buffered_chars
+            ):
+                self._condition.wait()
+            if self._cancelled:
+                raise _Cancelled()
+            counted = not slot.is_head
+            if counted:
+                self._buffered_chars += len(chunk)
+                self.metrics.update_max(
+                    "pipeline.buffered_chars.max", self._buffered_chars
+                )
+        slot.chunks.put((chunk, counted))
@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+
+from ailingo.job import TranslationJob
+from ailingo.output_source.console_source import ConsoleOutputSource
+
+OverwritePolicy = Literal["ask", "all", "none", "stale"]
+
+
+@dataclass
+class PlannedJob:
+    job: TranslationJob
+    exists: bool = False
+    """Whether the output already exists."""
+    stale: bool = False
+    """Whether the existing output is older than its input."""
+
+
+@dataclass
+class Plan:
+    """
+    All jobs of a run, compiled before anything is translated.
+    """
+
+    jobs: list[PlannedJob] = field(default_factory=list)
+    conflicts: dict[str, list[TranslationJob]] = field(default_factory=dict)
+    """Outputs written by more than one job, by path."""
+
+    @property
+    def existing(self) -> list[PlannedJob]:
+        return [planned for planned in self.jobs if planned.exists]
+
+    @property
+    def stale(self) -> list[PlannedJob]:
+        return [planned for planned in self.jobs if planned.stale]
+
+    def resolve(
+        self, policy: OverwritePolicy
+    ) -> tuple[list[TranslationJob], list[TranslationJob]]:
+        """
+        Returns the jobs to run and the jobs to skip under an overwrite policy:
+        "all" overwrites every existing output, "none" keeps them, and "stale" only
+        overwrites outputs that are older than their input.
+        """
+        if policy == "ask":
+            raise ValueError("The policy must be resolved before planning")
+        run: list[TranslationJob] = []
+        skip: list[TranslationJob] = []
+        for planned in self.jobs:
+            if (
+                not planned.exists
+                or policy == "all"
+                or (policy == "stale" and planned.stale)
+            ):
+                run.append(planned.job)
+            else:
+                skip.append(planned.job)
+        return run, skip
+
+
+def plan_jobs(jobs: list[TranslationJob]) -> Plan:
+    """
+    Checks which outputs exist or are stale, and which outputs several jobs would write.
+    """
+    plan = Plan()
+    by_output: dict[str, list[TranslationJob]] = {}
+    for job in jobs:
+        exists = job.output_source.exists()
+        plan.jobs.append(
+            PlannedJob(job=job, exists=exists, stale=exists and _is_stale(job))
+        )
+        # outputs printed to the console do not overwrite each other
+        if not isinstance(job.output_source, ConsoleOutputSource):
+            key = str(Path(job.output_source.path).resolve())
+            by_output.setdefault(key, []).append(job)
+    plan.conflicts = {
+        path: conflicting
+        for path, conflicting in by_output.items()
+        if len(conflicting) > 1
+    }
+    return plan
+
+
+def _is_stale(job: TranslationJob) -> bool:
+    input_path = Path(job.input_source.path)
+    output_path = Path(job.output_source.path)
+    if not input_path.is_file() or not output_path.is_file():
+        return False
+    if input_path.resolve() == output_path.resolve():
+        return False
+    return input_path.stat().st_mtime > output_path.stat().st_mtime
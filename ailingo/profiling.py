@@ -0,0 +1,211 @@
+import cProfile
+import functools
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, ParamSpec, TypeVar
+
+from rich.console import Console
+from rich.table import Table
+
+T = TypeVar("T")
+P = ParamSpec("P")
+
+_profiler: "Profiler | None" = None
+
+
+class Profiler:
+    """
+    Collects the wall and CPU time of named spans (see `span`) in every thread, and a
+    cProfile profile of the thread that enters it and of the threads started while
+    profiling (threads started before, like the workers of an existing pool, are only
+    measured by their spans).
+
+    The time of a span minus the time of the spans inside it is its own ("self") time.
+    Self time that was not spent on the CPU was spent waiting, mostly for the network.
+    """
+
+    def __init__(self) -> None:
+        # (span names from the outermost) -> [calls, wall seconds, cpu seconds]
+        self.stacks: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cprofile = cProfile.Profile()
+        self._thread_profiles: list[cProfile.Profile] = []
+
+    def __enter__(self) -> "Profiler":
+        global _profiler
+        _profiler = self
+        # cProfile only profiles the thread that enables it
+        threading.setprofile(self._profile_thread)
+        self._cprofile.enable()
+        return self
+
+    def __exit__(self, *args):
+        global _profiler
+        self._cprofile.disable()
+        threading.setprofile(None)
+        _profiler = None
+
+    def _profile_thread(self, *args):
+        """
+        Called in each new thread before it runs, enables a profiler for the thread.
+        """
+        thread_profile = cProfile.Profile()
+        with self._lock:
+            self._thread_profiles.append(thread_profile)
+        thread_profile.enable()
+
+    @property
+    def _stack(self) -> list[str]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        stack = self._stack
+        stack.append(name)
+        path = tuple(stack)
+        started_at = time.perf_counter()
+        cpu_started_at = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started_at
+            cpu = time.thread_time() - cpu_started_at
+            stack.pop()
+            with self._lock:
+                stats = self.stacks.setdefault(path, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += wall
+                stats[2] += cpu
+
+    def self_times(self) -> dict[tuple[str, ...], tuple[float, float]]:
+        """
+        Returns the self wall and CPU seconds of each stack.
+        """
+        with self._lock:
+            stacks = {path: list(stats) for path, stats in self.stacks.items()}
+        times = {path: [stats[1], stats[2]] for path, stats in stacks.items()}
+        for path, stats in stacks.items():
+            parent = times.get(path[:-1])
+            if parent is not None:
+                parent[0] -= stats[1]
+                parent[1] -= stats[2]
+        return {
+            path: (max(wall, 0.0), max(cpu, 0.0)) for path, (wall, cpu) in times.items()
+        }
+
+    def summary(self) -> Table:
+        calls: dict[str, int] = {}
+        totals: dict[str, list[float]] = {}
+        for path, stats in self.stacks.items():
+            calls[path[-1]] = calls.get(path[-1], 0) + int(stats[0])
+        for path, (wall, cpu) in self.self_times().items():
+            total = totals.setdefault(path[-1], [0.0, 0.0])
+            total[0] += wall
+            total[1] += cpu
+
+        table = Table(title="Profile (self time)")
+        table.add_column("Span")
+        table.add_column("Calls", justify="right")
+        table.add_column("Wall (s)", justify="right")
+        table.add_column("CPU (s)", justify="right")
+        table.add_column("Waiting (s)", justify="right")
+        for name, (wall, cpu) in sorted(
+            totals.items(), key=lambda item: item[1][0], reverse=True
+        ):
+            table.add_row(
+                name,
+                str(calls[name]),
+                f"{wall:.3f}",
+                f"{cpu:.3f}",
+                f"{max(wall - cpu, 0.0):.3f}",
+            )
+        return table
+
+    def write(self, path: str | Path):
+        """
+        Writes the cProfile stats of all the profiled threads to `path` (for snakeviz,
+        speedscope etc.), and the
+        spans as folded stacks in microseconds to `path` with a `.folded` suffix (for
+        flamegraph.pl, speedscope etc.).
+        """
+        path = Path(path)
+        stats = pstats.Stats(self._cprofile)
+        with self._lock:
+            for thread_profile in self._thread_profiles:
+                stats.add(thread_profile)
+        stats.dump_stats(path)
+        lines = [
+            f"{';'.join(stack)} {round(wall * 1_000_000)}"
+            for stack, (wall, _) in sorted(self.self_times().items())
+        ]
+        path.with_suffix(".folded").write_text("\n".join(lines) + "\n")
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Measures the block as a span if profiling is enabled, and does nothing otherwise.
+    """
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    with profiler.span(name):
+        yield
+
+
+def spanned(name: str) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    """
+    Decorator that measures each call of the function as a span.
+    """
+
+    def decorator(func: Callable[P, T]) -> Callable[P, T]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+_END = object()
+
+
+def iter_spans(
+    iterator: Iterator[T], first: str, rest: str | None = None
+) -> Iterator[T]:
+    """
+    Measures the time spent waiting for each item of an iterator: the first item as
+    `first` and the others as `rest`. The time spent by the consumer is not included.
+    """
+    name = first
+    while True:
+        with span(name):
+            item = next(iterator, _END)
+        if item is _END:
+            return
+        yield item  # type: ignore
+        name = rest or first
+
+
+@contextmanager
+def profile(path: str | Path, console: Console | None = None) -> Iterator[Profiler]:
+    """
+    Profiles the block as a "run" span, then writes the profile to `path` and prints
+    a summary, also when the block fails.
+    """
+    profiler = Profiler()
+    try:
+        with profiler, profiler.span("run"):
+            yield profiler
+    finally:
+        profiler.write(path)
+        (console or Console(stderr=True)).print(profiler.summary())
@@ -2,6 +2,11 @@ from pathlib import Path
 
 import jinja2
 
+from ailingo.masking import PLACEHOLDER_PATTERN
+from ailingo.profiling import spanned
+
+PACK_MARKER = "⟪{}⟫"
+
 
 class PromptBuilder:
     def __init__(self):
@@ -9,6 +14,7 @@ class PromptBuilder:
             loader=jinja2.FileSystemLoader(searchpath=Path(__file__).parent / "prompts")
         )
 
+    @spanned("prompt.build")
     def build(
         self,
         input_path: str,
@@ -17,6 +23,7 @@ class PromptBuilder:
         target_language: str | None = None,
         request: str | None = None,
         current_text: str | None = None,
+        glossary: str | None = None,
     ) -> list[dict[str, str]]:
         """
         Build prompt for translation or rewrite.
@@ -30,6 +37,75 @@ class PromptBuilder:
             target_language=target_language,
             request=request,
             current_text=current_text,
+            glossary=glossary,
+            has_placeholders=PLACEHOLDER_PATTERN.search(input_text) is not None,
+        )
+
+        template = self.jinja_env.get_template("user.j2")
+        user_prompt = template.render(
+            input_text=input_text,
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    @spanned("prompt.build")
+    def build_packed(
+        self,
+        input_texts: list[str],
+        target_language: str,
+        source_language: str | None = None,
+        request: str | None = None,
+    ) -> list[dict[str, str]]:
+        """
+        Build prompt for translating several short texts in one request.
+        Each text is preceded by a numbered marker line (see `PACK_MARKER`).
+        """
+
+        template = self.jinja_env.get_template("translate_packed.j2")
+        system_prompt = template.render(
+            source_language=source_language,
+            target_language=target_language,
+            request=request,
+            has_placeholders=any(
+                PLACEHOLDER_PATTERN.search(text) for text in input_texts
+            ),
+        )
+
+        template = self.jinja_env.get_template("user.j2")
+        user_prompt = template.render(
+            input_text="\n".join(
+                f"{PACK_MARKER.format(number)}\n{text}"
+                for number, text in enumerate(input_texts, 1)
+            ),
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    @spanned("prompt.build")
+    def build_glossary(
+        self,
+        input_path: str,
+        input_text: str,
+        target_language: str,
+        source_language: str | None = None,
+        request: str | None = None,
+        max_terms: int = 30,
+    ) -> list[dict[str, str]]:
+        """
+        Build prompt for listing the key terms of a file and their translations.
+        """
+
+        template = self.jinja_env.get_template("glossary.j2")
+        system_prompt = template.render(
+            input_path=Path(input_path),
+            source_language=source_language,
+            target_language=target_language,
+            request=request,
+            max_terms=max_terms,
         )
 
         template = self.jinja_env.get_template("user.j2")
@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import AsyncIterator, Iterator
+
+from litellm.types.utils import ModelResponse
+
+from ailingo.llm import LLM
+
+logger = getLogger(__name__)
+
+# models that answered the requests of the completion in progress (per thread or task)
+_answered_by: ContextVar[set[str] | None] = ContextVar("answered_by", default=None)
+
+
+@dataclass
+class _Attempt:
+    model: str
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+
+class HedgedLLM(LLM):
+    """
+    LLM that routes requests over an ordered list of models (or deployments).
+
+    The first model is tried first. If it does not start streaming within
+    `hedge_after` seconds, a hedge request is sent to the next model, and whichever
+    streams first wins while the others are cancelled. Errors fall back to the next model.
+
+    Responses are always streamed, as the time to the first chunk of a whole response
+    is the time to generate all of it. Requests that are not streamed, and async
+    requests, are only sent to the next model on errors.
+
+    Only responses of the first model are cached, as cache entries are keyed by it.
+    """
+
+    model_names: list[str]
+    hedge_after: float | None
+
+    def __init__(
+        self, model_names: list[str], hedge_after: float | None = 10.0
+    ) -> None:
+        if not model_names:
+            raise ValueError("At least one model must be specified.")
+        super().__init__(model_names[0])
+        self.model_names = model_names
+        self.hedge_after = hedge_after
+
+    def completion(self, prompt: str | list[dict]) -> str:
+        return "".join(self.iter_completion(prompt))
+
+    def _cached(self, prompt: str | list[dict]) -> str | None:
+        # every completion starts by looking up the cache
+        _answered_by.set(set())
+        return super()._cached(prompt)
+
+    def _store(self, prompt: str | list[dict], text: str) -> str:
+        if (_answered_by.get() or set()) - {self.model_name}:
+            logger.debug("Not caching a response from a fallback model")
+            return text
+        return super()._store(prompt, text)
+
+    def _answered(self, model: str):
+        if (models := _answered_by.get()) is not None:
+            models.add(model)
+
+    def _completion(
+        self, model: str, prompt: str | list[dict], **kwargs
+    ) -> Iterator[ModelResponse]:
+        hedge_after = self.hedge_after if kwargs.get("stream", True) else None
+        candidates = [model] + [name for name in self.model_names if name != model]
+        results: queue.Queue = queue.Queue()
+        attempts: list[_Attempt] = []
+        # a response is either handed over before the winner is chosen, or closed
+        handover = threading.Lock()
+
+        def run(attempt: _Attempt):
+            chunks = super(HedgedLLM, self)._completion(attempt.model, prompt, **kwargs)
+            try:
+                first = next(chunks, None)
+            except Exception as e:
+                results.put((attempt, None, None, e))
+                return
+            with handover:
+                if not attempt.cancelled.is_set():
+                    results.put((attempt, first, chunks, None))
+                    return
+            # another model has already won the race
+            logger.debug(f"Cancelled hedged request to {attempt.model}")
+            chunks.close()
+
+        def launch() -> float:
+            attempt = _Attempt(candidates[len(attempts)])
+            attempts.append(attempt)
+            logger.debug(f"Sending request to {attempt.model}")
+            threading.Thread(target=run, args=(attempt,), daemon=True).start()
+            return time.monotonic()
+
+        launched_at = launch()
+        pending = 1
+        last_error: Exception | None = None
+        while pending:
+            timeout = None
+            if hedge_after is not None and len(attempts) < len(candidates):
+                timeout = max(0.0, launched_at + hedge_after - time.monotonic())
+            try:
+                attempt, first, chunks, error = results.get(timeout=timeout)
+            except queue.Empty:
+                logger.debug(
+                    f"No response within {hedge_after}s, hedging to {candidates[len(attempts)]}"
+                )
+                launched_at = launch()
+                pending += 1
+                continue
+
+            pending -= 1
+            if error is not None:
+                logger.debug(f"Request to {attempt.model} failed: {error}")
+                last_error = error
+                if len(attempts) < len(candidates):
+                    launched_at = launch()
+                    pending += 1
+                continue
+
+            with handover:
+                for other in attempts:
+                    if other is not attempt:
+                        other.cancelled.set()
+            self._drain_losers(results)
+            logger.debug(f"Using response from {attempt.model}")
+            self._answered(attempt.model)
+            return self._resume(first, chunks)
+
+        assert last_error is not None
+        raise last_error
+
+    async def _acompletion(
+        self, model: str, prompt: str | list[dict], **kwargs
+    ) -> AsyncIterator[ModelResponse]:
+        """
+        Async version of `_completion`, falling back to the next model on errors
+        without hedging.
+        """
+        candidates = [model] + [name for name in self.model_names if name != model]
+        for index, candidate in enumerate(candidates):
+            logger.debug(f"Sending request to {candidate}")
+            chunks = super()._acompletion(candidate, prompt, **kwargs)
+            try:
+                first = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                if index == len(candidates) - 1:
+                    raise
+                logger.debug(f"Request to {candidate} failed: {e}")
+                continue
+            self._answered(candidate)
+            yield first
+            async for chunk in chunks:
+                yield chunk
+            return
+
+    @staticmethod
+    def _drain_losers(results: queue.Queue):
+        """
+        Close streams of requests that were handed over before the winner was chosen.
+        """
+        while True:
+            try:
+                _, _, chunks, _ = results.get_nowait()
+            except queue.Empty:
+                return
+            if chunks is not None:
+                chunks.close()
+
+    @staticmethod
+    def _resume(
+        first: ModelResponse | None, chunks: Iterator[ModelResponse]
+    ) -> Iterator[ModelResponse]:
+        if first is None:
+            return
+        yield first
+        yield from chunks
@@ -0,0 +1,68 @@
+from fnmatch import fnmatch
+from pathlib import Path, PurePath
+from typing import Literal
+
+from ailingo.job import TranslationJob
+from ailingo.prompt import PromptBuilder
+from ailingo.utils import estimate_tokens
+
+ScheduleOrder = Literal["input", "largest", "shortest"]
+
+
+def estimate_job_tokens(job: TranslationJob, prompt_builder: PromptBuilder) -> int:
+    """
+    Estimate the number of tokens of the prompt that translates the job.
+
+    The text of a file input is estimated from the size of the file, without reading
+    it. Other inputs (e.g. a downloaded page) are read.
+    """
+    path = Path(job.input_source.path)
+    from_file = path.is_file()
+    prompt = prompt_builder.build(
+        input_path=job.input_source.path,
+        input_text="" if from_file else job.input_source.read(),
+        source_language=job.source_language,
+        target_language=job.target_language,
+        request=job.request,
+    )
+    tokens = sum(estimate_tokens(message["content"]) for message in prompt)
+    if from_file:
+        tokens += (path.stat().st_size + 3) // 4
+    return tokens
+
+
+def priority_of(job: TranslationJob, priorities: list[str]) -> int:
+    """
+    Returns the index of the first pattern matching the input path (relative patterns
+    match from the right, like `PurePath.match`), or the number of patterns if none
+    matches. Lower values run first.
+    """
+    path = PurePath(job.input_source.path)
+    for index, pattern in enumerate(priorities):
+        if path.match(pattern) or fnmatch(path.as_posix(), pattern):
+            return index
+    return len(priorities)
+
+
+def schedule(
+    jobs: list[TranslationJob],
+    order: ScheduleOrder = "input",
+    priorities: list[str] | None = None,
+    prompt_builder: PromptBuilder | None = None,
+) -> list[TranslationJob]:
+    """
+    Order the jobs by priority, then by the estimated size of their prompts.
+
+    "largest" starts the largest jobs first, so that a long document started last does
+    not hold up the end of a parallel run. "shortest" finishes as many jobs as early
+    as possible. "input" keeps the order of the inputs within a priority.
+    """
+    priorities = priorities or []
+    if order == "input":
+        return sorted(jobs, key=lambda job: priority_of(job, priorities))
+    prompt_builder = prompt_builder or PromptBuilder()
+    sizes = {id(job): estimate_job_tokens(job, prompt_builder) for job in jobs}
+    sign = -1 if order == "largest" else 1
+    return sorted(
+        jobs, key=lambda job: (priority_of(job, priorities), sign * sizes[id(job)])
+    )
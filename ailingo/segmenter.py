@@ -0,0 +1,92 @@
+import re
+
+from ailingo.masking import masked_spans
+
+_SENTENCE_END = re.compile(r"[.!?]\s+|[。！？]\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def split_text(text: str, max_chars: int) -> list[str]:
+    """
+    Split text into segments of at most `max_chars` characters.
+
+    Segments are split at paragraph boundaries where possible, then at line
+    boundaries, and only then in the middle of a line (see `find_cut`). Joining
+    the segments gives back the original text.
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars must be positive")
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    segments: list[str] = []
+    current = ""
+    for block in split_paragraphs(text):
+        if len(block) > max_chars:
+            pieces = [
+                piece
+                for line in _split_keep(block, "\n")
+                for piece in _hard_split(line, max_chars)
+            ]
+        else:
+            pieces = [block]
+        for piece in pieces:
+            if current and len(current) + len(piece) > max_chars:
+                segments.append(current)
+                current = ""
+            current += piece
+    if current:
+        segments.append(current)
+    return segments
+
+
+def split_paragraphs(text: str) -> list[str]:
+    """
+    Split text into paragraphs, keeping the blank lines at the end of each paragraph.
+    """
+    return _split_keep(text, "\n\n")
+
+
+def _split_keep(text: str, separator: str) -> list[str]:
+    """
+    Split text after each separator, keeping the separator at the end of each part.
+    """
+    parts = text.split(separator)
+    return [part + separator for part in parts[:-1]] + (
+        [parts[-1]] if parts[-1] else []
+    )
+
+
+def find_cut(text: str, max_chars: int) -> int:
+    """
+    Returns where to cut a line longer than `max_chars`: after the last sentence or
+    word within the limit, and never inside a URL or code span, which are masked
+    as a whole. A span that does not fit is kept in one piece, beyond the limit.
+    """
+    spans = masked_spans(text)
+
+    def allowed(position: int) -> bool:
+        return not any(start < position < end for start, end in spans)
+
+    # a sentence end is only used if it does not leave a much shorter piece
+    for pattern, min_cut in ((_SENTENCE_END, max_chars // 2), (_WHITESPACE, 1)):
+        cuts = [
+            match.end()
+            for match in pattern.finditer(text, 0, max_chars)
+            if match.end() >= min_cut and allowed(match.end())
+        ]
+        if cuts:
+            return cuts[-1]
+    for start, end in spans:
+        if start < max_chars < end:
+            return start if start > 0 else end
+    return max_chars
+
+
+def _hard_split(text: str, max_chars: int) -> list[str]:
+    pieces: list[str] = []
+    while len(text) > max_chars:
+        cut = find_cut(text, max_chars)
+        pieces.append(text[:cut])
+        text = text[cut:]
+    return pieces + ([text] if text else [])
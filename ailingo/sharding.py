@@ -0,0 +1,44 @@
+import hashlib
+import os
+from pathlib import Path, PurePath
+
+from ailingo.job import TranslationJob
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parse a shard specification like "2/4" into (index, count). Indexes start at 1.
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}. Expected a value like 1/4.")
+    if not 1 <= index <= count:
+        raise ValueError(
+            f"Invalid shard {value!r}. Index must be between 1 and {count}."
+        )
+    return index, count
+
+
+def shard_of(job: TranslationJob, count: int) -> int:
+    """
+    Assign a job to a shard (1 to `count`).
+
+    The assignment only depends on the input path (relative to the working directory,
+    however it was written) and target language, so adding or removing other files
+    does not move jobs between shards.
+    """
+    key = f"{_normalize(job.input_source.path)}\0{job.target_language or ''}"
+    digest = hashlib.sha256(key.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def _normalize(path: str) -> str:
+    if "://" in path:
+        return path
+    try:
+        path = os.path.relpath(Path(path).resolve())
+    except ValueError:
+        # on another drive than the working directory (Windows)
+        path = str(Path(path).resolve())
+    return PurePath(path).as_posix()
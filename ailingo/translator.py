@@ -1,14 +1,31 @@
+import asyncio
+from contextlib import contextmanager, nullcontext
 from logging import getLogger
-from typing import Iterator
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, Iterator, cast
 
 from rich import print
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.prompt import Confirm
 
-from ailingo.input_source import InputSource
+from ailingo.adaptive import AdaptiveController
+from ailingo.dashboard import Dashboard
+from ailingo.glossary import Glossary, GlossaryExtractor
+from ailingo.input_source import InputSource, SegmentedInputSource
+from ailingo.job import TranslationJob
 from ailingo.llm import LLM
+from ailingo.masking import (
+    MaskedText,
+    PlaceholderError,
+    mask,
+    unmask,
+)
+from ailingo.metrics import Metrics
 from ailingo.output_source import OutputSource
+from ailingo.pipeline import OrderedPipeline
 from ailingo.prompt import PromptBuilder
+from ailingo.segmenter import split_text
+from ailingo.utils import estimate_tokens
 
 logger = getLogger(__name__)
 
@@ -19,10 +36,40 @@ class Translator:
         model_name: str,
         llm: LLM | None = None,
         prompt_builder: PromptBuilder | None = None,
+        chunk_size: int | None = None,
+        concurrency: int = 1,
+        metrics: Metrics | None = None,
+        mask: bool = False,
+        controller: AdaptiveController | None = None,
     ) -> None:
         self.llm = llm or LLM(model_name)
         self.model_name = model_name
         self.prompt_builder = prompt_builder or PromptBuilder()
+        self.controller = controller
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.metrics = metrics or Metrics()
+        self.mask = mask
+        self.dashboard: Dashboard | None = None
+        """Shows the progress of all jobs of a run instead of a spinner per job, if set."""
+        self.glossary: GlossaryExtractor | None = None
+        """Lists the key terms of a document before its segments are translated, if set."""
+        self._glossaries: dict[tuple[str, str | None], Glossary] = {}
+        if controller:
+            # the controller limits the requests in flight, so workers are sized for its maximum
+            self.llm.controller = controller
+            controller.metrics = self.metrics
+            self.concurrency = max(concurrency, controller.max_concurrency)
+
+    @property
+    def chunk_size(self) -> int | None:
+        if self.controller and self.controller.chunk_size:
+            return self.controller.chunk_size
+        return self._chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, chunk_size: int | None):
+        self._chunk_size = chunk_size
 
     def translate(
         self,
@@ -35,9 +82,10 @@ class Translator:
         request: str | None = None,
         quiet: bool = False,
         stream: bool | None = None,
-    ) -> None:
+    ) -> bool:
         """
         Reads the specified file, performs translation, and saves the result.
+        Returns False if nothing was saved (dry run or skipped).
         """
 
         if dryrun:
@@ -50,55 +98,214 @@ class Translator:
                 print(
                     f"[bold blue][DRY RUN][/bold blue] Rewriting {input_source.path} and saving to {output_source.path}."
                 )
-            return
+            return False
+
+        # very large inputs are translated segment by segment without reading them at once
+        segmented_input = self._is_segmented_input(input_source, output_source)
+        stream_output = bool(stream or segmented_input)
 
         current_content: str | None = None
         if output_source.exists():
-            if not overwrite:
-                overwrite = Confirm.ask(
-                    f"{output_source.path} already exists. Do you want to overwrite?",
-                    default=True,
-                )
-                if not overwrite:
-                    print(f"[yellow]Skipping saving to {output_source.path}.[/yellow]")
-                    return
-            if output_source.readable:
+            if not self.confirm_overwrite(output_source, overwrite):
+                if self.dashboard:
+                    self.dashboard.skip()
+                return False
+            if output_source.readable and not segmented_input:
                 current_content = output_source.read()
 
-        content = input_source.read()
+        job = (
+            self.dashboard.job(output_source.path) if self.dashboard else nullcontext()
+        )
+        with job, self._glossary_scope(input_source, target_language):
+            segments: Iterable[str]
+            if isinstance(input_source, SegmentedInputSource) and segmented_input:
+                content = ""
+                segments = input_source.iter_segments(cast(int, self.chunk_size))
+            else:
+                content = input_source.read()
+                segments = (
+                    split_text(content, self.chunk_size) if self.chunk_size else []
+                )
+
+            with self._progress(output_source.path, quiet):
+                if segmented_input or len(cast(list[str], segments)) > 1:
+                    if self.glossary and target_language:
+                        self._glossaries[(input_source.path, target_language)] = (
+                            self.glossary.extract(
+                                input_source.path,
+                                # a second pass over the input, as segments are streamed
+                                cast(SegmentedInputSource, input_source).iter_segments(
+                                    cast(int, self.chunk_size)
+                                )
+                                if segmented_input
+                                else segments,
+                                target_language,
+                                source_language,
+                                request,
+                            )
+                        )
+                    translated_text = self._translate_segments(
+                        input_source=input_source,
+                        segments=segments,
+                        current_text=current_content,
+                        source_language=source_language,
+                        target_language=target_language,
+                        request=request,
+                        stream=stream_output,
+                    )
+                else:
+                    translated_text = self._translate_text(
+                        input_source=input_source,
+                        text=content,
+                        current_text=current_content,
+                        source_language=source_language,
+                        target_language=target_language,
+                        request=request,
+                        stream=stream_output,
+                    )
+
+            if self.dashboard:
+                translated_text = self.dashboard.count_tokens(translated_text)
+            if stream_output:
+                output_source.write_stream(translated_text)
+            else:
+                output_source.write("".join(translated_text))
+
+        if not quiet:
+            print(
+                f":white_check_mark: [bold green]Translated![/bold green] "
+                f"[bright_black]{output_source.path}[/bright_black]"
+            )
+        return True
+
+    def confirm_overwrite(self, output_source: OutputSource, overwrite: bool) -> bool:
+        """
+        Asks whether an existing output may be overwritten, unless `overwrite` is set.
+        """
+        if overwrite or not output_source.exists():
+            return True
+        with self.dashboard.paused() if self.dashboard else nullcontext():
+            confirmed = Confirm.ask(
+                f"{output_source.path} already exists. Do you want to overwrite?",
+                default=True,
+            )
+        if confirmed:
+            return True
+        print(f"[yellow]Skipping saving to {output_source.path}.[/yellow]")
+        return False
 
+    def translate_text(
+        self,
+        input_source: InputSource,
+        text: str,
+        source_language: str | None = None,
+        target_language: str | None = None,
+        request: str | None = None,
+        current_text: str | None = None,
+    ) -> str:
+        """
+        Translates the specified text without reading or writing any source.
+        Texts longer than `chunk_size` are translated in segments, as by `translate`.
+        """
+        segments = split_text(text, self.chunk_size) if self.chunk_size else []
+        if len(segments) > 1:
+            chunks = self._translate_segments(
+                input_source=input_source,
+                segments=segments,
+                current_text=current_text,
+                source_language=source_language,
+                target_language=target_language,
+                request=request,
+            )
+        else:
+            chunks = self._translate_text(
+                input_source=input_source,
+                text=text,
+                current_text=current_text,
+                source_language=source_language,
+                target_language=target_language,
+                request=request,
+            )
+        translation = "".join(chunks)
+        if self.dashboard:
+            self.dashboard.add_tokens(estimate_tokens(translation))
+        return translation
+
+    @contextmanager
+    def _glossary_scope(
+        self, input_source: InputSource, target_language: str | None
+    ) -> Iterator[None]:
+        """
+        Forgets the glossary of a document once it has been translated.
+        """
+        try:
+            yield
+        finally:
+            self._glossaries.pop((input_source.path, target_language), None)
+
+    @contextmanager
+    def _progress(self, path: str, quiet: bool) -> Iterator[None]:
+        """
+        Shows a spinner while a job is translated, unless the dashboard shows it.
+        """
+        if self.dashboard or quiet:
+            yield
+            return
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             transient=True,
         ) as progress:
-            if not quiet:
-                progress.add_task(
-                    description=(
-                        f":writing_hand: [bold blue]Translating...[/bold blue] "
-                        f"[bright_black]{output_source.path}[/bright_black]"
-                    ),
-                    total=None,
-                )
-            translated_text = self._translate_text(
+            progress.add_task(
+                description=(
+                    f":writing_hand: [bold blue]Translating...[/bold blue] "
+                    f"[bright_black]{path}[/bright_black]"
+                ),
+                total=None,
+            )
+            yield
+
+    def _is_segmented_input(
+        self, input_source: InputSource, output_source: OutputSource
+    ) -> bool:
+        if not self.chunk_size or not isinstance(input_source, SegmentedInputSource):
+            return False
+        # the input must not be truncated while it is still being read
+        return Path(input_source.path).resolve() != Path(output_source.path).resolve()
+
+    def _translate_segments(
+        self,
+        input_source: InputSource,
+        segments: Iterable[str],
+        current_text: str | None,
+        source_language: str | None,
+        target_language: str | None,
+        request: str | None,
+        stream: bool = False,
+    ) -> Iterator[str]:
+        """
+        Translates the segments of a long text in parallel, yielding the result in order.
+        """
+        current_segments: list[str] = []
+        if isinstance(segments, list):
+            current_segments = self._split_current_text(current_text, segments)
+        logger.debug(f"Translating {input_source.path} in segments")
+
+        def translate_segment(index: int, segment: str) -> Iterator[str]:
+            return self._translate_text(
                 input_source=input_source,
-                text=content,
-                current_text=current_content,
+                text=segment,
+                current_text=current_segments[index] if current_segments else None,
                 source_language=source_language,
                 target_language=target_language,
                 request=request,
+                stream=stream,
             )
 
-        if stream:
-            output_source.write_stream(translated_text)
-        else:
-            output_source.write("".join(translated_text))
-
-        if not quiet:
-            print(
-                f":white_check_mark: [bold green]Translated![/bold green] "
-                f"[bright_black]{output_source.path}[/bright_black]"
-            )
+        pipeline = OrderedPipeline(
+            translate_segment, concurrency=self.concurrency, metrics=self.metrics
+        )
+        return pipeline.run(segments)
 
     def _translate_text(
         self,
@@ -108,10 +315,93 @@ class Translator:
         source_language: str | None,
         target_language: str | None,
         request: str | None,
+        stream: bool = False,
     ) -> Iterator[str]:
         """
         Translates the specified text into the specified language using LLM.
         """
+        masked = mask(text) if self.mask else MaskedText(text)
+        if not masked.placeholders:
+            return self._iter_completion(
+                input_source,
+                text,
+                current_text,
+                source_language,
+                target_language,
+                request,
+                stream=stream,
+            )
+        if stream:
+            # missing placeholders are only detected at the end of the response, so
+            # the translation is held back until it is complete, and can fall back
+            return _lazily(
+                lambda: self._translate_text(
+                    input_source,
+                    text,
+                    current_text,
+                    source_language,
+                    target_language,
+                    request,
+                )
+            )
+
+        saved_tokens = estimate_tokens(text) - estimate_tokens(masked.text)
+        self.metrics.incr("masking.placeholders", len(masked.placeholders))
+        self.metrics.incr("masking.prompt_tokens_saved", saved_tokens)
+        prompt = self._build_prompt(
+            input_source,
+            masked.text,
+            current_text,
+            source_language,
+            target_language,
+            request,
+        )
+        try:
+            translated_text = unmask(self.llm.completion(prompt), masked.placeholders)
+        except PlaceholderError as e:
+            logger.warning(f"{e}. Retrying without masking.")
+            self.metrics.incr("masking.fallbacks")
+            # a cached response would fail again on the next run
+            self.llm.evict(prompt)
+            return self._iter_completion(
+                input_source,
+                text,
+                current_text,
+                source_language,
+                target_language,
+                request,
+            )
+        # the masked spans were not generated by the model either
+        self.metrics.incr("masking.completion_tokens_saved", saved_tokens)
+        return iter([translated_text])
+
+    def _iter_completion(
+        self,
+        input_source: InputSource,
+        text: str,
+        current_text: str | None,
+        source_language: str | None,
+        target_language: str | None,
+        request: str | None,
+        stream: bool = False,
+    ) -> Iterator[str]:
+        prompt = self._build_prompt(
+            input_source, text, current_text, source_language, target_language, request
+        )
+        if not stream:
+            return iter([self.llm.completion(prompt)])
+        response = self.llm.iter_completion(prompt)
+        return response
+
+    def _build_prompt(
+        self,
+        input_source: InputSource,
+        text: str,
+        current_text: str | None,
+        source_language: str | None,
+        target_language: str | None,
+        request: str | None,
+    ) -> str | list[dict]:
         prompt = self.prompt_builder.build(
             input_path=input_source.path,
             input_text=text,
@@ -119,8 +409,213 @@ class Translator:
             target_language=target_language,
             request=request,
             current_text=current_text,
+            glossary=str(glossary)
+            if (glossary := self._glossaries.get((input_source.path, target_language)))
+            else None,
         )
         logger.debug(f"Model: {self.model_name}")
         logger.debug(f"Prompt: {prompt}")
-        response = self.llm.iter_completion(prompt)
-        return response
+        return prompt
+
+    def _split_current_text(
+        self, current_text: str | None, segments: list[str]
+    ) -> list[str]:
+        if not current_text:
+            return []
+        if len(segments) == 1:
+            return [current_text]
+        if not self.chunk_size:
+            return []
+        # previous output is only usable as context if it lines up with the input
+        split_current = split_text(current_text, self.chunk_size)
+        if len(split_current) != len(segments):
+            return []
+        return split_current
+
+    async def atranslate(
+        self,
+        input_source: InputSource,
+        output_source: OutputSource | None = None,
+        target_language: str | None = None,
+        source_language: str | None = None,
+        overwrite: bool = False,
+        request: str | None = None,
+        semaphore: asyncio.Semaphore | None = None,
+    ) -> str | None:
+        """
+        Async version of `translate` for using ailingo as a library.
+
+        Nothing is printed and no confirmation is asked: an existing output is left
+        untouched unless `overwrite` is set. Returns the translated text, or None if
+        the output was skipped.
+
+        Requests are limited by `semaphore`, which can be shared by several calls
+        (default: `self.concurrency` requests for this call).
+        """
+        current_text: str | None = None
+        if output_source is not None and await asyncio.to_thread(output_source.exists):
+            if not overwrite:
+                return None
+            if output_source.readable:
+                current_text = await asyncio.to_thread(output_source.read)
+
+        text = await asyncio.to_thread(input_source.read)
+        segments = split_text(text, self.chunk_size) if self.chunk_size else [text]
+        current_segments = self._split_current_text(current_text, segments)
+        semaphore = semaphore or asyncio.Semaphore(max(1, self.concurrency))
+        if self.glossary and target_language and len(segments) > 1:
+            async with semaphore:
+                glossary = await self.glossary.aextract(
+                    input_source.path,
+                    segments,
+                    target_language,
+                    source_language,
+                    request,
+                )
+            self._glossaries[(input_source.path, target_language)] = glossary
+
+        async def translate_segment(index: int, segment: str) -> str:
+            async with semaphore:
+                return await self._atranslate_text(
+                    input_source=input_source,
+                    text=segment,
+                    current_text=current_segments[index] if current_segments else None,
+                    source_language=source_language,
+                    target_language=target_language,
+                    request=request,
+                )
+
+        with self._glossary_scope(input_source, target_language):
+            translated_text = "".join(
+                await asyncio.gather(
+                    *(
+                        translate_segment(index, segment)
+                        for index, segment in enumerate(segments)
+                    )
+                )
+            )
+        if output_source is not None:
+            await asyncio.to_thread(output_source.write, translated_text)
+        return translated_text
+
+    async def translate_many(
+        self,
+        jobs: Iterable[TranslationJob],
+        overwrite: bool = False,
+        concurrency: int | None = None,
+    ) -> list[str | None]:
+        """
+        Translates the jobs with at most `concurrency` (default: `self.concurrency`)
+        requests in flight across the segments of all jobs, and at most as many jobs
+        in progress at a time. Returns the results of `atranslate` in order.
+        """
+        limit = max(1, concurrency or self.concurrency)
+        jobs_semaphore = asyncio.Semaphore(limit)
+        requests_semaphore = asyncio.Semaphore(limit)
+
+        async def run(job: TranslationJob) -> str | None:
+            async with jobs_semaphore:
+                return await self.atranslate(
+                    input_source=job.input_source,
+                    output_source=job.output_source,
+                    target_language=job.target_language,
+                    source_language=job.source_language,
+                    overwrite=overwrite,
+                    request=job.request,
+                    semaphore=requests_semaphore,
+                )
+
+        return list(await asyncio.gather(*(run(job) for job in jobs)))
+
+    async def atranslate_stream(
+        self,
+        input_source: InputSource,
+        target_language: str | None = None,
+        source_language: str | None = None,
+        request: str | None = None,
+        current_text: str | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Translates the input and yields the translated text as it is generated.
+        Long inputs are translated one segment after another.
+        """
+        text = await asyncio.to_thread(input_source.read)
+        segments = split_text(text, self.chunk_size) if self.chunk_size else [text]
+        current_segments = self._split_current_text(current_text, segments)
+        for index, segment in enumerate(segments):
+            current_segment = current_segments[index] if current_segments else None
+            if self.mask and mask(segment).placeholders:
+                # held back until complete, as in `_translate_text`
+                yield await self._atranslate_text(
+                    input_source,
+                    segment,
+                    current_segment,
+                    source_language,
+                    target_language,
+                    request,
+                )
+                continue
+            prompt = self._build_prompt(
+                input_source,
+                segment,
+                current_segment,
+                source_language,
+                target_language,
+                request,
+            )
+            async for chunk in self.llm.aiter_completion(prompt):
+                yield chunk
+
+    async def _atranslate_text(
+        self,
+        input_source: InputSource,
+        text: str,
+        current_text: str | None,
+        source_language: str | None,
+        target_language: str | None,
+        request: str | None,
+    ) -> str:
+        """
+        Async version of `_translate_text` without streaming.
+        """
+        masked = mask(text) if self.mask else MaskedText(text)
+        prompt = self._build_prompt(
+            input_source,
+            masked.text,
+            current_text,
+            source_language,
+            target_language,
+            request,
+        )
+        if not masked.placeholders:
+            return await self.llm.acompletion(prompt)
+
+        saved_tokens = estimate_tokens(text) - estimate_tokens(masked.text)
+        self.metrics.incr("masking.placeholders", len(masked.placeholders))
+        self.metrics.incr("masking.prompt_tokens_saved", saved_tokens)
+        try:
+            translated_text = unmask(
+                await self.llm.acompletion(prompt), masked.placeholders
+            )
+        except PlaceholderError as e:
+            logger.warning(f"{e}. Retrying without masking.")
+            self.metrics.incr("masking.fallbacks")
+            self.llm.evict(prompt)
+            prompt = self._build_prompt(
+                input_source,
+                text,
+                current_text,
+                source_language,
+                target_language,
+                request,
+            )
+            return await self.llm.acompletion(prompt)
+        self.metrics.incr("masking.completion_tokens_saved", saved_tokens)
+        return translated_text
+
+
+def _lazily(translate: Callable[[], Iterable[str]]) -> Iterator[str]:
+    """
+    Translates only once the output is consumed, like the other streamed outputs.
+    """
+    yield from translate()
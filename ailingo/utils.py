@@ -1,14 +1,26 @@
 import logging
 
+from rich.console import Console
 from rich.logging import RichHandler
 
 
 def setup_logger(level: int | None = None):
     """
-    Set up logger
+    Set up logger. Logs are written to standard error, so that they are not mixed
+    with results written to standard output.
     """
 
     FORMAT = "%(message)s"
     logging.basicConfig(
-        level=level, format=FORMAT, datefmt="[%X]", handlers=[RichHandler()]
+        level=level,
+        format=FORMAT,
+        datefmt="[%X]",
+        handlers=[RichHandler(console=Console(stderr=True))],
     )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of tokens in a text (about 4 characters per token).
+    """
+    return (len(text) + 3) // 4
@@ -0,0 +1,195 @@
+import queue
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from ailingo.output_source import OutputSource
+
+try:
+    from watchdog.events import FileSystemEvent, FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover
+    Observer = None
+
+logger = getLogger(__name__)
+
+
+class Cancelled(Exception):
+    """
+    Raised when a translation is cancelled because its source changed again.
+    """
+
+
+class Watcher:
+    """
+    Watches files for changes, using file system events (inotify etc.) when the
+    optional `watchdog` package is installed and polling otherwise.
+
+    Changes are reported in batches once no file has changed for `debounce` seconds,
+    so that a burst of saves results in a single batch with each file only once.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        debounce: float = 0.5,
+        poll_interval: float = 0.5,
+        polling: bool = False,
+    ) -> None:
+        self.paths = {path.resolve() for path in paths}
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.polling = polling or Observer is None
+
+    def iter_changes(self, stop: threading.Event | None = None) -> Iterator[set[Path]]:
+        """
+        Yields the sets of changed files until `stop` is set.
+        """
+        stop = stop or threading.Event()
+        events: queue.Queue[Path] = queue.Queue()
+        observer = None
+        if self.polling:
+            thread = threading.Thread(
+                target=self._poll, args=(events, stop), daemon=True
+            )
+            thread.start()
+        else:
+            observer = self._observe(events)
+
+        pending: set[Path] = set()
+        last_change = 0.0
+        try:
+            while not stop.is_set():
+                try:
+                    path = events.get(timeout=self.debounce / 2)
+                    if path in self.paths:
+                        pending.add(path)
+                        last_change = time.monotonic()
+                except queue.Empty:
+                    pass
+                if pending and time.monotonic() - last_change >= self.debounce:
+                    yield pending
+                    pending = set()
+        finally:
+            stop.set()
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def _poll(self, events: queue.Queue[Path], stop: threading.Event):
+        snapshot = self._snapshot()
+        while not stop.wait(self.poll_interval):
+            current = self._snapshot()
+            for path, stat in current.items():
+                if snapshot.get(path) != stat:
+                    events.put(path)
+            snapshot = current
+
+    def _snapshot(self) -> dict[Path, tuple[int, int] | None]:
+        snapshot: dict[Path, tuple[int, int] | None] = {}
+        for path in self.paths:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                snapshot[path] = None
+            else:
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _observe(self, events: queue.Queue[Path]):
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event: FileSystemEvent):
+                if event.event_type in ("opened", "closed_no_write"):
+                    return
+                for path in [event.src_path, getattr(event, "dest_path", "")]:
+                    if path:
+                        events.put(Path(str(path)).resolve())
+
+        observer = Observer()
+        for directory in {path.parent for path in self.paths}:
+            observer.schedule(Handler(), str(directory), recursive=False)
+        observer.start()
+        return observer
+
+
+def watch(
+    watcher: Watcher,
+    translate: Callable[[Path, threading.Event], None],
+    stop: threading.Event | None = None,
+):
+    """
+    Calls `translate` in the background for each changed file.
+
+    When a file changes while it is still being translated, the event passed to the
+    running translation is set, and the new translation waits for it to stop.
+    """
+    running: dict[Path, tuple[threading.Thread, threading.Event]] = {}
+
+    def run(path: Path, cancel: threading.Event, previous: threading.Thread | None):
+        if previous is not None:
+            previous.join()
+        if not cancel.is_set():
+            translate(path, cancel)
+
+    for paths in watcher.iter_changes(stop):
+        for path in sorted(paths):
+            previous = running.get(path)
+            if previous is not None and previous[0].is_alive():
+                logger.debug(f"Cancelling the translation of {path}")
+                previous[1].set()
+            cancel = threading.Event()
+            thread = threading.Thread(
+                target=run,
+                args=(path, cancel, previous[0] if previous else None),
+                daemon=True,
+            )
+            running[path] = (thread, cancel)
+            thread.start()
+
+    for thread, _ in running.values():
+        thread.join()
+
+
+class CancellableOutputSource:
+    """
+    Buffers streamed output and writes it to `output_source` only if the translation
+    was not cancelled. Cancelling stops reading the stream, which closes the request.
+    """
+
+    def __init__(self, output_source: OutputSource, cancel: threading.Event) -> None:
+        self.output_source = output_source
+        self.cancel = cancel
+
+    @property
+    def path(self) -> str:
+        return self.output_source.path
+
+    @property
+    def readable(self) -> bool:
+        return self.output_source.readable
+
+    def exists(self) -> bool:
+        return self.output_source.exists()
+
+    def read(self) -> str:
+        return self.output_source.read()
+
+    def write(self, text: str):
+        self.write_stream([text])
+
+    def write_stream(self, text: Iterable[str]):
+        chunks: list[str] = []
+        try:
+            for chunk in text:
+                if self.cancel.is_set():
+                    raise Cancelled()
+                chunks.append(chunk)
+        finally:
+            close = getattr(text, "close", None)
+            if close is not None:
+                close()
+        if self.cancel.is_set():
+            raise Cancelled()
+        self.output_source.write("".join(chunks))
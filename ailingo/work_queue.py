@@ -0,0 +1,171 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    source_language TEXT,
+    target_language TEXT,
+    request TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    leased_until REAL,
+    error TEXT,
+    UNIQUE (input_path, output_path)
+)
+"""
+
+
+@dataclass
+class QueuedJob:
+    input_path: str
+    output_path: str
+    source_language: str | None = None
+    target_language: str | None = None
+    request: str | None = None
+    id: int | None = None
+    attempts: int = 0
+
+
+class WorkQueue:
+    """
+    Job queue stored in a SQLite database, shared by workers on one host
+    (or several hosts sharing a filesystem that supports SQLite locking).
+
+    Workers lease a job for `lease_seconds`. Jobs whose lease expires without an
+    acknowledgement are handed out again, up to `max_attempts` times.
+    """
+
+    def __init__(
+        self, path: str | Path, lease_seconds: float = 600, max_attempts: int = 3
+    ) -> None:
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._transaction() as db:
+            db.execute(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def enqueue(self, jobs: list[QueuedJob]) -> int:
+        """
+        Add jobs to the queue. Jobs that are already queued are re-queued.
+        Returns the number of jobs added.
+        """
+        with self._transaction() as db:
+            for job in jobs:
+                db.execute(
+                    "INSERT INTO jobs (input_path, output_path, source_language, target_language, request) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (input_path, output_path) DO UPDATE SET "
+                    "source_language = excluded.source_language, "
+                    "target_language = excluded.target_language, "
+                    "request = excluded.request, "
+                    "status = 'queued', attempts = 0, worker = NULL, leased_until = NULL, error = NULL",
+                    (
+                        job.input_path,
+                        job.output_path,
+                        job.source_language,
+                        job.target_language,
+                        job.request,
+                    ),
+                )
+        return len(jobs)
+
+    def lease(self, worker: str) -> QueuedJob | None:
+        """
+        Take the next job that is queued or whose lease has expired.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            self._fail_exhausted(db, now)
+            row = db.execute(
+                "SELECT id, input_path, output_path, source_language, target_language, request, attempts "
+                "FROM jobs WHERE status = 'queued' OR (status = 'leased' AND leased_until < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, leased_until = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (worker, now + self.lease_seconds, row[0]),
+            )
+        return QueuedJob(
+            id=row[0],
+            input_path=row[1],
+            output_path=row[2],
+            source_language=row[3],
+            target_language=row[4],
+            request=row[5],
+            attempts=row[6] + 1,
+        )
+
+    def extend(self, job: QueuedJob, worker: str) -> bool:
+        """
+        Extend the lease of a job that is still being processed.
+        Returns False if the lease has been lost.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET leased_until = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, job.id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def ack(self, job: QueuedJob, worker: str):
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'done', leased_until = NULL "
+                "WHERE id = ? AND worker = ?",
+                (job.id, worker),
+            )
+
+    def fail(self, job: QueuedJob, worker: str, error: str):
+        """
+        Return a failed job to the queue, or mark it as failed after `max_attempts`.
+        """
+        status = "failed" if job.attempts >= self.max_attempts else "queued"
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, leased_until = NULL, error = ? "
+                "WHERE id = ? AND worker = ?",
+                (status, error, job.id, worker),
+            )
+
+    def counts(self) -> dict[str, int]:
+        with self._transaction() as db:
+            self._fail_exhausted(db, time.time())
+            rows = db.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def _fail_exhausted(self, db: sqlite3.Connection, now: float):
+        # jobs whose workers died too many times are not retried forever
+        db.execute(
+            "UPDATE jobs SET status = 'failed', error = 'lease expired' "
+            "WHERE status = 'leased' AND leased_until < ? AND attempts >= ?",
+            (now, self.max_attempts),
+        )
@@ -0,0 +1,83 @@
+"""
+Compares the local CPU time and allocations of streamed and non-streamed requests.
+
+The responses are generated locally by litellm (`mock_response`), so only the
+client-side overhead is measured.
+
+    python benchmarks/bench_completion.py [--requests 100] [--words 30]
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+import litellm  # noqa: E402
+
+from ailingo.llm import LLM  # noqa: E402
+
+
+class MockLLM(LLM):
+    def __init__(self, response: str) -> None:
+        super().__init__("gpt-4o")
+        self.response = response
+
+    def _completion(self, model, prompt, stream=True, **kwargs):
+        return super()._completion(
+            model, prompt, stream=stream, mock_response=self.response, **kwargs
+        )
+
+
+def streamed(llm: MockLLM, prompt: str) -> str:
+    # the previous implementation of LLM.completion
+    chunks = list(llm._completion(llm.model_name, prompt))
+    response = litellm.stream_chunk_builder(chunks)
+    return response.choices[0].message.content  # type: ignore
+
+
+def iterated(llm: MockLLM, prompt: str) -> str:
+    return "".join(llm.iter_completion(prompt))
+
+
+def non_streamed(llm: MockLLM, prompt: str) -> str:
+    return llm.completion(prompt)
+
+
+def measure(name: str, run, llm: MockLLM, requests: int):
+    run(llm, "warm up")
+    started = time.process_time()
+    for i in range(requests):
+        run(llm, f"Translate string {i}")
+    cpu = time.process_time() - started
+
+    # allocations are traced separately because tracing slows everything down
+    tracemalloc.start()
+    for i in range(requests):
+        run(llm, f"Translate string {i}")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<14} {cpu / requests * 1000:8.3f} ms/request  "
+        f"peak {peak / 1024:8.1f} KiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--words", type=int, default=30)
+    args = parser.parse_args()
+
+    llm = MockLLM(" ".join(f"mot{i}" for i in range(args.words)))
+    for name, run in [
+        ("streamed", streamed),
+        ("iter", iterated),
+        ("non-streamed", non_streamed),
+    ]:
+        measure(name, run, llm, args.requests)
+
+
+if __name__ == "__main__":
+    main()
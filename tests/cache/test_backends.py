@@ -0,0 +1,73 @@
+import io
+
+from ailingo.cache.directory_backend import DirectoryBackend
+from ailingo.cache.redis_backend import RedisBackend
+from ailingo.cache.s3_backend import S3Backend
+
+
+class FakeS3Client:
+    def __init__(self) -> None:
+        self.objects: dict[tuple[str, str], bytes] = {}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket: str, Key: str):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def get_paginator(self, operation: str):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket: str, Prefix: str):
+                yield {
+                    "Contents": [
+                        {"Key": key}
+                        for bucket, key in client.objects
+                        if bucket == Bucket and key.startswith(Prefix)
+                    ]
+                }
+
+        return Paginator()
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[bytes, bytes]] = {}
+
+    def hset(self, key: str, field: str, value: bytes):
+        self.hashes.setdefault(key, {})[field.encode()] = value
+
+    def hget(self, key: str, field: str) -> bytes | None:
+        return self.hashes.get(key, {}).get(field.encode())
+
+    def hkeys(self, key: str) -> list[bytes]:
+        return list(self.hashes.get(key, {}))
+
+
+def test_directory_backend(tmp_path):
+    backend = DirectoryBackend(tmp_path / "packs")
+    assert backend.list() == []
+    backend.put("b.pack", b"B")
+    backend.put("a.pack", b"A")
+    assert backend.list() == ["a.pack", "b.pack"]
+    assert backend.get("a.pack") == b"A"
+    assert not list((tmp_path / "packs").glob("*.tmp"))
+
+
+def test_s3_backend():
+    client = FakeS3Client()
+    backend = S3Backend("bucket", "ci/cache/", client=client)
+    backend.put("a.pack", b"A")
+    client.put_object(Bucket="bucket", Key="ci/cache/old/b.pack", Body=b"B")
+    client.put_object(Bucket="bucket", Key="other/c.pack", Body=b"C")
+    assert backend.list() == ["a.pack"]
+    assert backend.get("a.pack") == b"A"
+    assert ("bucket", "ci/cache/a.pack") in client.objects
+
+
+def test_redis_backend():
+    backend = RedisBackend(key="ailingo:packs", client=FakeRedis())
+    backend.put("a.pack", b"A")
+    assert backend.list() == ["a.pack"]
+    assert backend.get("a.pack") == b"A"
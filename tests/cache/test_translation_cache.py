@@ -0,0 +1,175 @@
+import gzip
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from ailingo.cache.translation_cache import TranslationCache, pack_name
+from ailingo.llm import LLM
+from ailingo.router import HedgedLLM
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+def test_get_and_put(tmp_path):
+    cache = TranslationCache(tmp_path / "cache.db")
+    key = cache.key("gpt-4o", MESSAGES)
+    assert cache.get(key) is None
+    cache.put(key, "Bonjour")
+    assert cache.get(key) == "Bonjour"
+    assert len(cache) == 1
+    assert cache.metrics.get("cache.hits") == 1
+    assert cache.metrics.get("cache.misses") == 1
+
+
+def test_key_depends_on_model_and_prompt():
+    key = TranslationCache.key("gpt-4o", MESSAGES)
+    assert key == TranslationCache.key("gpt-4o", [dict(MESSAGES[0])])
+    assert key != TranslationCache.key("gpt-4o-mini", MESSAGES)
+    assert key != TranslationCache.key(
+        "gpt-4o", [{"role": "user", "content": "Hello!"}]
+    )
+
+
+def test_pack_is_deterministic(tmp_path):
+    first = TranslationCache(tmp_path / "first.db")
+    second = TranslationCache(tmp_path / "second.db")
+    first.put("a", "A")
+    first.put("b", "B")
+    second.put("b", "B")
+    second.put("a", "A")
+    assert first.export_pack() == second.export_pack()
+    assert pack_name(first.export_pack()) == pack_name(second.export_pack())
+
+
+def test_import_merges_packs(tmp_path):
+    runner1 = TranslationCache(tmp_path / "runner1.db")
+    runner1.put("a", "A")
+    runner1.put("b", "B")
+    runner2 = TranslationCache(tmp_path / "runner2.db")
+    runner2.put("b", "other B")
+    runner2.put("c", "C")
+
+    cache = TranslationCache(tmp_path / "cache.db")
+    assert cache.import_pack(runner1.export_pack()) == 2
+    assert cache.import_pack(runner2.export_pack()) == 1
+    assert len(cache) == 3
+    # entries that are already cached are kept
+    assert cache.get("b") == "B"
+
+
+def test_import_keeps_line_separators_in_text(tmp_path):
+    source = TranslationCache(tmp_path / "source.db")
+    text = "line\u2028sep\u2029para\u0085next\r\nend"
+    source.put("k1", text)
+
+    cache = TranslationCache(tmp_path / "cache.db")
+    assert cache.import_pack(source.export_pack()) == 1
+    assert cache.get("k1") == text
+
+
+def test_llm_evicts_cached_response(tmp_path):
+    cache = TranslationCache(tmp_path / "cache.db")
+    llm = LLM("gpt-4o", cache=cache)
+    cache.put(cache.key("gpt-4o", MESSAGES), "Bonjour")
+    llm.evict("Hello")
+    assert cache.get(cache.key("gpt-4o", MESSAGES)) is None
+
+
+def test_import_rejects_other_files(tmp_path):
+    cache = TranslationCache(tmp_path / "cache.db")
+    with pytest.raises(ValueError):
+        cache.import_pack(b"not a pack")
+    with pytest.raises(ValueError):
+        cache.import_pack(gzip.compress(b'{"format": "other"}\n'))
+
+
+def test_llm_uses_cache(tmp_path):
+    cache = TranslationCache(tmp_path / "cache.db")
+    llm = LLM("gpt-4o", cache=cache)
+    response = SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                message=SimpleNamespace(content="Bonjour"), finish_reason="stop"
+            )
+        ]
+    )
+    with patch("litellm.completion", return_value=response) as completion:
+        assert llm.completion("Hello") == "Bonjour"
+        assert llm.completion("Hello") == "Bonjour"
+        assert list(llm.iter_completion("Hello")) == ["Bonjour"]
+    assert completion.call_count == 1
+
+
+def test_llm_caches_streamed_response(tmp_path):
+    cache = TranslationCache(tmp_path / "cache.db")
+    llm = LLM("gpt-4o", cache=cache)
+    chunks = [
+        SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    delta=SimpleNamespace(content=content), finish_reason=reason
+                )
+            ]
+        )
+        for content, reason in [("Bon", None), ("jour", None), (None, "stop")]
+    ]
+    with patch("litellm.completion", return_value=chunks):
+        assert "".join(llm.iter_completion("Hello")) == "Bonjour"
+    assert cache.get(cache.key("gpt-4o", MESSAGES)) == "Bonjour"
+
+
+def test_llm_does_not_cache_truncated_response(tmp_path):
+    cache = TranslationCache(tmp_path / "cache.db")
+    llm = LLM("gpt-4o", cache=cache, max_continuations=1)
+    response = SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                message=SimpleNamespace(content="Bonjour, le"), finish_reason="length"
+            )
+        ]
+    )
+    chunks = [
+        SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    delta=SimpleNamespace(content="Bonjour, le"),
+                    finish_reason="length",
+                )
+            ]
+        )
+    ]
+    with patch("litellm.completion", return_value=response):
+        llm.completion("Hello")
+    with patch("litellm.completion", side_effect=lambda **kwargs: iter(chunks)):
+        list(llm.iter_completion("Hello"))
+    assert len(cache) == 0
+
+
+def test_hedged_llm_caches_only_primary_responses(tmp_path):
+    cache = TranslationCache(tmp_path / "cache.db")
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=None)
+    llm.cache = cache
+
+    def completion(model, messages, stream, **kwargs):
+        if model == "primary" and messages[0]["content"] == "Hello":
+            raise RuntimeError("primary failed")
+        return iter(
+            [
+                SimpleNamespace(
+                    choices=[
+                        SimpleNamespace(
+                            delta=SimpleNamespace(content=model), finish_reason="stop"
+                        )
+                    ]
+                )
+            ]
+        )
+
+    with patch("litellm.completion", completion):
+        assert llm.completion("Hello") == "secondary"
+        assert llm.completion("Goodbye") == "primary"
+    assert (
+        cache.get(cache.key("primary", [{"content": "Hello", "role": "user"}])) is None
+    )
+    assert len(cache) == 1
@@ -0,0 +1,15 @@
+from unittest.mock import MagicMock
+
+from ailingo.input_source.cached_source import CachedInputSource
+from ailingo.input_source.url_source import UrlInputSource
+
+
+def test_cached_input_source_reads_once():
+    source = MagicMock(spec=UrlInputSource, path="https://example.com")
+    source.read.return_value = "Hello"
+    cached_source = CachedInputSource(source)
+
+    assert cached_source.path == "https://example.com"
+    assert cached_source.read() == "Hello"
+    assert cached_source.read() == "Hello"
+    source.read.assert_called_once_with()
@@ -0,0 +1,50 @@
+import pytest
+
+from ailingo.input_source.mmap_source import MmapFileInputSource
+
+
+def test_read(tmp_path):
+    file_path = tmp_path / "test.txt"
+    file_path.write_text("This is a test file.\n")
+
+    assert MmapFileInputSource(file_path).read() == "This is a test file.\n"
+
+
+def test_empty_file(tmp_path):
+    file_path = tmp_path / "empty.txt"
+    file_path.touch()
+
+    assert list(MmapFileInputSource(file_path).iter_segments(10)) == []
+
+
+def test_iter_segments_at_boundaries(tmp_path):
+    file_path = tmp_path / "test.txt"
+    file_path.write_text("First paragraph.\n\nSecond paragraph.\nline\n")
+
+    segments = list(MmapFileInputSource(file_path).iter_segments(20))
+    assert segments == ["First paragraph.\n\n", "Second paragraph.\n", "line\n"]
+
+
+@pytest.mark.parametrize("max_chars", [1, 2, 3, 5, 7])
+def test_iter_segments_multibyte(tmp_path, max_chars):
+    file_path = tmp_path / "test.txt"
+    text = "日本語のテキストです。" * 3
+    file_path.write_text(text)
+
+    segments = list(MmapFileInputSource(file_path).iter_segments(max_chars))
+    assert "".join(segments) == text
+    assert all(len(segment) <= max_chars for segment in segments)
+
+
+def test_iter_segments_keeps_urls_whole(tmp_path):
+    file_path = tmp_path / "test.txt"
+    text = "See https://example.com/a/very/long/path/to/a/page for the details. " * 3
+    file_path.write_text(text)
+
+    segments = list(MmapFileInputSource(file_path).iter_segments(24))
+    assert "".join(segments) == text
+    assert segments[:3] == [
+        "See ",
+        "https://example.com/a/very/long/path/to/a/page",
+        " for the details. ",
+    ]
@@ -0,0 +1,7 @@
+from ailingo.input_source.text_source import TextInputSource
+
+
+def test_text_source():
+    text_source = TextInputSource("Hello")
+    assert text_source.read() == "Hello"
+    assert text_source.path == "(text)"
@@ -14,3 +14,11 @@ def test_console_output_source_write(capsys):
     console_source.write("test")
     captured = capsys.readouterr()
     assert captured.out == "test\n"
+
+
+def test_console_output_source_write_with_label(capsys):
+    console_source = ConsoleOutputSource(label="fr")
+    console_source.write("test")
+    captured = capsys.readouterr()
+    assert "fr" in captured.out.splitlines()[0]
+    assert captured.out.splitlines()[1] == "test"
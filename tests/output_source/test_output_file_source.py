@@ -26,6 +26,37 @@ def test_save_text_file(tmp_path: Path):
     assert file_path.read_text() == content
 
 
+def test_write_stream(tmp_path: Path):
+    file_path = tmp_path / "test.txt"
+    file_path.write_text("Previous translation.")
+
+    def chunks():
+        yield "Hello, "
+        # nothing is visible until the stream is complete
+        assert file_path.read_text() == "Previous translation."
+        yield "world!"
+
+    FileOutputSource(file_path).write_stream(chunks())
+
+    assert file_path.read_text() == "Hello, world!"
+    assert [path.name for path in tmp_path.iterdir()] == ["test.txt"]
+
+
+def test_write_stream_failure_keeps_previous_output(tmp_path: Path):
+    file_path = tmp_path / "test.txt"
+    file_path.write_text("Previous translation.")
+
+    def chunks():
+        yield "Hello, "
+        raise ConnectionError("connection lost")
+
+    with pytest.raises(ConnectionError):
+        FileOutputSource(file_path).write_stream(chunks())
+
+    assert file_path.read_text() == "Previous translation."
+    assert [path.name for path in tmp_path.iterdir()] == ["test.txt"]
+
+
 def test_generate_output_path():
     input_path = "dir/test.txt"
     output_pattern = "{parent}/{stem}.translated{suffix}"
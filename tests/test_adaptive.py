@@ -0,0 +1,129 @@
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import litellm
+import pytest
+
+from ailingo.adaptive import AdaptiveController
+from ailingo.llm import LLM
+from ailingo.translator import Translator
+
+
+def _rate_limit_error():
+    return litellm.RateLimitError("rate limited", llm_provider="openai", model="gpt-4o")
+
+
+def test_increases_concurrency_only_when_saturated():
+    controller = AdaptiveController(concurrency=1, max_concurrency=3, interval=0)
+    for _ in range(2):
+        with controller.track() as tracker:
+            tracker.received(100)
+    # the second request ran alone, so the extra slot was not needed
+    assert [decision.concurrency for decision in controller.decisions] == [2, 2]
+    assert controller.decisions[-1].reason == "unchanged"
+    assert controller.metrics.get("adaptive.increases") == 1
+    assert controller.metrics.get("adaptive.concurrency.max") == 2
+
+
+def test_halves_concurrency_and_chunk_size_on_rate_limit():
+    controller = AdaptiveController(
+        concurrency=8, max_concurrency=8, chunk_size=4000, interval=0
+    )
+    with pytest.raises(litellm.RateLimitError):
+        with controller.track():
+            raise _rate_limit_error()
+    assert controller.concurrency == 4
+    assert controller.chunk_size == 2000
+    assert controller.decisions[-1].errors == 1
+    assert controller.metrics.get("adaptive.decreases") == 1
+
+
+def test_halves_concurrency_when_ttft_rises():
+    with patch(
+        "ailingo.adaptive.time.monotonic", side_effect=[0, 0, 1, 1, 1, 2, 5, 5, 5]
+    ):
+        controller = AdaptiveController(concurrency=4, max_concurrency=4, interval=0)
+        # first token after 1 second
+        with controller.track() as tracker:
+            tracker.received(10)
+        # first token after 3 seconds
+        with controller.track() as tracker:
+            tracker.received(10)
+    assert controller.concurrency == 2
+    assert "time to first token" in controller.decisions[-1].reason
+
+
+def test_closed_stream_is_not_an_error():
+    controller = AdaptiveController(concurrency=1, interval=0)
+
+    def chunks():
+        with controller.track():
+            yield "a"
+            yield "b"
+
+    iterator = chunks()
+    next(iterator)
+    iterator.close()
+    assert controller.decisions[-1].errors == 0
+
+
+def test_limits_requests_in_flight():
+    controller = AdaptiveController(concurrency=2, max_concurrency=2, interval=60)
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def request():
+        nonlocal in_flight, peak
+        with controller.track():
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            release.wait(1)
+            with lock:
+                in_flight -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert peak <= 2
+
+
+def test_writes_decisions_to_log(tmp_path):
+    log_path = tmp_path / "adaptive.jsonl"
+    controller = AdaptiveController(concurrency=1, interval=0, log_path=log_path)
+    with controller.track() as tracker:
+        tracker.received(10)
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert records[0]["concurrency"] == 2
+    assert records[0]["requests"] == 1
+
+
+def test_llm_reports_to_controller():
+    controller = AdaptiveController(concurrency=1, interval=0)
+    response = SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                message=SimpleNamespace(content="Bonjour"), finish_reason="stop"
+            )
+        ]
+    )
+    with patch("litellm.completion", return_value=response):
+        assert LLM("gpt-4o", controller=controller).completion("Hello") == "Bonjour"
+    assert controller.decisions[-1].requests == 1
+    assert controller.decisions[-1].tokens_per_second > 0
+
+
+def test_translator_uses_controller_chunk_size():
+    controller = AdaptiveController(concurrency=2, max_concurrency=6, chunk_size=1000)
+    translator = Translator("gpt-4o", chunk_size=1000, controller=controller)
+    assert translator.llm.controller is controller
+    assert translator.concurrency == 6
+    controller.chunk_size = 500
+    assert translator.chunk_size == 500
@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+from ailingo.batch import BatchTranslator
+from ailingo.llm import LLM
+from ailingo.packing import RequestPacker
+from ailingo.prompt import PromptBuilder
+from ailingo.translator import Translator
+
+
+def _translator(completion) -> Translator:
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = completion
+    prompt_builder = MagicMock(spec=PromptBuilder)
+    prompt_builder.build.side_effect = lambda **kwargs: (
+        f"{kwargs['target_language']}:{kwargs['input_text']}"
+    )
+    return Translator(model_name="gpt-4o", llm=llm, prompt_builder=prompt_builder)
+
+
+def test_batch_translates_records():
+    translator = _translator(lambda prompt: prompt.upper())
+    lines = [
+        json.dumps({"id": 1, "text": "hello", "target": "fr"}),
+        "",
+        json.dumps({"id": 2, "text": "world"}),
+        "not json",
+        json.dumps({"id": 3}),
+    ]
+
+    results = list(BatchTranslator(translator, target_language="de").run(lines))
+
+    assert sorted(
+        (result for result in results if "id" in result), key=lambda r: r["id"]
+    ) == [
+        {"id": 1, "target": "fr", "text": "FR:HELLO"},
+        {"id": 2, "target": "de", "text": "DE:WORLD"},
+    ]
+    assert sorted(result["line"] for result in results if "error" in result) == [4, 5]
+    assert translator.metrics.get("batch.records") == 4
+    assert translator.metrics.get("batch.errors") == 2
+
+
+def test_batch_reports_failed_records():
+    def completion(prompt):
+        if "fail" in prompt:
+            raise RuntimeError("API error")
+        return prompt
+
+    translator = _translator(completion)
+    lines = [
+        json.dumps({"id": i, "text": text}) for i, text in enumerate(["ok", "fail"])
+    ]
+
+    results = list(BatchTranslator(translator, target_language="fr").run(lines))
+
+    assert {"id": 0, "target": "fr", "text": "fr:ok"} in results
+    assert {"id": 1, "target": "fr", "error": "API error"} in results
+
+
+def test_batch_reads_ahead_only_up_to_concurrency():
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def completion(prompt):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return prompt
+
+    read = 0
+
+    def lines():
+        nonlocal read
+        for i in range(50):
+            read += 1
+            yield json.dumps({"id": i, "text": "text", "target": "fr"})
+
+    batch_translator = BatchTranslator(_translator(completion), concurrency=4)
+    results = batch_translator.run(lines())
+    next(results)
+    assert read <= 5
+    assert len(list(results)) == 49
+    assert max_running == 4
+
+
+def test_batch_packs_records():
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: "\n".join(
+        line.upper()
+        for line in prompt[1]["content"].split("----------\n")[1].split("\n")
+    )
+    translator = Translator(
+        model_name="gpt-4o", llm=llm, prompt_builder=PromptBuilder()
+    )
+    lines = [
+        json.dumps({"id": i, "text": f"text {i}", "target": target})
+        for i, target in enumerate(["fr", "de", "fr", "de", "fr"])
+    ]
+
+    batch_translator = BatchTranslator(translator, packer=RequestPacker(translator))
+    results = sorted(batch_translator.run(lines), key=lambda result: result["id"])
+
+    assert [result["text"] for result in results] == [f"TEXT {i}" for i in range(5)]
+    assert [result["target"] for result in results] == ["fr", "de", "fr", "de", "fr"]
+    assert llm.completion.call_count == 2
+
+
+def test_batch_flushes_partial_packs_when_input_is_idle():
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: prompt[1]["content"].split(
+        "----------\n"
+    )[1]
+    translator = Translator(
+        model_name="gpt-4o", llm=llm, prompt_builder=PromptBuilder()
+    )
+    received = threading.Event()
+
+    def lines():
+        yield json.dumps({"id": 0, "text": "rare", "target": "fr"})
+        received.wait(timeout=5)
+
+    batch_translator = BatchTranslator(
+        translator, packer=RequestPacker(translator), flush_after=0.05
+    )
+    results = batch_translator.run(lines())
+    assert next(results)["id"] == 0
+    assert not received.is_set()
+    received.set()
+    assert list(results) == []
+
+
+def test_batch_flushes_partial_packs_after_waiting():
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: prompt[1]["content"].split(
+        "----------\n"
+    )[1]
+    translator = Translator(
+        model_name="gpt-4o", llm=llm, prompt_builder=PromptBuilder()
+    )
+    read = 0
+
+    def lines():
+        nonlocal read
+        yield json.dumps({"id": 0, "text": "rare", "target": "fr"})
+        for i in range(1, 100):
+            read += 1
+            time.sleep(0.01)
+            yield json.dumps({"id": i, "text": "common", "target": "de"})
+
+    batch_translator = BatchTranslator(
+        translator, packer=RequestPacker(translator), flush_after=0.1
+    )
+    results = batch_translator.run(lines())
+    assert next(results)["id"] == 0
+    assert read < 99
+    assert len(list(results)) == 99
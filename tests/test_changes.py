@@ -0,0 +1,68 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from ailingo.changes import changes_since
+
+
+def _git(repo: Path, *args: str):
+    subprocess.run(
+        [
+            "git",
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+            *args,
+        ],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q")
+    for name in ["a.md", "b.md", "c.md", "d.md"]:
+        (tmp_path / name).write_text(name)
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+    return tmp_path.resolve()
+
+
+def test_changes_since(repo):
+    (repo / "a.md").write_text("modified")
+    _git(repo, "mv", "b.md", "renamed.md")
+    _git(repo, "rm", "-q", "c.md")
+    _git(repo, "commit", "-q", "-am", "change")
+    (repo / "new.md").write_text("untracked")
+
+    changes = changes_since("HEAD~1", cwd=repo)
+
+    assert changes.changed == {repo / "a.md", repo / "renamed.md", repo / "new.md"}
+    assert changes.removed == {repo / "b.md", repo / "c.md"}
+
+
+def test_changes_since_ignores_changes_on_moved_base(repo):
+    _git(repo, "branch", "base")
+    _git(repo, "checkout", "-q", "-b", "feature")
+    (repo / "a.md").write_text("feature change")
+    _git(repo, "commit", "-q", "-am", "feature")
+    _git(repo, "checkout", "-q", "base")
+    (repo / "b.md").write_text("base change")
+    (repo / "added-on-base.md").write_text("added")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "base moves on")
+    _git(repo, "checkout", "-q", "feature")
+
+    changes = changes_since("base", cwd=repo)
+
+    assert changes.changed == {repo / "a.md"}
+    assert changes.removed == set()
+
+
+def test_changes_since_unknown_ref(repo):
+    with pytest.raises(ValueError):
+        changes_since("no-such-ref", cwd=repo)
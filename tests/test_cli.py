@@ -1,16 +1,29 @@
+import json
 import logging
+import threading
+import time
 from pathlib import Path
 from unittest.mock import MagicMock, call, patch
 
 import pytest
 from typer.testing import CliRunner
 
-from ailingo.cli import app
+from ailingo.cache.translation_cache import TranslationCache
+from ailingo.changes import Changes
+from ailingo.cli import _translate_jobs, app
+from ailingo.endpoint_pool import PooledLLM
+from ailingo.input_source.cached_source import CachedInputSource
 from ailingo.input_source.editor_source import EditorInputSource
 from ailingo.input_source.file_source import FileInputSource
+from ailingo.input_source.mmap_source import MmapFileInputSource
 from ailingo.input_source.url_source import UrlInputSource
+from ailingo.job import TranslationJob
+from ailingo.manifest import Manifest
+from ailingo.metrics import Metrics
 from ailingo.output_source.console_source import ConsoleOutputSource
 from ailingo.output_source.file_source import FileOutputSource
+from ailingo.prompt import PromptBuilder
+from ailingo.router import HedgedLLM
 
 runner = CliRunner()
 
@@ -73,7 +86,7 @@ def test_translate_command(mock_translator, test_file: Path):
         output_source=FileOutputSource(str(test_file.parent / "test.fr.txt")),
         source_language=None,
         target_language="fr",
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -103,7 +116,7 @@ def test_translate_with_stream(mock_translator, test_file: Path):
         output_source=FileOutputSource(str(test_file.parent / "test.fr.txt")),
         source_language=None,
         target_language="fr",
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -129,7 +142,14 @@ def test_model_name_from_environment_variable(mock_translator, test_file: Path):
 
     assert result.exit_code == 0
     mock_instance.translate.assert_called_once()
-    mock_translator.assert_called_once_with(model_name="model-from-cli")
+    mock_translator.assert_called_once_with(
+        model_name="model-from-cli",
+        llm=None,
+        chunk_size=None,
+        concurrency=4,
+        mask=False,
+        controller=None,
+    )
 
 
 @patch("ailingo.cli.Translator")
@@ -160,7 +180,7 @@ def test_translate_multiple_files(mock_translator, test_file: Path, test_file_2:
                 output_source=FileOutputSource(str(test_file.parent / "test.fr.txt")),
                 source_language=None,
                 target_language="fr",
-                overwrite=False,
+                overwrite=True,
                 dryrun=False,
                 request=None,
                 quiet=False,
@@ -173,7 +193,7 @@ def test_translate_multiple_files(mock_translator, test_file: Path, test_file_2:
                 ),
                 source_language=None,
                 target_language="fr",
-                overwrite=False,
+                overwrite=True,
                 dryrun=False,
                 request=None,
                 quiet=False,
@@ -184,7 +204,7 @@ def test_translate_multiple_files(mock_translator, test_file: Path, test_file_2:
                 output_source=FileOutputSource(str(test_file.parent / "test.ja.txt")),
                 source_language=None,
                 target_language="ja",
-                overwrite=False,
+                overwrite=True,
                 dryrun=False,
                 request=None,
                 quiet=False,
@@ -197,7 +217,7 @@ def test_translate_multiple_files(mock_translator, test_file: Path, test_file_2:
                 ),
                 source_language=None,
                 target_language="ja",
-                overwrite=False,
+                overwrite=True,
                 dryrun=False,
                 request=None,
                 quiet=False,
@@ -221,6 +241,7 @@ def test_rewrite_mode(mock_translator, test_file: Path, test_file_2: Path):
             "-s",
             "en",
         ],
+        input="all\n",
     )
 
     assert result.exit_code == 0
@@ -231,7 +252,7 @@ def test_rewrite_mode(mock_translator, test_file: Path, test_file_2: Path):
                 output_source=FileOutputSource(str(test_file_2.parent / "test.txt")),
                 source_language="en",
                 target_language=None,
-                overwrite=False,
+                overwrite=True,
                 dryrun=False,
                 request=None,
                 quiet=False,
@@ -242,7 +263,7 @@ def test_rewrite_mode(mock_translator, test_file: Path, test_file_2: Path):
                 output_source=FileOutputSource(str(test_file_2.parent / "test2.txt")),
                 source_language="en",
                 target_language=None,
-                overwrite=False,
+                overwrite=True,
                 dryrun=False,
                 request=None,
                 quiet=False,
@@ -266,7 +287,7 @@ def test_edit_mode(mock_translator):
         output_source=ConsoleOutputSource(),
         source_language=None,
         target_language=None,
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -286,7 +307,7 @@ def test_edit_mode_with_output_file(mock_translator, tmp_path):
         output_source=FileOutputSource(str(tmp_path / "output.txt")),
         source_language=None,
         target_language=None,
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -306,7 +327,7 @@ def test_edit_mode_with_console_output(mock_translator):
         output_source=ConsoleOutputSource(markdown=False),
         source_language=None,
         target_language=None,
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -335,7 +356,7 @@ def test_translate_default_output(mock_translator, test_file):
         output_source=FileOutputSource(str(test_file.parent / "test.fr.txt")),
         source_language=None,
         target_language="fr",
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -367,7 +388,7 @@ def test_translate_with_console_output(mock_translator, test_file):
         output_source=ConsoleOutputSource(markdown=False),
         source_language=None,
         target_language="fr",
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -389,7 +410,7 @@ def test_markdown_suffixed_input_file(mock_translator, test_md: Path):
         output_source=ConsoleOutputSource(markdown=True),
         source_language=None,
         target_language=None,
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request=None,
         quiet=False,
@@ -398,11 +419,62 @@ def test_markdown_suffixed_input_file(mock_translator, test_md: Path):
     assert mock_instance.translate.call_count == 1
 
 
-def test_translate_invalid_language_option():
+@patch("ailingo.cli.FanOut")
+@patch("ailingo.cli.Translator")
+def test_edit_mode_multiple_targets(mock_translator, mock_fan_out):
     result = runner.invoke(app, ["-e", "-t", "fr,de"])
-    assert result.exit_code == 2
-    assert (
-        "Multiple target languages cannot be specified in edit mode." in result.output
+
+    assert result.exit_code == 0
+    mock_fan_out.assert_called_once_with(mock_translator.return_value)
+    jobs = mock_fan_out.return_value.run.call_args.args[0]
+    assert [job.input_source for job in jobs] == [
+        CachedInputSource(EditorInputSource()),
+        CachedInputSource(EditorInputSource()),
+    ]
+    assert jobs[0].input_source is jobs[1].input_source
+    assert [job.output_source for job in jobs] == [
+        ConsoleOutputSource(label="fr"),
+        ConsoleOutputSource(label="de"),
+    ]
+    mock_translator.return_value.translate.assert_not_called()
+
+
+@patch("ailingo.cli.FanOut")
+@patch("ailingo.cli.Translator")
+def test_edit_mode_multiple_targets_rejects_stream(mock_translator, mock_fan_out):
+    result = runner.invoke(app, ["-e", "-t", "fr,de", "--stream"])
+
+    assert result.exit_code != 0
+    assert "--stream" in result.output
+    mock_fan_out.return_value.run.assert_not_called()
+
+
+@patch("ailingo.cli.FanOut")
+@patch("ailingo.cli.Translator")
+def test_translate_url_multiple_targets(mock_translator, mock_fan_out, tmp_path):
+    result = runner.invoke(
+        app,
+        [
+            "-u",
+            "https://example.com",
+            "-t",
+            "fr,de",
+            "-o",
+            str(tmp_path / "page.{target}.md"),
+        ],
+    )
+
+    assert result.exit_code == 0
+    jobs = mock_fan_out.return_value.run.call_args.args[0]
+    assert [job.output_source for job in jobs] == [
+        FileOutputSource(str(tmp_path / "page.fr.md")),
+        FileOutputSource(str(tmp_path / "page.de.md")),
+    ]
+    # the dashboard shows the download instead of a spinner of its own
+    assert all(
+        job.input_source
+        == CachedInputSource(UrlInputSource("https://example.com", quiet=True))
+        for job in jobs
     )
 
 
@@ -451,14 +523,21 @@ def test_translate_url(mock_translator, tmp_path):
         output_source=FileOutputSource(str(tmp_path / "output.fr.txt")),
         source_language=None,
         target_language="fr",
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request="Original text is extracted from a website. Convert it to markdown.",
         quiet=False,
         stream=False,
     )
     assert mock_instance.translate.call_count == 1
-    mock_translator.assert_called_once_with(model_name="gpt-4o")
+    mock_translator.assert_called_once_with(
+        model_name="gpt-4o",
+        llm=None,
+        chunk_size=None,
+        concurrency=4,
+        mask=False,
+        controller=None,
+    )
 
 
 @patch("ailingo.cli.Translator")
@@ -483,7 +562,7 @@ def test_translate_with_request(mock_translator, test_file: Path):
         output_source=FileOutputSource(str(test_file.parent / "test.ja.txt")),
         source_language=None,
         target_language="ja",
-        overwrite=False,
+        overwrite=True,
         dryrun=False,
         request="Translate to casual Japanese",
         quiet=False,
@@ -541,9 +620,549 @@ def test_translate_with_dryrun(mock_translator, test_file: Path):
         output_source=FileOutputSource(str(test_file.parent / "test.de.txt")),
         source_language=None,
         target_language="de",
-        overwrite=False,
+        overwrite=True,
         dryrun=True,
         request=None,
         quiet=False,
         stream=False,
     )
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_with_fallback_models(mock_translator, test_file: Path):
+    mock_instance = MagicMock()
+    mock_translator.return_value = mock_instance
+
+    result = runner.invoke(
+        app,
+        [
+            str(test_file),
+            "-t",
+            "fr",
+            "-m",
+            "gpt-4o,gemini-1.5-pro",
+            "--hedge-after",
+            "5",
+        ],
+    )
+
+    assert result.exit_code == 0
+    llm = mock_translator.call_args.kwargs["llm"]
+    assert isinstance(llm, HedgedLLM)
+    assert llm.model_names == ["gpt-4o", "gemini-1.5-pro"]
+    assert llm.hedge_after == 5
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_with_hedging_off(mock_translator, test_file: Path):
+    result = runner.invoke(
+        app,
+        [
+            str(test_file),
+            "-t",
+            "fr",
+            "-m",
+            "gpt-4o,gemini-1.5-pro",
+            "--hedge-after",
+            "0",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert mock_translator.call_args.kwargs["llm"].hedge_after is None
+
+
+@patch("ailingo.cli.EndpointPool")
+@patch("ailingo.cli.Translator")
+def test_translate_with_endpoints(mock_translator, mock_pool, test_file: Path):
+    mock_instance = MagicMock()
+    mock_translator.return_value = mock_instance
+
+    result = runner.invoke(
+        app,
+        [
+            str(test_file),
+            "-t",
+            "fr",
+            "-m",
+            "openai/llama3",
+            "--api-base",
+            "http://localhost:8000/v1,http://localhost:8001/v1",
+        ],
+    )
+
+    assert result.exit_code == 0
+    mock_pool.assert_called_once_with(
+        ["http://localhost:8000/v1", "http://localhost:8001/v1"],
+        max_concurrency=4,
+        max_latency=None,
+    )
+    llm = mock_translator.call_args.kwargs["llm"]
+    assert isinstance(llm, PooledLLM)
+    assert llm.pool is mock_pool.return_value
+    mock_pool.return_value.check_health.assert_called_once()
+    # the health checks are stopped when the command ends
+    mock_pool.return_value.__exit__.assert_called_once()
+
+
+@patch("ailingo.cli.EndpointPool")
+@patch("ailingo.cli.Translator")
+def test_translate_with_endpoints_dry_run(mock_translator, mock_pool, test_file: Path):
+    result = runner.invoke(
+        app,
+        [
+            str(test_file),
+            "-t",
+            "fr",
+            "-m",
+            "openai/llama3",
+            "--api-base",
+            "http://localhost:8000/v1",
+            "--endpoint-max-latency",
+            "2.5",
+            "--dry-run",
+        ],
+    )
+
+    assert result.exit_code == 0
+    mock_pool.assert_called_once_with(
+        ["http://localhost:8000/v1"], max_concurrency=4, max_latency=2.5
+    )
+    mock_pool.return_value.check_health.assert_not_called()
+    mock_pool.return_value.start_health_checks.assert_not_called()
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_with_chunk_size(mock_translator, test_file: Path):
+    mock_instance = MagicMock()
+    mock_translator.return_value = mock_instance
+
+    result = runner.invoke(app, [str(test_file), "-t", "fr", "--chunk-size", "1000"])
+
+    assert result.exit_code == 0
+    assert mock_translator.call_args.kwargs["chunk_size"] == 1000
+    assert mock_instance.translate.call_args.kwargs[
+        "input_source"
+    ] == MmapFileInputSource(str(test_file))
+
+
+@patch("ailingo.cli.Deduplicator")
+@patch("ailingo.cli.Translator")
+def test_translate_with_dedup(
+    mock_translator, mock_deduplicator, test_file: Path, test_file_2: Path
+):
+    result = runner.invoke(
+        app, [str(test_file), str(test_file_2), "-t", "fr,de", "--dedup"]
+    )
+
+    assert result.exit_code == 0
+    mock_deduplicator.assert_called_once_with(mock_translator.return_value)
+    jobs = mock_deduplicator.return_value.run.call_args.args[0]
+    assert [(job.input_source.path, job.target_language) for job in jobs] == [
+        (str(test_file), "fr"),
+        (str(test_file), "de"),
+        (str(test_file_2), "fr"),
+        (str(test_file_2), "de"),
+    ]
+    mock_translator.return_value.translate.assert_not_called()
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_shard(mock_translator, tmp_path):
+    mock_instance = MagicMock()
+    mock_translator.return_value = mock_instance
+    mock_instance.translate.return_value = True
+    mock_instance.metrics = Metrics()
+    files = []
+    for i in range(10):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text("Test content.")
+        files.append(str(path))
+
+    translated = []
+    for shard in ["1/2", "2/2"]:
+        manifest_path = tmp_path / f"manifest-{shard[0]}.json"
+        result = runner.invoke(
+            app,
+            [*files, "-t", "fr,de", "--shard", shard, "--manifest", str(manifest_path)],
+        )
+        assert result.exit_code == 0
+        manifest = Manifest.load(manifest_path)
+        assert manifest.shard == shard
+        translated.extend((job.input, job.target) for job in manifest.jobs)
+
+    assert sorted(translated) == sorted(
+        (file, target) for file in files for target in ["fr", "de"]
+    )
+
+    result = runner.invoke(
+        app,
+        [
+            "merge",
+            str(tmp_path / "manifest-1.json"),
+            str(tmp_path / "manifest-2.json"),
+            "-o",
+            str(tmp_path / "merged.json"),
+        ],
+    )
+    assert result.exit_code == 0
+    assert "20 jobs" in result.output
+    assert len(Manifest.load(tmp_path / "merged.json").jobs) == 20
+
+
+def test_translate_invalid_shard(test_file):
+    result = runner.invoke(app, [str(test_file), "-t", "fr", "--shard", "3/2"])
+    assert result.exit_code == 2
+
+
+@patch("ailingo.cli.Translator")
+def test_enqueue_and_worker(mock_translator, test_file, test_file_2, tmp_path):
+    queue_path = tmp_path / "queue.db"
+    result = runner.invoke(
+        app,
+        [
+            "enqueue",
+            str(test_file),
+            str(test_file_2),
+            "-t",
+            "fr,de",
+            "-r",
+            "Be polite.",
+            "--queue",
+            str(queue_path),
+        ],
+    )
+    assert result.exit_code == 0
+    assert "Queued 4 jobs" in result.output
+
+    mock_instance = mock_translator.return_value
+    mock_instance.translate.side_effect = [
+        True,
+        Exception("API error"),
+        True,
+        True,
+        True,
+    ]
+    result = runner.invoke(app, ["worker", "--queue", str(queue_path)])
+
+    assert result.exit_code == 0
+    assert "4 done, 0 failed" in result.output
+    assert mock_instance.translate.call_count == 5
+    assert mock_instance.translate.call_args_list[0] == call(
+        input_source=FileInputSource(str(test_file)),
+        output_source=FileOutputSource(str(test_file.parent / "test.fr.txt")),
+        source_language=None,
+        target_language="fr",
+        overwrite=True,
+        request="Be polite.",
+        quiet=False,
+    )
+
+
+@patch("ailingo.cli.Translator")
+def test_worker_resolves_relative_paths_from_enqueue(
+    mock_translator, test_file, tmp_path, monkeypatch
+):
+    queue_path = tmp_path / "queue.db"
+    monkeypatch.chdir(test_file.parent)
+    result = runner.invoke(
+        app,
+        ["enqueue", test_file.name, "-t", "fr", "--queue", str(queue_path)],
+    )
+    assert result.exit_code == 0
+
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    result = runner.invoke(app, ["worker", "--queue", str(queue_path)])
+
+    assert result.exit_code == 0
+    mock_translator.return_value.translate.assert_called_once_with(
+        input_source=FileInputSource(str(test_file.resolve())),
+        output_source=FileOutputSource(str(test_file.parent.resolve() / "test.fr.txt")),
+        source_language=None,
+        target_language="fr",
+        overwrite=True,
+        request=None,
+        quiet=False,
+    )
+
+
+def test_enqueue_to_console(test_file, tmp_path):
+    result = runner.invoke(
+        app,
+        ["enqueue", str(test_file), "-o", "-", "--queue", str(tmp_path / "q.db")],
+    )
+    assert result.exit_code == 2
+
+
+@patch("ailingo.cli.changes_since")
+@patch("ailingo.cli.Translator")
+def test_translate_changed_since(
+    mock_translator, mock_changes_since, test_file, test_file_2, tmp_path
+):
+    removed = tmp_path / "removed.txt"
+    stale_output = tmp_path / "removed.fr.txt"
+    stale_output.write_text("Stale translation.")
+    mock_changes_since.return_value = Changes(
+        changed={test_file.resolve()}, removed={removed.resolve()}
+    )
+
+    result = runner.invoke(
+        app, [str(test_file), str(test_file_2), "-t", "fr", "--changed-since", "main"]
+    )
+
+    assert result.exit_code == 0
+    mock_changes_since.assert_called_once_with("main")
+    mock_translator.return_value.translate.assert_called_once()
+    assert mock_translator.return_value.translate.call_args.kwargs[
+        "input_source"
+    ] == FileInputSource(str(test_file))
+    assert "Source removed" in result.output
+    assert stale_output.exists()
+
+    result = runner.invoke(
+        app, [str(test_file), "-t", "fr", "--changed-since", "main", "--prune"]
+    )
+    assert result.exit_code == 0
+    assert not stale_output.exists()
+
+
+@patch("ailingo.cli.watch")
+@patch("ailingo.cli.Translator")
+def test_translate_watch(mock_translator, mock_watch, test_file):
+    result = runner.invoke(app, [str(test_file), "-t", "fr,de", "--watch"])
+
+    assert result.exit_code == 0
+    mock_translator.assert_called_once()
+    watcher, translate_file = mock_watch.call_args.args
+    assert watcher.paths == {test_file.resolve()}
+
+    translate_file(test_file.resolve(), threading.Event())
+    calls = mock_translator.return_value.translate.call_args_list
+    assert [c.kwargs["target_language"] for c in calls] == ["fr", "de"]
+    assert all(c.kwargs["stream"] and c.kwargs["overwrite"] for c in calls)
+
+
+def test_translate_watch_rewrite(test_file):
+    result = runner.invoke(app, [str(test_file), "--watch"])
+    assert result.exit_code == 2
+
+
+@patch("ailingo.cli.BatchTranslator")
+@patch("ailingo.cli.Translator")
+def test_batch(mock_translator, mock_batch_translator, tmp_path):
+    input_path = tmp_path / "input.jsonl"
+    input_path.write_text('{"id": 1, "text": "Hello"}\n')
+    received: list[str] = []
+
+    def run(lines):
+        received.extend(lines)
+        yield {"id": 1, "target": "ja", "text": "こんにちは"}
+
+    mock_batch_translator.return_value.run.side_effect = run
+
+    with patch("ailingo.cli.HttpPool") as mock_http_pool:
+        result = runner.invoke(
+            app, ["batch", str(input_path), "-t", "ja", "--concurrency", "16"]
+        )
+
+    assert result.exit_code == 0
+    # the connections are closed when the command ends
+    mock_http_pool.return_value.__exit__.assert_called_once()
+    assert result.output == '{"id": 1, "target": "ja", "text": "こんにちは"}\n'
+    mock_batch_translator.assert_called_once_with(
+        mock_translator.return_value,
+        concurrency=16,
+        source_language=None,
+        target_language="ja",
+        request=None,
+        packer=None,
+    )
+    assert received == ['{"id": 1, "text": "Hello"}\n']
+
+
+def test_cache_export_and_import(tmp_path):
+    runner1 = TranslationCache(tmp_path / "runner1.db")
+    runner1.put("a", "A")
+    runner2 = TranslationCache(tmp_path / "runner2.db")
+    runner2.put("b", "B")
+    remote = str(tmp_path / "remote")
+
+    for cache in [runner1, runner2]:
+        result = runner.invoke(
+            app, ["cache", "export", "--cache", str(cache.path), "--remote", remote]
+        )
+        assert result.exit_code == 0
+    assert len(list((tmp_path / "remote").glob("*.pack"))) == 2
+
+    cache_path = tmp_path / "cache.db"
+    result = runner.invoke(
+        app, ["cache", "import", "--cache", str(cache_path), "--remote", remote]
+    )
+    assert result.exit_code == 0
+    assert "Imported 2 translations from 2 packs" in result.output
+
+    pack_path = tmp_path / "merged.pack"
+    result = runner.invoke(
+        app, ["cache", "export", "--cache", str(cache_path), "-o", str(pack_path)]
+    )
+    assert result.exit_code == 0
+    merged = TranslationCache(tmp_path / "merged.db")
+    assert merged.import_pack(pack_path.read_bytes()) == 2
+
+
+def test_cache_import_invalid_pack(tmp_path):
+    pack_path = tmp_path / "invalid.pack"
+    pack_path.write_bytes(b"invalid")
+    result = runner.invoke(
+        app,
+        ["cache", "import", str(pack_path), "--cache", str(tmp_path / "cache.db")],
+    )
+    assert result.exit_code != 0
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_keeps_existing_outputs(mock_translator, test_file, test_file_2):
+    mock_instance = MagicMock(metrics=Metrics())
+    mock_translator.return_value = mock_instance
+    (test_file.parent / "test.fr.txt").write_text("Existing translation.")
+    manifest_path = test_file.parent / "manifest.json"
+
+    result = runner.invoke(
+        app,
+        [
+            str(test_file),
+            str(test_file_2),
+            "-t",
+            "fr",
+            "--overwrite",
+            "none",
+            "--manifest",
+            str(manifest_path),
+        ],
+    )
+
+    assert result.exit_code == 0
+    mock_instance.translate.assert_called_once()
+    assert mock_instance.translate.call_args.kwargs["input_source"] == FileInputSource(
+        str(test_file_2)
+    )
+    statuses = {job.input: job.status for job in Manifest.load(manifest_path).jobs}
+    assert statuses == {str(test_file): "skipped", str(test_file_2): "translated"}
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_asks_once(mock_translator, test_file, test_file_2):
+    mock_instance = MagicMock()
+    mock_translator.return_value = mock_instance
+    (test_file.parent / "test.fr.txt").write_text("Existing translation.")
+    (test_file.parent / "test2.fr.txt").write_text("Existing translation.")
+
+    result = runner.invoke(
+        app, [str(test_file), str(test_file_2), "-t", "fr"], input="none\n"
+    )
+
+    assert result.exit_code == 0
+    assert "2 of 2 outputs already exist" in result.output
+    assert result.output.count("Overwrite them?") == 1
+    mock_instance.translate.assert_not_called()
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_output_conflict(mock_translator, test_file, test_file_2):
+    result = runner.invoke(
+        app,
+        [str(test_file), str(test_file_2), "-t", "fr", "-o", "{parent}/out.txt"],
+    )
+
+    assert result.exit_code != 0
+    assert "Several jobs would write the same output" in result.output
+    mock_translator.return_value.translate.assert_not_called()
+
+
+def test_translate_invalid_overwrite_policy(test_file):
+    result = runner.invoke(app, [str(test_file), "-t", "fr", "--overwrite", "some"])
+    assert result.exit_code != 0
+
+
+@patch("ailingo.cli.Translator")
+def test_translate_schedule(mock_translator, tmp_path):
+    mock_instance = MagicMock(prompt_builder=PromptBuilder())
+    mock_translator.return_value = mock_instance
+    for name, size in [("small.txt", 10), ("large.txt", 1000), ("README.txt", 1)]:
+        (tmp_path / name).write_text("word " * size)
+
+    result = runner.invoke(
+        app,
+        [
+            *(
+                str(tmp_path / name)
+                for name in ["small.txt", "large.txt", "README.txt"]
+            ),
+            "-t",
+            "fr",
+            "--schedule",
+            "largest",
+            "--priority",
+            "README.*",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert [
+        Path(c.kwargs["input_source"].path).name
+        for c in mock_instance.translate.call_args_list
+    ] == ["README.txt", "large.txt", "small.txt"]
+
+
+@patch("ailingo.translator.Translator.translate_text")
+def test_batch_writes_only_json_to_stdout(mock_translate_text, tmp_path, monkeypatch):
+    # let setup_logger install its handler, as outside of pytest
+    monkeypatch.setattr(logging.getLogger(), "handlers", [])
+    mock_translate_text.side_effect = RuntimeError("model unavailable")
+    input_path = tmp_path / "input.jsonl"
+    input_path.write_text('{"id": 1, "text": "Hello"}\nnot json\n')
+
+    result = runner.invoke(app, ["batch", str(input_path), "-t", "ja"])
+
+    assert result.exit_code == 0
+    results = [json.loads(line) for line in result.stdout.splitlines()]
+    [invalid] = [result for result in results if "line" in result]
+    assert invalid["line"] == 2
+    assert invalid["error"].startswith("Invalid record")
+    assert {"id": 1, "target": "ja", "error": "model unavailable"} in results
+    assert "Failed to translate" in result.stderr
+
+
+def test_translate_jobs_in_parallel(tmp_path):
+    started: list[str] = []
+    finished: list[str] = []
+    in_flight: list[int] = []
+    lock = threading.Lock()
+
+    def translate(input_source, **kwargs):
+        with lock:
+            started.append(input_source.path)
+            in_flight.append(len(started) - len(finished))
+        time.sleep(0.05)
+        with lock:
+            finished.append(input_source.path)
+        return True
+
+    translator = MagicMock(chunk_size=None, dashboard=None, concurrency=2)
+    translator.translate.side_effect = translate
+    jobs = [
+        TranslationJob(
+            input_source=FileInputSource(str(tmp_path / f"{index}.txt")),
+            output_source=FileOutputSource(str(tmp_path / f"{index}.fr.txt")),
+            target_language="fr",
+        )
+        for index in range(5)
+    ]
+
+    results = _translate_jobs(translator, jobs, dryrun=False, quiet=True, stream=False)
+
+    assert results == [True] * 5
+    assert started == [job.input_source.path for job in jobs]
+    assert max(in_flight) == 2
@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from ailingo.dashboard import Dashboard
+from ailingo.input_source.text_source import TextInputSource
+from ailingo.output_source.file_source import FileOutputSource
+from ailingo.translator import Translator
+
+
+def _render(dashboard: Dashboard) -> str:
+    console = Console(width=200, record=True, force_terminal=False)
+    console.print(dashboard.render())
+    return console.export_text()
+
+
+def test_counts_jobs():
+    dashboard = Dashboard(total=4)
+    dashboard.start("a.ja.md")
+    dashboard.start("b.ja.md")
+    dashboard.finish("a.ja.md")
+    dashboard.skip()
+    dashboard.add_tokens(120)
+
+    text = _render(dashboard)
+    assert "1/3 done" in text
+    assert "1 in flight · 1 queued" in text
+    assert "tokens/s" in text
+    assert "b.ja.md" in text
+    assert "a.ja.md" not in text
+
+
+def test_shows_only_the_slowest_jobs():
+    dashboard = Dashboard(total=5, slowest=2)
+    with patch("ailingo.dashboard.time.monotonic", side_effect=[1, 2, 3, 10]):
+        for name in ["first", "second", "third"]:
+            dashboard.start(name)
+        text = _render(dashboard)
+    assert "00:09 first" in text
+    assert "00:08 second" in text
+    assert "third" not in text
+
+
+def test_failed_job():
+    dashboard = Dashboard(total=1)
+    with pytest.raises(ValueError):
+        with dashboard.job("a.ja.md"):
+            raise ValueError("boom")
+    assert dashboard.done == 1
+    assert dashboard.failed == 1
+    assert "(1 failed)" in _render(dashboard)
+
+
+def test_translator_reports_to_dashboard(tmp_path):
+    translator = Translator("gpt-4o")
+    translator.dashboard = Dashboard(total=1)
+    output_path = tmp_path / "out.txt"
+    with patch.object(translator.llm, "completion", return_value="Bonjour le monde"):
+        translator.translate(
+            TextInputSource("Hello world"),
+            FileOutputSource(output_path),
+            target_language="fr",
+            quiet=True,
+        )
+    assert output_path.read_text() == "Bonjour le monde"
+    assert translator.dashboard.done == 1
+    assert translator.dashboard.tokens == 4
@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock
+
+from ailingo.dedup import Deduplicator
+from ailingo.input_source.file_source import FileInputSource
+from ailingo.job import TranslationJob
+from ailingo.llm import LLM
+from ailingo.output_source.file_source import FileOutputSource
+from ailingo.prompt import PromptBuilder
+from ailingo.translator import Translator
+
+FOOTER = "This document is licensed under the MIT License."
+
+
+def test_shared_paragraphs_are_translated_once(tmp_path):
+    inputs = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text(f"Document {i}.\n\n{FOOTER}\n")
+        inputs.append(path)
+
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: prompt.upper()
+    prompt_builder = MagicMock(spec=PromptBuilder)
+    prompt_builder.build.side_effect = lambda **kwargs: kwargs["input_text"]
+    translator = Translator(model_name="gpt-4o", llm=llm, prompt_builder=prompt_builder)
+
+    jobs = [
+        TranslationJob(
+            input_source=FileInputSource(path),
+            output_source=FileOutputSource.from_pattern(
+                str(path), "{parent}/{stem}.{target}{suffix}", target=target
+            ),
+            target_language=target,
+        )
+        for path in inputs
+        for target in ["fr", "de"]
+    ]
+    Deduplicator(translator).run(jobs, quiet=True)
+
+    for i in range(3):
+        for target in ["fr", "de"]:
+            assert (tmp_path / f"doc{i}.{target}.md").read_text() == (
+                f"DOCUMENT {i}.\n\n{FOOTER.upper()}\n"
+            )
+    # 3 documents + 1 shared footer, for each target language
+    assert llm.completion.call_count == 8
+    assert translator.metrics.get("dedup.segments") == 12
+    assert translator.metrics.get("dedup.unique_segments") == 8
+    assert translator.metrics.get("dedup.ratio") == 1 - 8 / 12
+
+
+def test_unique_paragraphs_are_grouped(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("One.\n\nTwo.\n\nThree.\n")
+
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: prompt.upper()
+    prompt_builder = MagicMock(spec=PromptBuilder)
+    prompt_builder.build.side_effect = lambda **kwargs: kwargs["input_text"]
+    translator = Translator(model_name="gpt-4o", llm=llm, prompt_builder=prompt_builder)
+
+    job = TranslationJob(
+        input_source=FileInputSource(path),
+        output_source=FileOutputSource(tmp_path / "doc.fr.md"),
+        target_language="fr",
+    )
+    Deduplicator(translator).run([job], quiet=True)
+
+    llm.completion.assert_called_once_with("One.\n\nTwo.\n\nThree.")
+    assert (tmp_path / "doc.fr.md").read_text() == "ONE.\n\nTWO.\n\nTHREE.\n"
+
+
+def test_shared_paragraphs_are_translated_per_file_type(tmp_path):
+    paths = [tmp_path / "a.md", tmp_path / "b.md", tmp_path / "c.yaml"]
+    for path in paths:
+        path.write_text(f"{FOOTER}\n")
+
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: prompt.upper()
+    prompt_builder = MagicMock(spec=PromptBuilder)
+    prompt_builder.build.side_effect = lambda **kwargs: kwargs["input_text"]
+    translator = Translator(model_name="gpt-4o", llm=llm, prompt_builder=prompt_builder)
+
+    jobs = [
+        TranslationJob(
+            input_source=FileInputSource(path),
+            output_source=FileOutputSource(path.with_name(f"fr.{path.name}")),
+            target_language="fr",
+        )
+        for path in paths
+    ]
+    Deduplicator(translator).run(jobs, quiet=True)
+
+    # the prompt names the file type, so .md and .yaml files are translated apart
+    assert llm.completion.call_count == 2
+    assert {
+        call.kwargs["input_path"] for call in prompt_builder.build.call_args_list
+    } == {str(paths[0]), str(paths[2])}
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ailingo.endpoint_pool import EndpointPool, PooledLLM
+
+
+class FakeInferenceHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible server that streams its own port as the answer.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self._send_json({"object": "list", "data": []})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests += 1  # type: ignore
+        time.sleep(self.server.delay)  # type: ignore
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for content, finish_reason in [
+            (str(self.server.server_port), None),
+            ("", "stop"),
+        ]:
+            chunk = {
+                "id": "chatcmpl-1",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "fake",
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": content},
+                        "finish_reason": finish_reason,
+                    }
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_json(self, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def fake_servers():
+    servers = []
+    for _ in range(2):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeInferenceHandler)
+        server.requests = 0  # type: ignore
+        server.delay = 0.1  # type: ignore
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.shutdown()
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def test_least_outstanding_dispatch():
+    pool = EndpointPool(["http://a", "http://b"], max_concurrency=2)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.base_url, second.base_url} == {"http://a", "http://b"}
+    pool.release(first)
+    assert pool.acquire() is first
+
+
+def test_concurrency_limit():
+    pool = EndpointPool(["http://a"], max_concurrency=1)
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+
+def test_eject_failing_endpoint():
+    pool = EndpointPool(["http://a", "http://b"], max_failures=2, eject_seconds=60)
+    a = pool.endpoints[0]
+    for _ in range(2):
+        a.outstanding += 1
+        pool.release(a, error=RuntimeError("failed"))
+    assert [pool.acquire().base_url for _ in range(3)] == ["http://b"] * 3
+
+
+def test_eject_slow_endpoint():
+    pool = EndpointPool(["http://a", "http://b"], max_latency=1.0)
+    a = pool.acquire()
+    pool.release(a, latency=5.0)
+    assert pool.acquire().base_url != a.base_url
+
+
+def test_health_check(fake_servers):
+    pool = EndpointPool([_url(fake_servers[0]), "http://127.0.0.1:1/v1"])
+    pool.check_health(timeout=1)
+    assert [e.healthy for e in pool.endpoints] == [True, False]
+
+
+def test_pooled_llm_spreads_requests(fake_servers, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "dummy")
+    pool = EndpointPool([_url(server) for server in fake_servers], max_concurrency=1)
+    llm = PooledLLM("openai/fake", pool)
+
+    results: list[str] = []
+
+    def run():
+        results.append("".join(llm.iter_completion("hello")))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == sorted(
+        [str(server.server_port) for server in fake_servers] * 2
+    )
+    assert [server.requests for server in fake_servers] == [2, 2]
+    assert all(e.outstanding == 0 for e in pool.endpoints)
+
+
+def test_pooled_llm_completion_records_time_to_first_token(fake_servers, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "dummy")
+    pool = EndpointPool([_url(fake_servers[0])])
+    llm = PooledLLM("openai/fake", pool)
+
+    # the fake server only streams, so the response must be requested as a stream
+    assert llm.completion("hello") == str(fake_servers[0].server_port)
+    assert pool.endpoints[0].latency is not None
+    assert pool.endpoints[0].outstanding == 0
+
+
+def test_pooled_llm_async_uses_pool(fake_servers, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "dummy")
+    pool = EndpointPool([_url(server) for server in fake_servers], max_concurrency=1)
+    llm = PooledLLM("openai/fake", pool)
+
+    async def run() -> list[str]:
+        return await asyncio.gather(*(llm.acompletion("hello") for _ in range(4)))
+
+    results = asyncio.run(run())
+
+    assert sorted(results) == sorted(
+        [str(server.server_port) for server in fake_servers] * 2
+    )
+    assert [server.requests for server in fake_servers] == [2, 2]
+    assert all(e.outstanding == 0 and e.latency is not None for e in pool.endpoints)
+
+
+def test_pooled_llm_async_returns_slot_when_cancelled():
+    pool = EndpointPool(["http://localhost:1/v1"], max_concurrency=1)
+    llm = PooledLLM("openai/fake", pool)
+    held = pool.acquire()
+
+    async def run():
+        task = asyncio.create_task(llm.acompletion("hello"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # the waiting thread gets the slot once it is free, and hands it back
+        pool.release(held)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert pool.endpoints[0].outstanding == 0
+
+
+def test_close_stops_health_checks():
+    pool = EndpointPool(["http://localhost:1/v1"])
+    with pool:
+        stopped = pool.start_health_checks(interval=60)
+    assert stopped.is_set()
@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock
+
+from ailingo.fanout import FanOut
+from ailingo.input_source.cached_source import CachedInputSource
+from ailingo.input_source.url_source import UrlInputSource
+from ailingo.job import TranslationJob
+from ailingo.llm import LLM
+from ailingo.output_source.console_source import ConsoleOutputSource
+from ailingo.output_source.file_source import FileOutputSource
+from ailingo.prompt import PromptBuilder
+from ailingo.translator import Translator
+
+
+def test_fan_out_reads_input_once(tmp_path, capsys):
+    url_source = MagicMock(spec=UrlInputSource, path="https://example.com")
+    url_source.read.return_value = "Hello"
+    input_source = CachedInputSource(url_source)
+
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: prompt
+    prompt_builder = MagicMock(spec=PromptBuilder)
+    prompt_builder.build.side_effect = lambda **kwargs: (
+        f"{kwargs['input_text']} in {kwargs['target_language']}"
+    )
+    translator = Translator(
+        model_name="gpt-4o", llm=llm, prompt_builder=prompt_builder, concurrency=3
+    )
+    jobs = [
+        TranslationJob(
+            input_source=input_source,
+            output_source=ConsoleOutputSource(label=target),
+            target_language=target,
+        )
+        for target in ["fr", "de"]
+    ] + [
+        TranslationJob(
+            input_source=input_source,
+            output_source=FileOutputSource(tmp_path / "page.es.md"),
+            target_language="es",
+        )
+    ]
+
+    translated = FanOut(translator).run(jobs, quiet=True)
+
+    assert translated == jobs
+    url_source.read.assert_called_once_with()
+    assert llm.completion.call_count == 3
+    output = capsys.readouterr().out
+    assert (
+        output.index("Hello in fr") < output.index("de") < output.index("Hello in de")
+    )
+    assert (tmp_path / "page.es.md").read_text() == "Hello in es"
+
+
+def test_fan_out_translates_long_input_in_segments(tmp_path):
+    url_source = MagicMock(spec=UrlInputSource, path="https://example.com")
+    url_source.read.return_value = "First paragraph.\n\nSecond paragraph.\n"
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = lambda prompt: prompt.upper()
+    prompt_builder = MagicMock(spec=PromptBuilder)
+    prompt_builder.build.side_effect = lambda **kwargs: kwargs["input_text"]
+    translator = Translator(
+        model_name="gpt-4o", llm=llm, prompt_builder=prompt_builder, chunk_size=20
+    )
+    jobs = [
+        TranslationJob(
+            input_source=CachedInputSource(url_source),
+            output_source=FileOutputSource(tmp_path / f"page.{target}.md"),
+            target_language=target,
+        )
+        for target in ["fr", "de"]
+    ]
+
+    FanOut(translator).run(jobs, quiet=True)
+
+    assert llm.completion.call_count == 4
+    assert (tmp_path / "page.fr.md").read_text() == (
+        "FIRST PARAGRAPH.\n\nSECOND PARAGRAPH.\n"
+    )
@@ -0,0 +1,103 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from ailingo.glossary import Glossary, GlossaryExtractor
+from ailingo.input_source.text_source import TextInputSource
+from ailingo.output_source.file_source import FileOutputSource
+from ailingo.translator import Translator
+
+TEXT = "\n\n".join(f"Paragraph {index} about the Widget." for index in range(6))
+
+
+def test_parse():
+    glossary = Glossary.parse(
+        "Here are the terms:\n"
+        "- Widget => ウィジェット\n"
+        "`Frobnicator` => `フロブニケーター`\n"
+        "Widget => 部品\n"
+        "not a term\n",
+    )
+    assert glossary.terms == {
+        "Widget": "ウィジェット",
+        "Frobnicator": "フロブニケーター",
+    }
+    assert str(glossary) == "Widget => ウィジェット\nFrobnicator => フロブニケーター"
+    assert Glossary.parse("a => b\nc => d", max_terms=1).terms == {"a": "b"}
+    assert not Glossary.parse("")
+
+
+def test_sample():
+    extractor = GlossaryExtractor(MagicMock(), sample_tokens=10)
+    segments = [f"{index:02d}".ljust(20) for index in range(10)]  # 5 tokens each
+    # spread over the list
+    assert extractor.sample(segments) == segments[0] + segments[5]
+    # the beginning of a stream
+    assert extractor.sample(iter(segments)) == segments[0] + segments[1]
+    # a segment longer than the limit is still sent
+    assert extractor.sample(["x" * 100]) == "x" * 100
+
+
+def fake_completion(prompt: list[dict]) -> str:
+    if "terminologist" in prompt[0]["content"]:
+        return "Widget => ウィジェット"
+    return prompt[1]["content"].split("----------\n")[-1]
+
+
+def make_translator() -> Translator:
+    llm = MagicMock()
+    llm.completion.side_effect = fake_completion
+
+    async def acompletion(prompt):
+        return fake_completion(prompt)
+
+    llm.acompletion.side_effect = acompletion
+    translator = Translator(model_name="gpt-4o", llm=llm, chunk_size=40)
+    translator.glossary = GlossaryExtractor(
+        llm, translator.prompt_builder, metrics=translator.metrics
+    )
+    return translator
+
+
+def test_translate_with_glossary(tmp_path):
+    translator = make_translator()
+    output_path = tmp_path / "out.txt"
+    translator.translate(
+        TextInputSource(TEXT, path="doc.md"),
+        FileOutputSource(str(output_path)),
+        target_language="ja",
+        quiet=True,
+    )
+
+    prompts = [c.args[0] for c in translator.llm.completion.call_args_list]
+    glossary_prompts = [p for p in prompts if "terminologist" in p[0]["content"]]
+    segment_prompts = [p for p in prompts if p not in glossary_prompts]
+    assert len(glossary_prompts) == 1
+    assert len(segment_prompts) > 1
+    assert all("Widget => ウィジェット" in p[0]["content"] for p in segment_prompts)
+    assert output_path.read_text() == TEXT
+    assert translator.metrics.get("glossary.terms") == 1
+    assert not translator._glossaries
+
+
+def test_translate_short_text_without_glossary(tmp_path):
+    translator = make_translator()
+    translator.translate(
+        TextInputSource("Widget", path="doc.md"),
+        FileOutputSource(str(tmp_path / "out.txt")),
+        target_language="ja",
+        quiet=True,
+    )
+    assert translator.llm.completion.call_count == 1
+
+
+def test_atranslate_with_glossary():
+    translator = make_translator()
+    result = asyncio.run(
+        translator.atranslate(
+            TextInputSource(TEXT, path="doc.md"), target_language="ja"
+        )
+    )
+    assert result == TEXT
+    prompts = [c.args[0] for c in translator.llm.acompletion.call_args_list]
+    assert sum("terminologist" in p[0]["content"] for p in prompts) == 1
+    assert all("Widget => ウィジェット" in p[0]["content"] for p in prompts[1:])
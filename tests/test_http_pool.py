@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import litellm
+import pytest
+
+from ailingo.http_pool import HttpPool
+from ailingo.llm import LLM
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuses_connections(server_url):
+    pool = HttpPool(http2=False)
+    for _ in range(3):
+        assert pool.client.get(server_url).text == "ok"
+    pool.close()
+    assert pool.metrics.get("http.requests") == 3
+    assert pool.metrics.get("http.connections") == 1
+    assert pool.metrics.get("http.reused") == 2
+
+
+def test_reuses_async_connections(server_url):
+    pool = HttpPool(http2=False)
+
+    async def run():
+        for _ in range(2):
+            await pool.async_client.get(server_url)
+
+    asyncio.run(run())
+    assert pool.metrics.get("http.connections") == 1
+    assert pool.metrics.get("http.reused") == 1
+
+
+def test_install_and_close():
+    pool = HttpPool()
+    pool.install()
+    assert litellm.client_session is pool.client
+    pool.close()
+    assert litellm.client_session is None
+
+
+def test_llm_installs_pool_once():
+    pool = HttpPool()
+    llm = LLM("gpt-4o")
+    llm.http_pool = pool
+    assert litellm.client_session is pool.client
+    with patch.object(pool, "install") as install:
+        with patch("litellm.completion", return_value=[]):
+            list(llm._completion("gpt-4o", "Hello"))
+    install.assert_not_called()
+    pool.close()
+
+
+def test_closes_async_client_with_its_loop(server_url):
+    pool = HttpPool(http2=False)
+
+    async def run():
+        pool.ainstall()
+        await pool.async_client.get(server_url)
+        return pool.async_client
+
+    first = asyncio.run(run())
+    assert first.is_closed
+    second = asyncio.run(run())
+    assert second is not first
+    assert litellm.aclient_session is second
+    pool.close()
+    assert litellm.aclient_session is None
+
+
+def test_close_closes_async_client_of_open_loop(server_url):
+    pool = HttpPool(http2=False)
+    loop = asyncio.new_event_loop()
+
+    async def run():
+        await pool.async_client.get(server_url)
+        return pool.async_client
+
+    client = loop.run_until_complete(run())
+    with pool:
+        pass
+    assert client.is_closed
+    loop.close()
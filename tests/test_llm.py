@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from ailingo.llm import LLM
+
+
+def _chunk(content: str | None, finish_reason: str | None = None):
+    return SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                delta=SimpleNamespace(content=content), finish_reason=finish_reason
+            )
+        ]
+    )
+
+
+def _message(content: str, finish_reason: str = "stop"):
+    return SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                message=SimpleNamespace(content=content), finish_reason=finish_reason
+            )
+        ]
+    )
+
+
+def _stream(*parts: str, finish_reason: str = "stop"):
+    return [_chunk(part) for part in parts] + [_chunk(None, finish_reason)]
+
+
+def test_iter_completion():
+    with patch("litellm.completion", return_value=_stream("Bonjour", ", monde")):
+        assert list(LLM("gpt-4o").iter_completion("Hello")) == ["Bonjour", ", monde"]
+
+
+def test_iter_completion_continues_after_length_limit():
+    responses = [
+        _stream("First half of the translation. ", finish_reason="length"),
+        # the model repeats the end of the previous output
+        _stream("of the translation. Second half."),
+    ]
+    with patch("litellm.completion", side_effect=responses) as mock_completion:
+        output = "".join(LLM("gpt-4o").iter_completion("Hello"))
+
+    assert output == "First half of the translation. Second half."
+    assert mock_completion.call_count == 2
+    messages = mock_completion.call_args.kwargs["messages"]
+    assert messages[0] == {"content": "Hello", "role": "user"}
+    assert "First half of the translation." in messages[1]["content"]
+
+
+def test_iter_completion_stops_after_max_continuations():
+    responses = [_stream(f"part {i}. ", finish_reason="length") for i in range(3)]
+    with patch("litellm.completion", side_effect=responses) as mock_completion:
+        output = "".join(LLM("gpt-4o", max_continuations=1).iter_completion("Hello"))
+
+    assert output == "part 0. part 1. "
+    assert mock_completion.call_count == 2
+
+
+def test_completion_does_not_stream():
+    with patch("litellm.completion", return_value=_message("Bonjour")) as mock:
+        assert LLM("gpt-4o").completion("Hello") == "Bonjour"
+    assert mock.call_args.kwargs["stream"] is False
+
+
+def test_completion_continues_after_length_limit():
+    responses = [
+        _message("First half. ", finish_reason="length"),
+        _message("Second half."),
+    ]
+    with patch("litellm.completion", side_effect=responses):
+        assert LLM("gpt-4o").completion("Hello") == "First half. Second half."
+
+
+def test_completion_retries_connection_error():
+    responses = [ConnectionError("connection reset"), _message("Bonjour")]
+    llm = LLM("gpt-4o", retry_backoff=0)
+    with patch("litellm.completion", side_effect=responses) as mock_completion:
+        assert llm.completion("Hello") == "Bonjour"
+    assert mock_completion.call_count == 2
+
+
+def _failing_stream(*parts: str):
+    yield from _stream(*parts)[:-1]
+    raise ConnectionError("connection reset")
+
+
+def test_iter_completion_resumes_after_connection_error():
+    responses = [
+        _failing_stream("The first part was received. "),
+        _stream("The rest of it."),
+    ]
+    llm = LLM("gpt-4o", retry_backoff=0)
+    with patch("litellm.completion", side_effect=responses) as mock_completion:
+        output = "".join(llm.iter_completion("Hello"))
+
+    assert output == "The first part was received. The rest of it."
+    messages = mock_completion.call_args.kwargs["messages"]
+    assert "The first part was received." in messages[-1]["content"]
+
+
+def test_iter_completion_retries_are_bounded():
+    responses = [_failing_stream("part. ") for _ in range(3)]
+    llm = LLM("gpt-4o", max_retries=2, retry_backoff=0)
+    with patch("litellm.completion", side_effect=responses) as mock_completion:
+        with pytest.raises(ConnectionError):
+            "".join(llm.iter_completion("Hello"))
+    assert mock_completion.call_count == 3
+
+
+def test_iter_completion_does_not_retry_other_errors():
+    llm = LLM("gpt-4o", retry_backoff=0)
+    with patch("litellm.completion", side_effect=ValueError("bad request")):
+        with pytest.raises(ValueError):
+            list(llm.iter_completion("Hello"))
+
+
+async def _astream(*parts: str, finish_reason: str = "stop"):
+    for chunk in _stream(*parts, finish_reason=finish_reason):
+        yield chunk
+
+
+def test_aiter_completion_continues_after_length_limit():
+    responses = [
+        _astream("part 0. ", finish_reason="length"),
+        _astream("part 1. "),
+    ]
+
+    async def collect():
+        return "".join([chunk async for chunk in LLM("gpt-4o").aiter_completion("Hi")])
+
+    with patch("litellm.acompletion", side_effect=responses) as mock_acompletion:
+        assert asyncio.run(collect()) == "part 0. part 1. "
+    assert mock_acompletion.call_count == 2
+
+
+def test_acompletion_retries_connection_error():
+    responses = [ConnectionError("connection reset"), _message("Bonjour")]
+    llm = LLM("gpt-4o", retry_backoff=0)
+    with patch("litellm.acompletion", side_effect=responses) as mock_acompletion:
+        assert asyncio.run(llm.acompletion("Hello")) == "Bonjour"
+    assert mock_acompletion.call_count == 2
+    assert mock_acompletion.call_args.kwargs["stream"] is False
@@ -0,0 +1,59 @@
+from ailingo.manifest import Manifest, ManifestEntry
+
+
+def test_write_and_load(tmp_path):
+    manifest = Manifest(
+        shard="1/2",
+        jobs=[ManifestEntry("a.md", "a.ja.md", "ja", "translated")],
+        metrics={"pipeline.segments": 3},
+    )
+    manifest.write(tmp_path / "manifest.json")
+
+    assert Manifest.load(tmp_path / "manifest.json") == manifest
+
+
+def test_merge():
+    merged = Manifest.merge(
+        [
+            Manifest(
+                shard="1/2",
+                jobs=[ManifestEntry("b.md", "b.ja.md", "ja", "translated")],
+                metrics={"pipeline.segments": 3, "pipeline.ttfb_seconds.max": 1.5},
+            ),
+            Manifest(
+                shard="2/2",
+                jobs=[ManifestEntry("a.md", "a.ja.md", "ja", "skipped")],
+                metrics={"pipeline.segments": 2, "pipeline.ttfb_seconds.max": 0.5},
+            ),
+        ]
+    )
+
+    assert merged.shard is None
+    assert [job.input for job in merged.jobs] == ["a.md", "b.md"]
+    assert merged.metrics == {
+        "pipeline.segments": 5,
+        "pipeline.ttfb_seconds.max": 1.5,
+    }
+
+
+def test_merge_recomputes_dedup_ratio():
+    merged = Manifest.merge(
+        [
+            Manifest(
+                metrics={
+                    "dedup.segments": 10,
+                    "dedup.unique_segments": 5,
+                    "dedup.ratio": 0.5,
+                }
+            ),
+            Manifest(
+                metrics={
+                    "dedup.segments": 10,
+                    "dedup.unique_segments": 10,
+                    "dedup.ratio": 0.0,
+                }
+            ),
+        ]
+    )
+
+    assert merged.metrics["dedup.ratio"] == 1 - 15 / 20
@@ -0,0 +1,45 @@
+import pytest
+
+from ailingo.masking import PlaceholderError, iter_unmask, mask, unmask
+
+MARKDOWN = """# Install
+
+Run `pip install ailingo` and read https://example.com/docs.
+
+```bash
+export OPENAI_API_KEY="..."
+ailingo README.md --target ja
+```
+"""
+
+
+def test_mask_markdown():
+    masked = mask(MARKDOWN)
+    assert masked.text == "# Install\n\nRun ⟦0⟧ and read ⟦1⟧.\n\n⟦2⟧\n"
+    assert masked.placeholders["⟦0⟧"] == "`pip install ailingo`"
+    assert masked.placeholders["⟦1⟧"] == "https://example.com/docs"
+    assert masked.placeholders["⟦2⟧"].startswith("```bash\n")
+    assert unmask(masked.text, masked.placeholders) == MARKDOWN
+
+
+def test_mask_plain_text():
+    assert mask("Hello, world!").placeholders == {}
+
+
+def test_text_with_placeholder_markers_is_not_masked():
+    masked = mask("Keep ⟦0⟧ and `code`")
+    assert masked.text == "Keep ⟦0⟧ and `code`"
+    assert masked.placeholders == {}
+
+
+def test_unmask_missing_placeholder():
+    with pytest.raises(PlaceholderError):
+        unmask("Only ⟦0⟧", {"⟦0⟧": "`a`", "⟦1⟧": "`b`"})
+
+
+def test_iter_unmask_split_placeholder():
+    chunks = ["Run ⟦", "0", "⟧ and ⟦1", "⟧."]
+    placeholders = {"⟦0⟧": "`ls`", "⟦1⟧": "https://example.com"}
+    assert "".join(iter_unmask(chunks, placeholders)) == (
+        "Run `ls` and https://example.com."
+    )
@@ -0,0 +1,87 @@
+import re
+from unittest.mock import MagicMock
+
+from ailingo.llm import LLM
+from ailingo.packing import RequestPacker, _split
+from ailingo.prompt import PromptBuilder
+from ailingo.translator import Translator
+
+
+def _texts(prompt: list[dict]) -> list[tuple[str, str]]:
+    """
+    (number, text) pairs of a packed prompt.
+    """
+    return re.findall(r"^⟪(\d+)⟫\n(.*)$", prompt[1]["content"], re.MULTILINE)
+
+
+def _packed_response(prompt: list[dict], skip: set[str] = set()) -> str:
+    return "\n".join(
+        f"⟪{number}⟫\n{text.upper()}"
+        for number, text in _texts(prompt)
+        if text not in skip
+    )
+
+
+def _translator(llm) -> Translator:
+    return Translator(model_name="gpt-4o", llm=llm, prompt_builder=PromptBuilder())
+
+
+def test_split():
+    assert _split("⟪1⟫\nBonjour\n⟪2⟫\nle monde\n\n") == {1: "Bonjour", 2: "le monde"}
+    assert _split("⟪1⟫\na\n⟪2⟫\nb\n⟪2⟫\nc") == {1: "a"}
+    assert _split("Here you go:\n⟪1⟫ \na ⟪2⟫ b") == {1: "a ⟪2⟫ b"}
+
+
+def test_pack_translates_in_one_request():
+    llm = MagicMock(spec=LLM)
+    llm.completion.side_effect = _packed_response
+    translator = _translator(llm)
+    texts = ["hello", " world\n", "three"]
+
+    result = RequestPacker(translator).translate(texts, target_language="fr")
+
+    assert result == ["HELLO", " WORLD\n", "THREE"]
+    assert llm.completion.call_count == 1
+    assert translator.metrics.get("packing.items") == 3
+
+
+def test_pack_resends_only_failed_items():
+    llm = MagicMock(spec=LLM)
+    prompts: list[list[dict]] = []
+
+    def completion(prompt):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            return _packed_response(prompt, skip={"b", "c"})
+        if len(prompts) == 2:
+            return _packed_response(prompt, skip={"c"})
+        return prompt[1]["content"].rsplit("\n", 1)[-1].upper()
+
+    llm.completion.side_effect = completion
+    translator = _translator(llm)
+
+    result = RequestPacker(translator, max_attempts=2).translate(
+        ["a", "b", "c"], target_language="fr"
+    )
+
+    assert result == ["A", "B", "C"]
+    assert [text for _, text in _texts(prompts[1])] == ["b", "c"]
+    # the last item is translated on its own
+    assert "⟪" not in prompts[2][1]["content"]
+    assert translator.metrics.get("packing.resent") == 2
+
+
+def test_pack_with_mask():
+    llm = MagicMock(spec=LLM)
+    llm.completion.return_value = "⟪1⟫\nLancez ⟦0⟧\n⟪2⟫\nVoir"
+    translator = Translator(
+        model_name="gpt-4o", llm=llm, prompt_builder=PromptBuilder(), mask=True
+    )
+
+    result = RequestPacker(translator).translate(
+        ["Run `make`", "See"], target_language="fr"
+    )
+
+    assert result == ["Lancez `make`", "Voir"]
+    prompt = llm.completion.call_args.args[0]
+    assert "`make`" not in prompt[1]["content"]
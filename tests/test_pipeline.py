@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from ailingo.metrics import Metrics
+from ailingo.pipeline import OrderedPipeline
+
+
+def test_results_are_ordered():
+    def translate(index: int, segment: str):
+        # later segments finish first
+        time.sleep(0.05 * (3 - index))
+        yield segment.upper()
+        yield "|"
+
+    pipeline = OrderedPipeline(translate, concurrency=3)
+    assert "".join(pipeline.run(["a", "b", "c"])) == "A|B|C|"
+
+
+def test_first_segment_streams_before_slow_segment_finishes():
+    release = threading.Event()
+
+    def translate(index: int, segment: str):
+        if index == 1:
+            release.wait(timeout=5)
+        yield segment
+
+    metrics = Metrics()
+    pipeline = OrderedPipeline(translate, concurrency=2, metrics=metrics)
+    output = pipeline.run(["first", "second"])
+    assert next(output) == "first"
+    assert metrics.get("pipeline.ttfb_seconds.count") == 1
+    release.set()
+    assert list(output) == ["second"]
+    assert metrics.get("pipeline.segments") == 2
+
+
+def test_buffer_is_bounded():
+    release = threading.Event()
+
+    def translate(index: int, segment: str):
+        if index == 0:
+            release.wait(timeout=5)
+        for char in segment:
+            yield char
+
+    metrics = Metrics()
+    pipeline = OrderedPipeline(
+        translate, concurrency=2, max_buffered_chars=3, metrics=metrics
+    )
+    output = pipeline.run(["head", "x" * 100])
+    threading.Timer(0.1, release.set).start()
+    assert "".join(output) == "head" + "x" * 100
+    assert metrics.get("pipeline.buffered_chars.max") <= 3
+
+
+def test_errors_are_raised_in_order():
+    def translate(index: int, segment: str):
+        if index == 1:
+            raise RuntimeError("failed")
+        yield segment
+
+    pipeline = OrderedPipeline(translate, concurrency=2)
+    output = pipeline.run(["ok", "ng"])
+    assert next(output) == "ok"
+    with pytest.raises(RuntimeError):
+        next(output)
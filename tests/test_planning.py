@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from ailingo.input_source.file_source import FileInputSource
+from ailingo.job import TranslationJob
+from ailingo.output_source.console_source import ConsoleOutputSource
+from ailingo.output_source.file_source import FileOutputSource
+from ailingo.planning import plan_jobs
+
+
+def make_job(input_path: Path, output_path: Path | None) -> TranslationJob:
+    return TranslationJob(
+        input_source=FileInputSource(str(input_path)),
+        output_source=FileOutputSource(str(output_path))
+        if output_path
+        else ConsoleOutputSource(),
+        source_language=None,
+        target_language="fr",
+    )
+
+
+@pytest.fixture
+def files(tmp_path):
+    for name in ["new.txt", "fresh.txt", "stale.txt", "fresh.fr.txt", "stale.fr.txt"]:
+        (tmp_path / name).write_text(name)
+    # the stale output was written before its source was last edited
+    os.utime(tmp_path / "stale.fr.txt", (0, 0))
+    os.utime(tmp_path / "fresh.txt", (0, 0))
+    return tmp_path
+
+
+def test_plan_jobs(files):
+    jobs = [
+        make_job(files / name, files / name.replace(".txt", ".fr.txt"))
+        for name in ["new.txt", "fresh.txt", "stale.txt"]
+    ]
+    plan = plan_jobs(jobs)
+    assert [planned.exists for planned in plan.jobs] == [False, True, True]
+    assert [planned.job for planned in plan.stale] == [jobs[2]]
+    assert plan.conflicts == {}
+
+    assert plan.resolve("all") == (jobs, [])
+    assert plan.resolve("none") == ([jobs[0]], jobs[1:])
+    assert plan.resolve("stale") == ([jobs[0], jobs[2]], [jobs[1]])
+    with pytest.raises(ValueError):
+        plan.resolve("ask")
+
+
+def test_plan_jobs_conflicts(files):
+    jobs = [
+        make_job(files / "new.txt", files / "out.txt"),
+        make_job(files / "fresh.txt", files / "sub" / ".." / "out.txt"),
+        make_job(files / "stale.txt", None),
+        make_job(files / "new.txt", None),
+    ]
+    plan = plan_jobs(jobs)
+    assert plan.conflicts == {str((files / "out.txt").resolve()): jobs[:2]}
+
+
+def test_rewrite_is_not_stale(files):
+    job = make_job(files / "stale.txt", files / "stale.txt")
+    plan = plan_jobs([job])
+    assert plan.existing and not plan.stale
@@ -0,0 +1,85 @@
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from ailingo import profiling
+from ailingo.profiling import Profiler, iter_spans, profile, span, spanned
+
+
+def test_span_without_profiler():
+    with span("prompt.build"):
+        pass
+    assert profiling._profiler is None
+
+
+def test_self_times():
+    with Profiler() as profiler:
+        with (
+            patch("ailingo.profiling.time.perf_counter", side_effect=[0, 1, 3, 10]),
+            patch("ailingo.profiling.time.thread_time", side_effect=[0, 1, 1, 6]),
+        ):
+            with span("run"):
+                with span("llm.wait"):
+                    pass
+    assert profiler.self_times() == {
+        ("run",): (8, 6),
+        ("run", "llm.wait"): (2, 0),
+    }
+
+
+def test_iter_spans_excludes_consumer():
+    with Profiler() as profiler:
+        for _ in iter_spans(iter([1, 2, 3]), "llm.wait", "llm.receive"):
+            with span("output.write"):
+                pass
+    assert profiler.stacks[("llm.wait",)][0] == 1
+    # the last span waits for the end of the iterator
+    assert profiler.stacks[("llm.receive",)][0] == 3
+    assert profiler.stacks[("output.write",)][0] == 3
+
+
+def test_spanned():
+    @spanned("input.read")
+    def read() -> str:
+        return "Hello"
+
+    with Profiler() as profiler:
+        assert read() == "Hello"
+    assert profiler.stacks[("input.read",)][0] == 1
+
+
+def test_profile_writes_files(tmp_path):
+    console = Console(record=True, width=120)
+    with profile(tmp_path / "run.prof", console=console):
+        with span("prompt.build"):
+            pass
+    assert pstats.Stats(str(tmp_path / "run.prof"))
+    folded = (tmp_path / "run.folded").read_text().splitlines()
+    assert [line.split(" ")[0] for line in folded] == ["run", "run;prompt.build"]
+    assert "prompt.build" in console.export_text()
+
+
+def test_profile_includes_threads(tmp_path):
+    def work_in_thread():
+        return sum(range(1000))
+
+    with profile(tmp_path / "run.prof", console=Console(record=True)):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: work_in_thread(), range(4)))
+
+    stats = pstats.Stats(str(tmp_path / "run.prof"))
+    assert any(name == "work_in_thread" for _, _, name in stats.stats)
+
+
+def test_profile_is_written_when_the_run_fails(tmp_path):
+    console = Console(record=True, width=120)
+    with pytest.raises(RuntimeError):
+        with profile(tmp_path / "run.prof", console=console):
+            with span("llm.wait"):
+                raise RuntimeError("failed")
+    assert (tmp_path / "run.prof").exists()
+    assert "llm.wait" in (tmp_path / "run.folded").read_text()
+    assert "llm.wait" in console.export_text()
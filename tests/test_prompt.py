@@ -63,3 +63,25 @@ def test_generate_rewrite_prompt():
 
     assert prompt[0]["role"] == "system"
     assert prompt[1]["role"] == "user"
+
+
+def test_generate_prompt_with_placeholders():
+    builder = PromptBuilder()
+    prompt = builder.build(
+        input_path="README.md", input_text="Run ⟦0⟧", target_language="ja"
+    )
+    assert "Keep every placeholder exactly as it is." in prompt[0]["content"]
+
+    prompt = builder.build(
+        input_path="README.md", input_text="Run", target_language="ja"
+    )
+    assert "placeholder" not in prompt[0]["content"]
+
+
+def test_generate_packed_prompt():
+    builder = PromptBuilder()
+    prompt = builder.build_packed(["Hello", "Run ⟦0⟧"], target_language="ja")
+
+    assert "Target language code: ja" in prompt[0]["content"]
+    assert "Keep every placeholder exactly as it is." in prompt[0]["content"]
+    assert prompt[1]["content"].endswith("⟪1⟫\nHello\n⟪2⟫\nRun ⟦0⟧")
@@ -0,0 +1,144 @@
+import asyncio
+import queue
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from ailingo.router import HedgedLLM, _Attempt
+
+
+def _chunk(content: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+    )
+
+
+def fake_completion(delays: dict[str, float], failures: set[str] = set()):
+    closed: list[str] = []
+
+    def _completion(self, model, prompt):
+        try:
+            time.sleep(delays.get(model, 0))
+            if model in failures:
+                raise RuntimeError(f"{model} failed")
+            yield _chunk(f"{model}:")
+            yield _chunk("done")
+        finally:
+            closed.append(model)
+
+    return _completion, closed
+
+
+def test_primary_model_wins():
+    _completion, _ = fake_completion({"primary": 0, "secondary": 0})
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=1)
+    with patch("ailingo.llm.LLM._completion", _completion):
+        assert "".join(llm.iter_completion("hello")) == "primary:done"
+
+
+def test_hedge_after_deadline():
+    _completion, closed = fake_completion({"primary": 0.5, "secondary": 0})
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=0.05)
+    with patch("ailingo.llm.LLM._completion", _completion):
+        assert "".join(llm.iter_completion("hello")) == "secondary:done"
+        time.sleep(0.6)
+    # the slow request is cancelled once it starts streaming
+    assert "primary" in closed
+
+
+def test_loser_finishing_during_winner_selection_is_closed():
+    _completion, closed = fake_completion({"primary": 0.05, "secondary": 0.07})
+    results: list[queue.Queue] = []
+
+    class KeptQueue(queue.Queue):
+        # keeps the streams in the queue referenced, as they would leak otherwise
+        def __init__(self):
+            super().__init__()
+            results.append(self)
+
+    class SlowEvent(threading.Event):
+        # widens the window between the loser's check and its handover
+        def is_set(self):
+            is_set = super().is_set()
+            if not is_set:
+                time.sleep(0.1)
+            return is_set
+
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=0.01)
+    with (
+        patch("ailingo.llm.LLM._completion", _completion),
+        patch("ailingo.router.queue.Queue", KeptQueue),
+        patch("ailingo.router._Attempt", lambda model: _Attempt(model, SlowEvent())),
+    ):
+        assert "".join(llm.iter_completion("hello")).endswith(":done")
+        time.sleep(0.2)
+    # the winner's stream ends, and the loser's is closed
+    assert sorted(closed) == ["primary", "secondary"]
+
+
+def test_fallback_on_error():
+    _completion, _ = fake_completion({}, failures={"primary"})
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=None)
+    with patch("ailingo.llm.LLM._completion", _completion):
+        assert "".join(llm.iter_completion("hello")) == "secondary:done"
+
+
+def test_all_models_fail():
+    _completion, _ = fake_completion({}, failures={"primary", "secondary"})
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=None)
+    with patch("ailingo.llm.LLM._completion", _completion):
+        with pytest.raises(RuntimeError, match="secondary failed"):
+            list(llm.iter_completion("hello"))
+
+
+def test_completion_is_not_hedged_after_first_chunk():
+    requests: list[str] = []
+
+    def completion(model, messages, stream, **kwargs):
+        requests.append(model)
+        if not stream:
+            # a whole response arrives only once it has been generated
+            time.sleep(0.3)
+            return SimpleNamespace(
+                choices=[
+                    SimpleNamespace(
+                        message=SimpleNamespace(content=f"{model}:done"),
+                        finish_reason="stop",
+                    )
+                ]
+            )
+
+        def chunks():
+            yield _chunk(f"{model}:")
+            time.sleep(0.3)
+            yield _chunk("done")
+
+        return chunks()
+
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=0.05)
+    with patch("litellm.completion", completion):
+        assert llm.completion("hello") == "primary:done"
+    assert requests == ["primary"]
+
+
+def test_async_fallback_on_error():
+    requests: list[str] = []
+
+    async def _acompletion(self, model, prompt):
+        requests.append(model)
+        if model == "primary":
+            raise RuntimeError("primary failed")
+        yield _chunk(f"{model}:")
+        yield _chunk("done")
+
+    llm = HedgedLLM(["primary", "secondary"], hedge_after=0.05)
+
+    async def run() -> str:
+        return "".join([chunk async for chunk in llm.aiter_completion("hello")])
+
+    with patch("ailingo.llm.LLM._acompletion", _acompletion):
+        assert asyncio.run(run()) == "secondary:done"
+    assert requests == ["primary", "secondary"]
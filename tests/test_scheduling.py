@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from ailingo.input_source.file_source import FileInputSource
+from ailingo.input_source.mmap_source import MmapFileInputSource
+from ailingo.job import TranslationJob
+from ailingo.output_source.file_source import FileOutputSource
+from ailingo.prompt import PromptBuilder
+from ailingo.scheduling import estimate_job_tokens, priority_of, schedule
+
+
+def make_jobs(tmp_path, sizes: dict[str, int]) -> list[TranslationJob]:
+    jobs = []
+    for name, size in sizes.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("word " * size)
+        jobs.append(
+            TranslationJob(
+                input_source=FileInputSource(str(path)),
+                output_source=FileOutputSource(str(path.with_suffix(".fr.md"))),
+                target_language="fr",
+            )
+        )
+    return jobs
+
+
+def names(jobs: list[TranslationJob]) -> list[str]:
+    return [job.input_source.path.split("/")[-1] for job in jobs]
+
+
+def test_estimate_job_tokens(tmp_path):
+    small, large = make_jobs(tmp_path, {"small.md": 10, "large.md": 1000})
+    builder = PromptBuilder()
+    assert estimate_job_tokens(small, builder) < estimate_job_tokens(large, builder)
+    # the instructions of the prompt are counted too
+    assert estimate_job_tokens(small, builder) > 10 * 5 // 4
+
+
+def test_schedule(tmp_path):
+    jobs = make_jobs(tmp_path, {"b.md": 100, "c.md": 1000, "a.md": 10})
+    assert names(schedule(jobs)) == ["b.md", "c.md", "a.md"]
+    assert names(schedule(jobs, "largest")) == ["c.md", "b.md", "a.md"]
+    assert names(schedule(jobs, "shortest")) == ["a.md", "b.md", "c.md"]
+
+
+def test_schedule_with_priorities(tmp_path):
+    jobs = make_jobs(
+        tmp_path,
+        {"manual.md": 1000, "docs/intro.md": 10, "README.md": 100, "x.md": 500},
+    )
+    assert names(schedule(jobs, "largest", priorities=["README.md", "docs/*"])) == [
+        "README.md",
+        "intro.md",
+        "manual.md",
+        "x.md",
+    ]
+    assert priority_of(jobs[1], [str(tmp_path / "docs" / "*")]) == 0
+    assert priority_of(jobs[0], ["README.md"]) == 1
+
+
+def test_estimate_file_input_from_file_size(tmp_path):
+    path = tmp_path / "manual.md"
+    path.write_text("word " * 1000)
+    job = TranslationJob(
+        input_source=MmapFileInputSource(path),
+        output_source=FileOutputSource(str(tmp_path / "manual.fr.md")),
+        target_language="fr",
+    )
+    builder = PromptBuilder()
+    with (
+        patch.object(MmapFileInputSource, "read", side_effect=AssertionError),
+        patch.object(FileInputSource, "read", side_effect=AssertionError),
+    ):
+        tokens = estimate_job_tokens(job, builder)
+        assert tokens == estimate_job_tokens(
+            TranslationJob(
+                input_source=FileInputSource(str(path)),
+                output_source=job.output_source,
+                target_language="fr",
+            ),
+            builder,
+        )
+    assert tokens > 1000 * 5 // 4
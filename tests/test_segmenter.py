@@ -0,0 +1,52 @@
+import pytest
+
+from ailingo.segmenter import split_text
+
+
+def test_short_text_is_not_split():
+    assert split_text("Hello, world!", 100) == ["Hello, world!"]
+    assert split_text("", 100) == []
+
+
+def test_split_at_paragraphs():
+    text = "First paragraph.\n\nSecond paragraph.\n\nThird paragraph.\n"
+    segments = split_text(text, 40)
+    assert segments == [
+        "First paragraph.\n\nSecond paragraph.\n\n",
+        "Third paragraph.\n",
+    ]
+    assert "".join(segments) == text
+
+
+def test_split_long_paragraph_at_lines():
+    text = "line one\nline two\nline three\n"
+    segments = split_text(text, 12)
+    assert segments == ["line one\n", "line two\n", "line three\n"]
+
+
+def test_split_long_line():
+    text = "a" * 25
+    assert split_text(text, 10) == ["a" * 10, "a" * 10, "a" * 5]
+
+
+def test_split_long_line_between_words():
+    text = "Read the guide at https://example.com/docs/getting-started before `make install` runs."
+    segments = split_text(text, 20)
+    assert "".join(segments) == text
+    # the URL is longer than a segment, but kept in one piece
+    assert segments == [
+        "Read the guide at ",
+        "https://example.com/docs/getting-started",
+        " before ",
+        "`make install` runs.",
+    ]
+
+
+def test_split_long_line_at_sentences():
+    text = "One sentence here. Another one follows it."
+    assert split_text(text, 30) == ["One sentence here. ", "Another one follows it."]
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        split_text("text", 0)
@@ -0,0 +1,49 @@
+import pytest
+
+from ailingo.input_source.file_source import FileInputSource
+from ailingo.job import TranslationJob
+from ailingo.output_source.console_source import ConsoleOutputSource
+from ailingo.sharding import parse_shard, shard_of
+
+
+def _job(path: str, target: str) -> TranslationJob:
+    return TranslationJob(
+        input_source=FileInputSource(path),
+        output_source=ConsoleOutputSource(),
+        target_language=target,
+    )
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    assert parse_shard("4/4") == (4, 4)
+    for value in ["0/4", "5/4", "1", "a/b"]:
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_shards_partition_jobs():
+    jobs = [
+        _job(f"docs/page{i}.md", target) for i in range(100) for target in ["ja", "es"]
+    ]
+    shards = [[job for job in jobs if shard_of(job, 4) == i] for i in range(1, 5)]
+
+    assert sum(len(shard) for shard in shards) == len(jobs)
+    assert all(len(shard) > 20 for shard in shards)
+
+
+def test_shard_assignment_is_stable():
+    job = _job("docs/page1.md", "ja")
+    shard = shard_of(job, 4)
+    # unaffected by other jobs and repeatable
+    assert all(shard_of(_job("docs/page1.md", "ja"), 4) == shard for _ in range(3))
+
+
+def test_shard_assignment_ignores_how_the_path_is_written(tmp_path, monkeypatch):
+    (tmp_path / "docs").mkdir()
+    monkeypatch.chdir(tmp_path)
+    shards = {
+        shard_of(_job(path, "ja"), 1000)
+        for path in ["docs/a.md", "./docs/a.md", str(tmp_path / "docs" / "a.md")]
+    }
+    assert len(shards) == 1
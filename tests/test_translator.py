@@ -1,8 +1,12 @@
+import asyncio
+import tracemalloc
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 from ailingo.input_source.file_source import FileInputSource
+from ailingo.input_source.mmap_source import MmapFileInputSource
+from ailingo.job import TranslationJob
 from ailingo.llm import LLM
 from ailingo.output_source.file_source import FileOutputSource
 from ailingo.prompt import PromptBuilder
@@ -46,7 +50,7 @@ def test_translate_dryrun(
         dryrun=True,
     )
 
-    mock_llm.iter_completion.assert_not_called()
+    mock_llm.completion.assert_not_called()
     mock_input_source.read.assert_not_called()
     mock_output_source.write.assert_not_called()
 
@@ -62,7 +66,7 @@ def test_translate_new_file(
     mock_output_source.path = "test.fr.txt"
     mock_output_source.exists.return_value = False
     mock_input_source.read.return_value = "Hello, world!"
-    mock_llm.iter_completion.return_value = ["Bonjour, le monde!"]
+    mock_llm.completion.return_value = "Bonjour, le monde!"
     mock_prompt.build.return_value = [
         {"role": "system", "content": "You are a translator that translates files."},
         {"role": "user", "content": "User provided text:\n----------\nHello, world!"},
@@ -75,7 +79,7 @@ def test_translate_new_file(
         overwrite=False,
     )
 
-    mock_llm.iter_completion.assert_called_once_with(mock_prompt.build.return_value)
+    mock_llm.completion.assert_called_once_with(mock_prompt.build.return_value)
     mock_prompt.build.assert_called_once_with(
         input_path="test.txt",
         input_text="Hello, world!",
@@ -83,6 +87,7 @@ def test_translate_new_file(
         target_language="fr",
         request=None,
         current_text=None,
+        glossary=None,
     )
     mock_output_source.write.assert_called_once_with("Bonjour, le monde!")
 
@@ -98,7 +103,7 @@ def test_translate_with_source(
     mock_output_source.path = "test.fr.txt"
     mock_output_source.exists.return_value = False
     mock_input_source.read.return_value = "Hello, world!"
-    mock_llm.iter_completion.return_value = ["Bonjour, le monde!"]
+    mock_llm.completion.return_value = "Bonjour, le monde!"
     mock_prompt.build.return_value = [
         {"role": "system", "content": "You are a translator that translates files."},
         {"role": "user", "content": "User provided text:\n----------\nHello, world!"},
@@ -112,7 +117,7 @@ def test_translate_with_source(
         overwrite=False,
     )
 
-    mock_llm.iter_completion.assert_called_once_with(mock_prompt.build.return_value)
+    mock_llm.completion.assert_called_once_with(mock_prompt.build.return_value)
     mock_prompt.build.assert_called_once_with(
         input_path="test.txt",
         input_text="Hello, world!",
@@ -120,6 +125,7 @@ def test_translate_with_source(
         target_language="fr",
         request=None,
         current_text=None,
+        glossary=None,
     )
     mock_output_source.write.assert_called_once_with("Bonjour, le monde!")
 
@@ -139,7 +145,7 @@ def test_translate_no_overwrite(
             overwrite=False,
         )
 
-    mock_llm.iter_completion.assert_not_called()
+    mock_llm.completion.assert_not_called()
     mock_input_source.read.assert_not_called()
     mock_output_source.write.assert_not_called()
 
@@ -152,7 +158,7 @@ def test_translate_overwrite(
     mock_output_source.exists.return_value = True
     mock_input_source.read.return_value = "Hello, world!"
     mock_output_source.read.return_value = "Bonjour, le monde(existing file)"
-    mock_llm.iter_completion.return_value = ["Bonjour, le monde!"]
+    mock_llm.completion.return_value = "Bonjour, le monde!"
     mock_prompt.build.return_value = [
         {"role": "system", "content": "You are a translator that translates files."},
         {"role": "user", "content": "User provided text:\n----------\nHello, world!"},
@@ -167,7 +173,7 @@ def test_translate_overwrite(
 
     mock_input_source.read.assert_called_once_with()
     mock_output_source.read.assert_called_once_with()
-    mock_llm.iter_completion.assert_called_once_with(mock_prompt.build.return_value)
+    mock_llm.completion.assert_called_once_with(mock_prompt.build.return_value)
     mock_prompt.build.assert_called_once_with(
         input_path="test.txt",
         input_text="Hello, world!",
@@ -175,6 +181,7 @@ def test_translate_overwrite(
         target_language="fr",
         request=None,
         current_text="Bonjour, le monde(existing file)",
+        glossary=None,
     )
     mock_output_source.write.assert_called_once_with("Bonjour, le monde!")
 
@@ -186,7 +193,7 @@ def test_translate_with_request(
     mock_output_source.path = "test.fr.txt"
     mock_output_source.exists.return_value = False
     mock_input_source.read.return_value = "Hello, world!"
-    mock_llm.iter_completion.return_value = ["Bonjour, world!"]
+    mock_llm.completion.return_value = "Bonjour, world!"
     mock_prompt.build.return_value = [
         {"role": "system", "content": "You are a translator that translates files."},
         {"role": "user", "content": "User provided text:\n----------\nHello, world!"},
@@ -200,7 +207,7 @@ def test_translate_with_request(
         request="Do not translate the word 'world'.",
     )
 
-    mock_llm.iter_completion.assert_called_once_with(mock_prompt.build.return_value)
+    mock_llm.completion.assert_called_once_with(mock_prompt.build.return_value)
     mock_prompt.build.assert_called_once_with(
         input_path="test.txt",
         input_text="Hello, world!",
@@ -208,6 +215,7 @@ def test_translate_with_request(
         target_language="fr",
         request="Do not translate the word 'world'.",
         current_text=None,
+        glossary=None,
     )
     mock_output_source.write.assert_called_once_with("Bonjour, world!")
 
@@ -220,7 +228,7 @@ def test_rewrite(
     mock_output_source.exists.return_value = True
     mock_input_source.read.return_value = "Hello, world!"
     mock_output_source.read.return_value = "Hi, world!"
-    mock_llm.iter_completion.return_value = ["HELLO, WORLD!"]
+    mock_llm.completion.return_value = "HELLO, WORLD!"
     mock_prompt.build.return_value = [
         {"role": "system", "content": "You are a writer who rewrites text."},
         {"role": "user", "content": "User provided text:\n----------\nHello, world!"},
@@ -232,7 +240,7 @@ def test_rewrite(
         overwrite=True,
     )
 
-    mock_llm.iter_completion.assert_called_once_with(mock_prompt.build.return_value)
+    mock_llm.completion.assert_called_once_with(mock_prompt.build.return_value)
     mock_prompt.build.assert_called_once_with(
         input_path="test.txt",
         input_text="Hello, world!",
@@ -240,6 +248,7 @@ def test_rewrite(
         target_language=None,
         request=None,
         current_text="Hi, world!",
+        glossary=None,
     )
     mock_output_source.write.assert_called_once_with("HELLO, WORLD!")
 
@@ -277,7 +286,314 @@ def test_translate_with_streaming(
         target_language="fr",
         request=None,
         current_text=None,
+        glossary=None,
     )
     mock_output_source.write_stream.assert_called_once_with(
         mock_llm.iter_completion.return_value
     )
+
+
+def test_translate_in_segments(
+    mock_llm, mock_prompt, mock_input_source, mock_output_source
+):
+    translator = Translator(
+        model_name="gpt-4o",
+        llm=mock_llm,
+        prompt_builder=mock_prompt,
+        chunk_size=20,
+        concurrency=2,
+    )
+    mock_input_source.path = "test.txt"
+    mock_output_source.path = "test.fr.txt"
+    mock_output_source.exists.return_value = False
+    mock_input_source.read.return_value = "First paragraph.\n\nSecond paragraph.\n"
+    mock_prompt.build.side_effect = lambda **kwargs: kwargs["input_text"]
+    mock_llm.completion.side_effect = lambda prompt: prompt.upper()
+
+    translator.translate(
+        input_source=mock_input_source,
+        output_source=mock_output_source,
+        target_language="fr",
+    )
+
+    assert mock_llm.completion.call_count == 2
+    mock_output_source.write.assert_called_once_with(
+        "FIRST PARAGRAPH.\n\nSECOND PARAGRAPH.\n"
+    )
+    assert translator.metrics.get("pipeline.segments") == 2
+
+
+class UppercaseLLM(LLM):
+    def iter_completion(self, prompt):
+        yield prompt.upper()
+
+
+class InputTextPromptBuilder(PromptBuilder):
+    def build(self, input_text: str, **kwargs):  # type: ignore
+        return input_text
+
+
+def test_translate_large_file_in_bounded_memory(tmp_path):
+    input_path = tmp_path / "large.log"
+    with input_path.open("w") as f:
+        for i in range(100_000):
+            f.write(f"log line {i:06d}\n")
+    output_path = tmp_path / "large.fr.log"
+    translator = Translator(
+        model_name="gpt-4o",
+        llm=UppercaseLLM("gpt-4o"),
+        prompt_builder=InputTextPromptBuilder(),
+        chunk_size=16 * 1024,
+        concurrency=2,
+    )
+
+    tracemalloc.start()
+    translator.translate(
+        input_source=MmapFileInputSource(input_path),
+        output_source=FileOutputSource(output_path),
+        target_language="fr",
+        quiet=True,
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert output_path.read_text() == input_path.read_text().upper()
+    # the 1.7MB file is never held in memory at once
+    assert peak < input_path.stat().st_size / 4
+
+
+def test_translate_with_mask(
+    mock_llm, mock_prompt, mock_input_source, mock_output_source
+):
+    translator = Translator(
+        model_name="gpt-4o", llm=mock_llm, prompt_builder=mock_prompt, mask=True
+    )
+    mock_input_source.path = "README.md"
+    mock_output_source.path = "README.fr.md"
+    mock_output_source.exists.return_value = False
+    mock_input_source.read.return_value = "Run `make test` before https://example.com"
+    mock_prompt.build.return_value = "prompt"
+    mock_llm.completion.return_value = "Lancez ⟦0⟧ avant ⟦1⟧"
+
+    translator.translate(
+        input_source=mock_input_source,
+        output_source=mock_output_source,
+        target_language="fr",
+    )
+
+    assert mock_prompt.build.call_args.kwargs["input_text"] == "Run ⟦0⟧ before ⟦1⟧"
+    mock_output_source.write.assert_called_once_with(
+        "Lancez `make test` avant https://example.com"
+    )
+    assert translator.metrics.get("masking.prompt_tokens_saved") > 0
+
+
+def test_translate_with_mask_falls_back_when_placeholders_are_lost(
+    mock_llm, mock_prompt, mock_input_source, mock_output_source
+):
+    translator = Translator(
+        model_name="gpt-4o", llm=mock_llm, prompt_builder=mock_prompt, mask=True
+    )
+    mock_input_source.path = "README.md"
+    mock_output_source.path = "README.fr.md"
+    mock_output_source.exists.return_value = False
+    mock_input_source.read.return_value = "Run `make test`"
+    mock_prompt.build.return_value = "prompt"
+    mock_llm.completion.side_effect = ["Lancez les tests", "Lancez `make test`"]
+
+    translator.translate(
+        input_source=mock_input_source,
+        output_source=mock_output_source,
+        target_language="fr",
+    )
+
+    assert mock_prompt.build.call_args.kwargs["input_text"] == "Run `make test`"
+    mock_output_source.write.assert_called_once_with("Lancez `make test`")
+    assert translator.metrics.get("masking.fallbacks") == 1
+    # the response with lost placeholders is not replayed from the cache
+    mock_llm.evict.assert_called_once_with("prompt")
+
+
+def test_translate_stream_with_mask_falls_back_when_placeholders_are_lost(
+    mock_llm, mock_prompt, mock_input_source, mock_output_source
+):
+    translator = Translator(
+        model_name="gpt-4o", llm=mock_llm, prompt_builder=mock_prompt, mask=True
+    )
+    mock_input_source.path = "README.md"
+    mock_output_source.path = "README.fr.md"
+    mock_output_source.exists.return_value = False
+    written: list[str] = []
+    mock_output_source.write_stream.side_effect = written.extend
+    mock_input_source.read.return_value = "Run `make test`"
+    mock_prompt.build.return_value = "prompt"
+    mock_llm.completion.side_effect = ["Lancez les tests", "Lancez `make test`"]
+
+    translator.translate(
+        input_source=mock_input_source,
+        output_source=mock_output_source,
+        target_language="fr",
+        stream=True,
+    )
+
+    # nothing of the response with lost placeholders is written
+    assert written == ["Lancez `make test`"]
+    assert translator.metrics.get("masking.fallbacks") == 1
+    mock_llm.evict.assert_called_once_with("prompt")
+
+
+def test_atranslate(mock_llm, mock_prompt, mock_input_source, mock_output_source):
+    translator = Translator(
+        model_name="gpt-4o", llm=mock_llm, prompt_builder=mock_prompt, mask=True
+    )
+    mock_input_source.path = "test.md"
+    mock_output_source.exists.return_value = False
+    mock_input_source.read.return_value = "Run `make test`"
+    mock_prompt.build.return_value = "prompt"
+    mock_llm.acompletion.return_value = "Lancez ⟦0⟧"
+
+    result = asyncio.run(
+        translator.atranslate(
+            input_source=mock_input_source,
+            output_source=mock_output_source,
+            target_language="fr",
+        )
+    )
+
+    assert result == "Lancez `make test`"
+    mock_llm.acompletion.assert_awaited_once_with("prompt")
+    mock_output_source.write.assert_called_once_with("Lancez `make test`")
+
+
+def test_atranslate_skips_existing_output(
+    translator: Translator, mock_llm, mock_input_source, mock_output_source
+):
+    mock_output_source.exists.return_value = True
+
+    with patch("rich.prompt.Confirm.ask") as mock_ask:
+        result = asyncio.run(
+            translator.atranslate(
+                input_source=mock_input_source,
+                output_source=mock_output_source,
+                target_language="fr",
+            )
+        )
+
+    assert result is None
+    mock_ask.assert_not_called()
+    mock_llm.acompletion.assert_not_called()
+    mock_output_source.write.assert_not_called()
+
+
+class SlowUppercaseLLM(LLM):
+    def __init__(self):
+        super().__init__("gpt-4o")
+        self.running = 0
+        self.max_running = 0
+
+    async def acompletion(self, prompt):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return prompt.upper()
+
+    async def aiter_completion(self, prompt):
+        for word in prompt.upper().split(" "):
+            yield word + " "
+
+
+def test_translate_many(capsys):
+    llm = SlowUppercaseLLM()
+    translator = Translator(
+        model_name="gpt-4o", llm=llm, prompt_builder=InputTextPromptBuilder()
+    )
+    jobs = [
+        TranslationJob(
+            input_source=MagicMock(spec=FileInputSource, path=f"{i}.txt"),
+            output_source=MagicMock(spec=FileOutputSource, path=f"{i}.fr.txt"),
+            target_language="fr",
+        )
+        for i in range(10)
+    ]
+    for i, job in enumerate(jobs):
+        job.input_source.read.return_value = f"text {i}"  # type: ignore
+        job.output_source.exists.return_value = False  # type: ignore
+
+    results = asyncio.run(translator.translate_many(jobs, concurrency=3))
+
+    assert results == [f"TEXT {i}" for i in range(10)]
+    assert llm.max_running == 3
+    assert capsys.readouterr().out == ""
+
+
+def test_translate_many_limits_segment_requests():
+    llm = SlowUppercaseLLM()
+    translator = Translator(
+        model_name="gpt-4o",
+        llm=llm,
+        prompt_builder=InputTextPromptBuilder(),
+        chunk_size=10,
+        concurrency=3,
+    )
+    jobs = [
+        TranslationJob(
+            input_source=MagicMock(spec=FileInputSource, path=f"{i}.txt"),
+            output_source=None,  # type: ignore
+            target_language="fr",
+        )
+        for i in range(5)
+    ]
+    for i, job in enumerate(jobs):
+        job.input_source.read.return_value = "\n\n".join(  # type: ignore
+            f"part {i}.{j}" for j in range(4)
+        )
+
+    results = asyncio.run(translator.translate_many(jobs))
+
+    assert results[0] == "\n\n".join(f"PART 0.{j}" for j in range(4))
+    # 5 jobs of 4 segments, but not more requests than the concurrency
+    assert llm.max_running == 3
+
+
+def test_atranslate_stream():
+    translator = Translator(
+        model_name="gpt-4o",
+        llm=SlowUppercaseLLM(),
+        prompt_builder=InputTextPromptBuilder(),
+    )
+    input_source = MagicMock(spec=FileInputSource, path="test.txt")
+    input_source.read.return_value = "hello async world"
+
+    async def collect():
+        return [
+            chunk
+            async for chunk in translator.atranslate_stream(
+                input_source=input_source, target_language="fr"
+            )
+        ]
+
+    assert asyncio.run(collect()) == ["HELLO ", "ASYNC ", "WORLD "]
+
+
+def test_atranslate_stream_with_mask_falls_back_when_placeholders_are_lost(
+    mock_llm, mock_prompt, mock_input_source
+):
+    translator = Translator(
+        model_name="gpt-4o", llm=mock_llm, prompt_builder=mock_prompt, mask=True
+    )
+    mock_input_source.path = "README.md"
+    mock_input_source.read.return_value = "Run `make test`"
+    mock_prompt.build.return_value = "prompt"
+    mock_llm.acompletion.side_effect = ["Lancez les tests", "Lancez `make test`"]
+
+    async def collect():
+        return [
+            chunk
+            async for chunk in translator.atranslate_stream(
+                input_source=mock_input_source, target_language="fr"
+            )
+        ]
+
+    assert asyncio.run(collect()) == ["Lancez `make test`"]
+    assert translator.metrics.get("masking.fallbacks") == 1
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+import pytest
+
+from ailingo.output_source.file_source import FileOutputSource
+from ailingo.watcher import CancellableOutputSource, Cancelled, Watcher, watch
+
+
+def _touch(path, text: str):
+    path.write_text(text)
+    # make sure that the modification time changes on coarse file systems
+    mtime = time.time_ns() + 10**9 * len(text)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_changes_are_debounced_and_coalesced(tmp_path):
+    a = tmp_path / "a.md"
+    b = tmp_path / "b.md"
+    a.write_text("a")
+    b.write_text("b")
+    watcher = Watcher([a, b], debounce=0.2, poll_interval=0.02, polling=True)
+    stop = threading.Event()
+
+    def save():
+        time.sleep(0.1)
+        for text in ["a1", "a12", "a123"]:
+            _touch(a, text)
+            time.sleep(0.05)
+        _touch(b, "b1")
+
+    threading.Thread(target=save).start()
+    changes = watcher.iter_changes(stop)
+    assert next(changes) == {a.resolve(), b.resolve()}
+    stop.set()
+
+
+def test_watch_cancels_running_translation(tmp_path):
+    a = tmp_path / "a.md"
+    a.write_text("a")
+    watcher = Watcher([a], debounce=0.1, poll_interval=0.02, polling=True)
+    stop = threading.Event()
+    started = threading.Event()
+    results: list[str] = []
+
+    def translate(path, cancel: threading.Event):
+        text = path.read_text()
+        if text == "first":
+            started.set()
+            cancel.wait(5)
+            results.append("cancelled" if cancel.is_set() else "first")
+        else:
+            results.append(text)
+            stop.set()
+
+    def save():
+        time.sleep(0.1)
+        _touch(a, "first")
+        started.wait(5)
+        _touch(a, "second!")
+
+    threading.Thread(target=save).start()
+    watch(watcher, translate, stop)
+
+    assert results == ["cancelled", "second!"]
+
+
+def test_cancellable_output_source(tmp_path):
+    output_path = tmp_path / "out.md"
+    cancel = threading.Event()
+    output_source = CancellableOutputSource(FileOutputSource(output_path), cancel)
+
+    output_source.write_stream(iter(["Hello, ", "world"]))
+    assert output_path.read_text() == "Hello, world"
+
+    def chunks():
+        yield "Bye"
+        cancel.set()
+        yield ", world"
+
+    with pytest.raises(Cancelled):
+        output_source.write_stream(chunks())
+    assert output_path.read_text() == "Hello, world"
@@ -0,0 +1,79 @@
+import time
+from unittest.mock import patch
+
+from ailingo.work_queue import QueuedJob, WorkQueue
+
+
+def _jobs(count: int) -> list[QueuedJob]:
+    return [
+        QueuedJob(
+            input_path=f"docs/page{i}.md",
+            output_path=f"docs/page{i}.ja.md",
+            target_language="ja",
+        )
+        for i in range(count)
+    ]
+
+
+def test_lease_and_ack(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.db")
+    queue.enqueue(_jobs(2))
+
+    first = queue.lease("worker-1")
+    second = queue.lease("worker-2")
+    assert first and second
+    assert {first.input_path, second.input_path} == {
+        "docs/page0.md",
+        "docs/page1.md",
+    }
+    assert first.target_language == "ja"
+    assert queue.lease("worker-3") is None
+
+    queue.ack(first, "worker-1")
+    queue.ack(second, "worker-2")
+    assert queue.counts() == {"done": 2}
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.db")
+    queue.enqueue(_jobs(2))
+    job = queue.lease("worker-1")
+    assert job
+    queue.ack(job, "worker-1")
+
+    queue.enqueue(_jobs(2))
+    assert queue.counts() == {"queued": 2}
+
+
+def test_expired_lease_is_retried(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.db", lease_seconds=60)
+    queue.enqueue(_jobs(1))
+    job = queue.lease("worker-1")
+    assert job and queue.lease("worker-2") is None
+
+    expired = time.time() + 120
+    with patch("ailingo.work_queue.time.time", return_value=expired):
+        retried = queue.lease("worker-2")
+    assert retried and retried.id == job.id
+    assert retried.attempts == 2
+
+    # the original worker has lost the job
+    assert not queue.extend(job, "worker-1")
+    queue.ack(job, "worker-1")
+    assert queue.counts() == {"leased": 1}
+
+
+def test_failed_job_is_retried_until_max_attempts(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.db", max_attempts=2)
+    queue.enqueue(_jobs(1))
+
+    job = queue.lease("worker-1")
+    assert job
+    queue.fail(job, "worker-1", "error")
+    assert queue.counts() == {"queued": 1}
+
+    job = queue.lease("worker-1")
+    assert job
+    queue.fail(job, "worker-1", "error")
+    assert queue.counts() == {"failed": 1}
+    assert queue.lease("worker-1") is None